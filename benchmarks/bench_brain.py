@@ -0,0 +1,206 @@
+"""
+Бенчмарки AI Brain
+Синтетические проекты заданного размера, замеры основных операций,
+результаты в JSON для сравнения версий.
+
+Запуск:
+    python benchmarks/bench_brain.py --sizes 1000,10000 --output bench.json
+    python benchmarks/bench_brain.py --sizes 1000 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.ai_brain import AIBrain  # noqa: E402
+from src.mock_provider import MockProvider  # noqa: E402
+
+FILES_PER_DIR = 100
+
+TEMPLATES = [
+    # Без проблем
+    '"""Модуль {n}"""\n\n\ndef func_{n}(x: int) -> int:\n    """Удвоить"""\n    return x * 2\n',
+    # Нет docstring и type hints
+    'import os\n\n\ndef func_{n}(path):\n    return os.path.exists(path)\n\n\nclass Item{n}:\n    pass\n',
+    # Пустой except
+    '"""Модуль {n}"""\n\n\ndef func_{n}(data: dict) -> int:\n    try:\n        return int(data["x"])\n'
+    '    except:\n        pass\n    return 0\n',
+    # TODO
+    '"""Модуль {n}"""\n\n\ndef func_{n}(items: list) -> list:\n    # TODO: сортировка\n    return items\n',
+]
+
+
+def generate_repo(root: str, files: int, seed: int = 42) -> None:
+    """Создать синтетический проект: files модулей по FILES_PER_DIR в пакете и smoke-тест"""
+    rng = random.Random(seed)
+    for n in range(files):
+        package = os.path.join(root, "pkg", f"p{n // FILES_PER_DIR:04d}")
+        if n % FILES_PER_DIR == 0:
+            os.makedirs(package, exist_ok=True)
+            with open(os.path.join(package, "__init__.py"), 'w', encoding='utf-8') as f:
+                f.write('"""Пакет"""\n')
+        with open(os.path.join(package, f"m{n}.py"), 'w', encoding='utf-8') as f:
+            f.write(rng.choice(TEMPLATES).format(n=n))
+
+    os.makedirs(os.path.join(root, "tests"), exist_ok=True)
+    with open(os.path.join(root, "tests", "test_smoke.py"), 'w', encoding='utf-8') as f:
+        f.write('def test_smoke():\n    assert True\n')
+
+
+def reset_state(root: str) -> None:
+    """Удалить сохранённые задачи и историю brain"""
+    shutil.rmtree(os.path.join(root, "tasks"), ignore_errors=True)
+
+
+def measure(fn: Callable, repeat: int, setup: Optional[Callable] = None,
+            per: int = 1) -> Dict[str, float]:
+    """
+    Замерить fn repeat раз (setup перед каждым замером не учитывается)
+
+    Args:
+        per: На сколько операций делить время (для замеров "на файл")
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) / per)
+    return {
+        "repeat": repeat,
+        "min": round(min(samples), 6),
+        "median": round(statistics.median(samples), 6),
+        "mean": round(statistics.fmean(samples), 6),
+        "max": round(max(samples), 6),
+    }
+
+
+def run_size(files: int, repeat: int, execute_runs: int, workdir: str) -> Dict[str, Dict]:
+    """Все замеры на проекте из files файлов"""
+    root = os.path.join(workdir, f"repo_{files}")
+    started = time.perf_counter()
+    generate_repo(root, files)
+    print(f"[{files}] проект создан за {time.perf_counter() - started:.1f} с")
+
+    brain = AIBrain(root, provider=MockProvider())
+    analyzer = brain.analyzer
+    results: Dict[str, Dict] = {}
+
+    def record(name: str, stats: Dict[str, float]) -> None:
+        results[name] = stats
+        print(f"[{files}] {name}: median {stats['median'] * 1000:.3f} мс")
+
+    record("get_python_files", measure(analyzer.get_python_files, repeat))
+
+    sample = analyzer.get_python_files()[:200]
+    record("analyze_file", measure(lambda: [analyzer.analyze_file(p) for p in sample],
+                                   repeat, per=len(sample)))
+    record("get_project_stats", measure(analyzer.get_project_stats, repeat))
+    record("find_improvements", measure(analyzer.find_improvements, repeat))
+
+    def fresh_brain():
+        nonlocal brain
+        reset_state(root)
+        brain = AIBrain(root, provider=MockProvider())
+
+    record("scan_for_improvements", measure(lambda: brain.scan_for_improvements(), repeat, setup=fresh_brain))
+    # Повторный скан: все проблемы уже в очереди (путь дедупликации)
+    record("rescan_for_improvements", measure(lambda: brain.scan_for_improvements(), repeat))
+    record("save_state", measure(brain.save_state, repeat))
+    record("load_state", measure(brain.load_state, repeat))
+
+    tasks = [t for t in brain.get_pending_tasks() if t.task_type == "documentation"][:execute_runs]
+    if tasks:
+        queue = iter(tasks)
+        record("execute_task", measure(lambda: brain.execute_task(next(queue)), len(tasks)))
+    return results
+
+
+def git_revision() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, timeout=10)
+        return result.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Сравнить медианы с базовым прогоном, вернуть список регрессий"""
+    regressions = []
+    for size, ops in current["results"].items():
+        for name, stats in ops.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if not old or not old.get("median"):
+                continue
+            ratio = stats["median"] / old["median"]
+            mark = "РЕГРЕССИЯ" if ratio > threshold else ""
+            print(f"[{size}] {name}: {old['median'] * 1000:.3f} -> {stats['median'] * 1000:.3f} мс "
+                  f"(x{ratio:.2f}) {mark}")
+            if ratio > threshold:
+                regressions.append(f"{size}/{name}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки AI Brain")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Размеры проектов через запятую")
+    parser.add_argument("--repeat", type=int, default=3, help="Повторов каждого замера")
+    parser.add_argument("--execute-runs", type=int, default=3, help="Сколько задач выполнить (execute_task)")
+    parser.add_argument("--output", default="", help="Файл результатов JSON")
+    parser.add_argument("--compare", default="", help="JSON базового прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Порог регрессии (отношение медиан)")
+    parser.add_argument("--workdir", default="", help="Папка для синтетических проектов (по умолчанию временная)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="wa_bench_")
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    try:
+        for size in sizes:
+            report["results"][str(size)] = run_size(size, args.repeat, args.execute_runs, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Результаты сохранены: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"Регрессии: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Бенчмарк запуска
+Время холодного старта (новый интерпретатор) для режимов CLI и Dashboard
+и разбор импортов по `python -X importtime`. Проверяет бюджет времени и то,
+что тяжёлые необязательные зависимости не импортируются при старте.
+
+Запуск:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --budget cli=120 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Режим -> (код запуска, бюджет в мс сверх пустого интерпретатора)
+PROFILES = {
+    # brain без GUI: анализ и улучшение кода
+    "cli": (
+        "from src.ai_brain import AIBrain\n"
+        "from src.config import Config\n"
+        "from src.logger import get_logger\n",
+        150.0,
+    ),
+    # вкладки GUI: статистика системы, контроллер IDE, метрики
+    "dashboard": (
+        "from src.ai_brain import AIBrain\n"
+        "from src.core import WindsurfController\n"
+        "from src.windsurf_controller import WindsurfController as HotkeyController\n"
+        "from src.system_monitor import SystemMonitor\n"
+        "from src import metrics\n"
+        "SystemMonitor().close()\n",
+        200.0,
+    ),
+}
+
+# Импортируются только при первом использовании
+LAZY_MODULES = ("pyautogui", "pyperclip", "win32gui", "win32con", "httpx", "requests",
+                "pynvml", "http.server", "orjson")
+
+
+def run_python(code: str, importtime: bool = False) -> Tuple[float, str]:
+    """Запустить код в новом интерпретаторе; (время в мс, stderr)"""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", code]
+    started = time.perf_counter()
+    result = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Запуск завершился с кодом {result.returncode}:\n{result.stderr[-2000:]}")
+    return elapsed, result.stderr
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int, int]]:
+    """Строки importtime -> [(модуль, глубина, собственное мкс, накопленное мкс)]"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|", 2)
+        indent = len(name) - len(name.lstrip(" "))
+        # Один пробел после '|', далее по два пробела на уровень вложенности
+        rows.append((name.strip(), (indent - 1) // 2, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def median_ms(code: str, repeat: int) -> float:
+    return statistics.median(run_python(code)[0] for _ in range(repeat))
+
+
+def run_profile(code: str, repeat: int, baseline_ms: float, baseline_modules: set, top: int) -> Dict:
+    wall_ms = median_ms(code, repeat)
+    _, output = run_python(code, importtime=True)
+    rows = [r for r in parse_importtime(output) if r[0] not in baseline_modules]
+    imported = {r[0] for r in rows}
+    # Верхний уровень - модули, импортированные самим кодом запуска
+    import_ms = sum(r[3] for r in rows if r[1] == 0) / 1000
+    heaviest = sorted(rows, key=lambda r: r[3], reverse=True)[:top]
+    return {
+        "startup_ms": round(wall_ms - baseline_ms, 1),
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(import_ms, 1),
+        "modules": len(imported),
+        "heaviest": [{"module": name, "cumulative_ms": round(cum / 1000, 1), "self_ms": round(own / 1000, 1)}
+                     for name, _, own, cum in heaviest],
+        "eager_lazy_modules": sorted(m for m in LAZY_MODULES if m in imported),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк запуска (холодный старт)")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Режимы через запятую")
+    parser.add_argument("--repeat", type=int, default=5, help="Запусков на замер (берётся медиана)")
+    parser.add_argument("--budget", action="append", default=[], metavar="РЕЖИМ=МС",
+                        help="Переопределить бюджет, например cli=120")
+    parser.add_argument("--top", type=int, default=10, help="Сколько самых тяжёлых импортов показать")
+    parser.add_argument("--output", default="", help="Файл результатов JSON")
+    args = parser.parse_args()
+
+    budgets = {name: budget for name, (_, budget) in PROFILES.items()}
+    for item in args.budget:
+        name, _, value = item.partition("=")
+        budgets[name] = float(value)
+
+    baseline_ms = median_ms("pass", args.repeat)
+    _, output = run_python("pass", importtime=True)
+    baseline_modules = {r[0] for r in parse_importtime(output)}
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "interpreter_ms": round(baseline_ms, 1),
+        },
+        "results": {},
+    }
+    failures = []
+    for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        code, _ = PROFILES[name]
+        result = run_profile(code, args.repeat, baseline_ms, baseline_modules, args.top)
+        result["budget_ms"] = budgets[name]
+        report["results"][name] = result
+
+        print(f"\n{name}: {result['startup_ms']:.1f} мс (бюджет {budgets[name]:.0f} мс), "
+              f"импорты {result['import_ms']:.1f} мс, модулей {result['modules']}")
+        for item in result["heaviest"]:
+            print(f"  {item['cumulative_ms']:8.1f} мс  {item['module']}")
+        if result["startup_ms"] > budgets[name]:
+            failures.append(f"{name}: {result['startup_ms']:.1f} мс > {budgets[name]:.0f} мс")
+        if result["eager_lazy_modules"]:
+            failures.append(f"{name}: импортированы при старте {', '.join(result['eager_lazy_modules'])}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nРезультаты сохранены: {args.output}")
+
+    if failures:
+        print(f"\nПревышение: {'; '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
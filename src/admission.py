@@ -0,0 +1,211 @@
+"""
+Контроль допуска задач по загрузке системы
+Ограничивает число одновременных задач и прогонов тестов, когда CPU, RAM
+или диск выше верхних порогов, и возвращает лимиты, когда все показатели
+опустились ниже нижних (гистерезис). Показания берутся из SystemMonitor.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from . import metrics
+
+logger = logging.getLogger('WA.Admission')
+
+
+@dataclass
+class Watermarks:
+    """Пороги в процентах: выше high - ограничиваем, ниже low (по всем) - отпускаем"""
+    cpu_high: float = 90.0
+    cpu_low: float = 70.0
+    ram_high: float = 90.0
+    ram_low: float = 80.0
+    disk_high: float = 95.0
+    disk_low: float = 90.0
+
+
+class AdmissionController:
+    """
+    Слоты выполнения по видам работ ("task", "tests")
+
+    Лимит вида = floor(максимум * scale). При превышении верхнего порога scale
+    уменьшается вдвое (ниже 0.25 - до нуля, т.е. пауза), после возврата всех
+    показателей ниже нижних порогов растёт на recovery_step за проверку.
+
+    Вложенные виды (прогон тестов внутри уже допущенной задачи) не опускаются
+    ниже 1: иначе задача с применёнными изменениями ждала бы тестов бесконечно.
+    Пауза останавливает приём новых задач, а не их завершение.
+    """
+
+    def __init__(self, monitor, limits: Optional[Dict[str, int]] = None,
+                 watermarks: Optional[Watermarks] = None, check_interval: float = 1.0,
+                 recovery_step: float = 0.25, max_events: int = 100,
+                 nested: Tuple[str, ...] = ("tests",)):
+        """
+        Args:
+            monitor: SystemMonitor (лучше с запущенным фоновым сбором)
+            limits: Максимум одновременных работ по видам
+            watermarks: Пороги загрузки
+            check_interval: Как часто перечитывать показания, секунды
+            recovery_step: Прирост scale за проверку при восстановлении
+            nested: Виды работ, выполняемые внутри других (лимит не ниже 1)
+        """
+        self.monitor = monitor
+        self.limits = dict(limits or {"task": 4, "tests": 2})
+        self.nested = set(nested)
+        self.watermarks = watermarks or Watermarks()
+        self.check_interval = check_interval
+        self.recovery_step = recovery_step
+        self.scale = 1.0
+        self.throttled = False
+        self.throttle_count = 0
+        self.events: Deque[Dict] = deque(maxlen=max_events)
+        self._in_use: Dict[str, int] = {kind: 0 for kind in self.limits}
+        self._waiting: Dict[str, int] = {kind: 0 for kind in self.limits}
+        self._checked_at = 0.0
+        self._cond = threading.Condition()
+        self._publish()
+
+    # --- оценка загрузки ---
+
+    def _over(self, stats) -> List[str]:
+        w = self.watermarks
+        reasons = []
+        for name, value, high in (("cpu", stats.cpu_percent, w.cpu_high),
+                                  ("ram", stats.ram_percent, w.ram_high),
+                                  ("disk", stats.disk_percent, w.disk_high)):
+            if value >= high:
+                reasons.append(f"{name} {value:.0f}% >= {high:.0f}%")
+        return reasons
+
+    def _under(self, stats) -> bool:
+        w = self.watermarks
+        return (stats.cpu_percent < w.cpu_low and stats.ram_percent < w.ram_low
+                and stats.disk_percent < w.disk_low)
+
+    def update(self, stats=None) -> None:
+        """Перечитать показания и пересчитать лимиты (не чаще check_interval)"""
+        now = time.monotonic()
+        with self._cond:
+            if stats is None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+        if stats is None:
+            stats = self.monitor.get_stats()
+
+        with self._cond:
+            before = self.scale
+            reasons = self._over(stats)
+            if reasons:
+                self.scale = self.scale / 2 if self.scale > 0.25 else 0.0
+                if not self.throttled:
+                    self.throttled = True
+                    self.throttle_count += 1
+                    metrics.ADMISSION_THROTTLES.inc()
+                if self.scale != before:
+                    self._event("throttle", ", ".join(reasons))
+            elif self._under(stats) and self.scale < 1.0:
+                self.scale = min(1.0, self.scale + self.recovery_step)
+                if self.scale >= 1.0:
+                    self.throttled = False
+                self._event("recover", "нагрузка ниже нижних порогов")
+            if self.scale != before:
+                self._publish()
+                self._cond.notify_all()
+
+    def _event(self, action: str, reason: str) -> None:
+        limits = {kind: self.limit(kind) for kind in self.limits}
+        self.events.append({
+            "time": datetime.now().isoformat(),
+            "action": action,
+            "reason": reason,
+            "limits": limits,
+        })
+        logger.info(f"Допуск: {action} ({reason}), лимиты {limits}")
+
+    def _publish(self) -> None:
+        for kind in self.limits:
+            metrics.ADMISSION_LIMIT.set(self.limit(kind), kind=kind)
+            metrics.ADMISSION_IN_USE.set(self._in_use[kind], kind=kind)
+
+    # --- слоты ---
+
+    def limit(self, kind: str) -> int:
+        """Текущий лимит одновременных работ вида kind"""
+        limit = math.floor(self.limits[kind] * self.scale)
+        if kind in self.nested:
+            return max(1, limit)
+        return limit
+
+    def acquire(self, kind: str, timeout: Optional[float] = None,
+                cancel: Optional[threading.Event] = None) -> bool:
+        """
+        Занять слот (ждать, пока лимит позволит)
+
+        Returns:
+            False - истёк timeout или установлено событие отмены
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.update()
+        with self._cond:
+            self._waiting[kind] += 1
+            try:
+                while self._in_use[kind] >= self.limit(kind):
+                    if cancel is not None and cancel.is_set():
+                        return False
+                    wait = self.check_interval
+                    if deadline is not None:
+                        wait = min(wait, deadline - time.monotonic())
+                        if wait <= 0:
+                            return False
+                    self._cond.wait(wait)
+                    # Показания перечитываем без блокировки: monitor.get_stats может собирать снимок
+                    self._cond.release()
+                    try:
+                        self.update()
+                    finally:
+                        self._cond.acquire()
+                self._in_use[kind] += 1
+                metrics.ADMISSION_IN_USE.set(self._in_use[kind], kind=kind)
+                return True
+            finally:
+                self._waiting[kind] -= 1
+
+    def release(self, kind: str) -> None:
+        """Освободить слот"""
+        with self._cond:
+            self._in_use[kind] -= 1
+            metrics.ADMISSION_IN_USE.set(self._in_use[kind], kind=kind)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, kind: str, cancel: Optional[threading.Event] = None) -> Iterator[bool]:
+        """Контекст слота; выдаёт False, если ожидание прервано отменой"""
+        acquired = self.acquire(kind, cancel=cancel)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release(kind)
+
+    def stats(self) -> Dict:
+        """Состояние для get_stats(): лимиты, занятость, события ограничения"""
+        with self._cond:
+            return {
+                "scale": self.scale,
+                "throttled": self.throttled,
+                "throttle_count": self.throttle_count,
+                "limits": {kind: self.limit(kind) for kind in self.limits},
+                "max_limits": dict(self.limits),
+                "in_use": dict(self._in_use),
+                "waiting": dict(self._waiting),
+                "watermarks": asdict(self.watermarks),
+                "recent_events": list(self.events)[-10:],
+            }
@@ -3,28 +3,56 @@ AI Brain - Модуль для самоанализа и самоулучшен
 Использует Groq API (бесплатный) или Ollama (локальный).
 """
 
+import csv
 import json
 import os
 import re
 import subprocess
 import hashlib
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 import logging
 
+from . import metrics
+from .admission import AdmissionController, Watermarks
+from .exceptions import FileOperationError
+from .sandbox import Sandbox
+from .resource_usage import ResourceTracker, wait_process, watch_process
+from .scheduler import TaskScheduler
+from .test_impact import TestImpactSelector
+from .test_runner import FailureCollector, ParallelTestRunner
+from .test_worker import TestWorkerClient
+from .timing import PhaseTimer, summarize_phases
+from .tracing import current_span, span, traced, wrap
+from .transaction import FileTransaction
+
 logger = logging.getLogger('WA.AIBrain')
 
-# Попытка импорта HTTP клиента
-try:
-    import httpx
-    HTTP_AVAILABLE = True
-except ImportError:
+
+@lru_cache(maxsize=None)
+def _http_client():
+    """
+    HTTP клиент: httpx, иначе requests, иначе None
+    
+    Импорт при первом запросе к API - без сети (MockProvider, тесты) не нужен.
+    """
     try:
-        import requests as httpx
-        HTTP_AVAILABLE = True
+        import httpx
+        return httpx
     except ImportError:
-        HTTP_AVAILABLE = False
+        pass
+    try:
+        import requests
+        return requests
+    except ImportError:
+        return None
 
 
 @dataclass
@@ -39,6 +67,9 @@ class Task:
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
     completed_at: Optional[str] = None
     result: Optional[str] = None
+    task_type: Optional[str] = None  # documentation, type_hints, error_handling, todo
+    fingerprint: Optional[str] = None  # хэш содержимого файла + тип + место проблемы
+    failed_at: Optional[str] = None
     
     def to_dict(self) -> Dict:
         return {
@@ -50,7 +81,10 @@ class Task:
             "file_path": self.file_path,
             "created_at": self.created_at,
             "completed_at": self.completed_at,
-            "result": self.result
+            "result": self.result,
+            "task_type": self.task_type,
+            "fingerprint": self.fingerprint,
+            "failed_at": self.failed_at
         }
     
     @classmethod
@@ -67,6 +101,81 @@ class ImprovementResult:
     tests_passed: bool
     error: Optional[str] = None
     duration_seconds: float = 0.0
+    phases: Dict[str, float] = field(default_factory=dict)  # секунды по фазам
+    resources: Dict[str, float] = field(default_factory=dict)  # CPU, память, I/O задачи и подпроцессов
+
+
+@dataclass
+class TaskBatch:
+    """Группа задач, выполняемых одним запросом к AI"""
+    tasks: List[Task]
+    files: List[str]
+    size_bytes: int = 0
+
+
+class BatchPlanner:
+    """Планировщик пакетов: группирует мелкие задачи в один запрос к AI"""
+    
+    def __init__(self, project_path: str, max_tasks: int = 8,
+                 small_file_bytes: int = 4000, max_batch_bytes: int = 16000):
+        self.project_path = project_path
+        self.max_tasks = max_tasks
+        self.small_file_bytes = small_file_bytes
+        self.max_batch_bytes = max_batch_bytes
+    
+    def _file_size(self, rel_path: str) -> int:
+        try:
+            return os.path.getsize(os.path.join(self.project_path, rel_path))
+        except OSError:
+            return 0
+    
+    def plan(self, tasks: List[Task]) -> List[TaskBatch]:
+        """Разбить задачи на пакеты: по файлу, мелкие файлы - вместе"""
+        by_file: Dict[str, List[Task]] = {}
+        batches: List[TaskBatch] = []
+        
+        for task in tasks:
+            if not task.file_path:
+                # Задачи без файла выполняются по одной
+                batches.append(TaskBatch(tasks=[task], files=[]))
+                continue
+            by_file.setdefault(task.file_path, []).append(task)
+        
+        # Сначала файлы с самыми приоритетными задачами
+        groups = sorted(by_file.items(), key=lambda item: -max(t.priority for t in item[1]))
+        
+        current: Optional[TaskBatch] = None
+        for rel_path, file_tasks in groups:
+            size = self._file_size(rel_path)
+            
+            # Большой файл - отдельный пакет (или несколько, если задач много)
+            if size > self.small_file_bytes:
+                for i in range(0, len(file_tasks), self.max_tasks):
+                    batches.append(TaskBatch(
+                        tasks=file_tasks[i:i + self.max_tasks],
+                        files=[rel_path],
+                        size_bytes=size
+                    ))
+                continue
+            
+            # Мелкие файлы упаковываем вместе
+            if current is not None and (
+                len(current.tasks) + len(file_tasks) > self.max_tasks
+                or current.size_bytes + size > self.max_batch_bytes
+            ):
+                batches.append(current)
+                current = None
+            
+            if current is None:
+                current = TaskBatch(tasks=[], files=[])
+            current.tasks.extend(file_tasks)
+            current.files.append(rel_path)
+            current.size_bytes += size
+        
+        if current is not None:
+            batches.append(current)
+        
+        return batches
 
 
 class CodeAnalyzer:
@@ -74,6 +183,8 @@ class CodeAnalyzer:
     
     def __init__(self, project_path: str):
         self.project_path = project_path
+        # Число файлов, проанализированных последним find_improvements
+        self.files_analyzed = 0
     
     def get_python_files(self) -> List[str]:
         """Получить список Python файлов"""
@@ -99,6 +210,7 @@ class CodeAnalyzer:
         
         return {
             "path": filepath,
+            "content_hash": hashlib.sha1(content.encode('utf-8', errors='replace')).hexdigest(),
             "lines": len(lines),
             "size_bytes": len(content),
             "has_docstring": '"""' in content or "'''" in content,
@@ -110,6 +222,8 @@ class CodeAnalyzer:
             "fixme_count": len(re.findall(r'#\s*FIXME', content, re.IGNORECASE)),
             "long_lines": len([l for l in lines if len(l) > 120]),
             "empty_except": len(re.findall(r'except\s*:', content)),
+            "empty_except_lines": [i + 1 for i, l in enumerate(lines) if re.search(r'except\s*:', l)],
+            "todo_lines": [i + 1 for i, l in enumerate(lines) if re.search(r'#\s*TODO', l, re.IGNORECASE)],
         }
     
     def get_project_stats(self) -> Dict:
@@ -153,10 +267,57 @@ class CodeAnalyzer:
         
         return stats
     
+    def file_improvements(self, rel_path: str, analysis: Dict) -> List[Dict]:
+        """Улучшения одного файла по результату analyze_file"""
+        improvements = []
+        
+        # Проверяем различные проблемы
+        if not analysis["has_docstring"]:
+            improvements.append({
+                "type": "documentation",
+                "priority": 2,
+                "file": rel_path,
+                "description": f"Добавить docstrings в {rel_path}",
+                "location": "",
+                "content_hash": analysis["content_hash"]
+            })
+        
+        if not analysis["has_type_hints"] and analysis["functions_count"] > 0:
+            improvements.append({
+                "type": "type_hints",
+                "priority": 3,
+                "file": rel_path,
+                "description": f"Добавить type hints в {rel_path}",
+                "location": "",
+                "content_hash": analysis["content_hash"]
+            })
+        
+        if analysis["empty_except"] > 0:
+            improvements.append({
+                "type": "error_handling",
+                "priority": 4,
+                "file": rel_path,
+                "description": f"Исправить пустые except блоки в {rel_path}",
+                "location": ",".join(map(str, analysis["empty_except_lines"])),
+                "content_hash": analysis["content_hash"]
+            })
+        
+        if analysis["todo_count"] > 0:
+            improvements.append({
+                "type": "todo",
+                "priority": 3,
+                "file": rel_path,
+                "description": f"Реализовать TODO в {rel_path}",
+                "location": ",".join(map(str, analysis["todo_lines"])),
+                "content_hash": analysis["content_hash"]
+            })
+        return improvements
+    
     def find_improvements(self) -> List[Dict]:
         """Найти возможные улучшения"""
         improvements = []
         files = self.get_python_files()
+        self.files_analyzed = len(files)
         
         for filepath in files:
             analysis = self.analyze_file(filepath)
@@ -164,39 +325,7 @@ class CodeAnalyzer:
                 continue
             
             rel_path = os.path.relpath(filepath, self.project_path)
-            
-            # Проверяем различные проблемы
-            if not analysis["has_docstring"]:
-                improvements.append({
-                    "type": "documentation",
-                    "priority": 2,
-                    "file": rel_path,
-                    "description": f"Добавить docstrings в {rel_path}"
-                })
-            
-            if not analysis["has_type_hints"] and analysis["functions_count"] > 0:
-                improvements.append({
-                    "type": "type_hints",
-                    "priority": 3,
-                    "file": rel_path,
-                    "description": f"Добавить type hints в {rel_path}"
-                })
-            
-            if analysis["empty_except"] > 0:
-                improvements.append({
-                    "type": "error_handling",
-                    "priority": 4,
-                    "file": rel_path,
-                    "description": f"Исправить пустые except блоки в {rel_path}"
-                })
-            
-            if analysis["todo_count"] > 0:
-                improvements.append({
-                    "type": "todo",
-                    "priority": 3,
-                    "file": rel_path,
-                    "description": f"Реализовать TODO в {rel_path}"
-                })
+            improvements.extend(self.file_improvements(rel_path, analysis))
         
         # Сортируем по приоритету
         improvements.sort(key=lambda x: -x["priority"])
@@ -206,7 +335,17 @@ class CodeAnalyzer:
 class AIProvider:
     """Базовый класс для AI провайдеров"""
     
-    def generate(self, prompt: str, system: str = "") -> str:
+    def generate(self, prompt: str, system: str = "", temperature: Optional[float] = None,
+                 seed: Optional[int] = None) -> str:
+        """
+        Сгенерировать ответ
+        
+        Args:
+            prompt: Запрос
+            system: Системный промпт
+            temperature: Температура (None - значение провайдера по умолчанию)
+            seed: Seed генерации, если провайдер его поддерживает
+        """
         raise NotImplementedError
 
 
@@ -219,8 +358,10 @@ class GroqProvider(AIProvider):
         self.api_key = api_key
         self.model = model
     
-    def generate(self, prompt: str, system: str = "") -> str:
-        if not HTTP_AVAILABLE:
+    def generate(self, prompt: str, system: str = "", temperature: Optional[float] = None,
+                 seed: Optional[int] = None) -> str:
+        httpx = _http_client()
+        if httpx is None:
             raise RuntimeError("httpx или requests не установлен")
         
         messages = []
@@ -236,25 +377,44 @@ class GroqProvider(AIProvider):
         data = {
             "model": self.model,
             "messages": messages,
-            "temperature": 0.3,
+            "temperature": 0.3 if temperature is None else temperature,
             "max_tokens": 4096
         }
+        if seed is not None:
+            data["seed"] = seed
         
-        try:
-            if hasattr(httpx, 'Client'):
-                # httpx
-                with httpx.Client(timeout=60) as client:
-                    response = client.post(self.API_URL, headers=headers, json=data)
-                    response.raise_for_status()
-                    return response.json()["choices"][0]["message"]["content"]
-            else:
-                # requests
-                response = httpx.post(self.API_URL, headers=headers, json=data, timeout=60)
+        with span("llm.generate", **{
+            "gen_ai.system": "groq",
+            "gen_ai.request.model": self.model,
+            "http.url": self.API_URL,
+            "http.request.body.size": len(prompt) + len(system),
+        }) as s:
+            started = time.perf_counter()
+            try:
+                if hasattr(httpx, 'Client'):
+                    # httpx
+                    with httpx.Client(timeout=60) as client:
+                        response = client.post(self.API_URL, headers=headers, json=data)
+                else:
+                    # requests
+                    response = httpx.post(self.API_URL, headers=headers, json=data, timeout=60)
+                s.set_attribute("http.status_code", response.status_code)
                 response.raise_for_status()
-                return response.json()["choices"][0]["message"]["content"]
-        except Exception as e:
-            logger.error(f"Groq API error: {e}")
-            raise
+                payload = response.json()
+                usage = payload.get("usage") or {}
+                s.set_attributes(**{
+                    "http.response.body.size": len(response.content),
+                    "gen_ai.usage.input_tokens": usage.get("prompt_tokens", 0),
+                    "gen_ai.usage.output_tokens": usage.get("completion_tokens", 0),
+                })
+                metrics.LLM_LATENCY.observe(time.perf_counter() - started, provider="groq")
+                metrics.LLM_TOKENS.inc(usage.get("prompt_tokens", 0), provider="groq", kind="input")
+                metrics.LLM_TOKENS.inc(usage.get("completion_tokens", 0), provider="groq", kind="output")
+                return payload["choices"][0]["message"]["content"]
+            except Exception as e:
+                metrics.LLM_ERRORS.inc(provider="groq")
+                logger.error(f"Groq API error: {e}")
+                raise
 
 
 class OllamaProvider(AIProvider):
@@ -264,8 +424,10 @@ class OllamaProvider(AIProvider):
         self.model = model
         self.host = host
     
-    def generate(self, prompt: str, system: str = "") -> str:
-        if not HTTP_AVAILABLE:
+    def generate(self, prompt: str, system: str = "", temperature: Optional[float] = None,
+                 seed: Optional[int] = None) -> str:
+        httpx = _http_client()
+        if httpx is None:
             raise RuntimeError("httpx или requests не установлен")
         
         url = f"{self.host}/api/generate"
@@ -275,20 +437,43 @@ class OllamaProvider(AIProvider):
             "system": system,
             "stream": False
         }
+        options = {}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if seed is not None:
+            options["seed"] = seed
+        if options:
+            data["options"] = options
         
-        try:
-            if hasattr(httpx, 'Client'):
-                with httpx.Client(timeout=120) as client:
-                    response = client.post(url, json=data)
-                    response.raise_for_status()
-                    return response.json()["response"]
-            else:
-                response = httpx.post(url, json=data, timeout=120)
+        with span("llm.generate", **{
+            "gen_ai.system": "ollama",
+            "gen_ai.request.model": self.model,
+            "http.url": url,
+            "http.request.body.size": len(prompt) + len(system),
+        }) as s:
+            started = time.perf_counter()
+            try:
+                if hasattr(httpx, 'Client'):
+                    with httpx.Client(timeout=120) as client:
+                        response = client.post(url, json=data)
+                else:
+                    response = httpx.post(url, json=data, timeout=120)
+                s.set_attribute("http.status_code", response.status_code)
                 response.raise_for_status()
-                return response.json()["response"]
-        except Exception as e:
-            logger.error(f"Ollama error: {e}")
-            raise
+                payload = response.json()
+                s.set_attributes(**{
+                    "http.response.body.size": len(response.content),
+                    "gen_ai.usage.input_tokens": payload.get("prompt_eval_count", 0),
+                    "gen_ai.usage.output_tokens": payload.get("eval_count", 0),
+                })
+                metrics.LLM_LATENCY.observe(time.perf_counter() - started, provider="ollama")
+                metrics.LLM_TOKENS.inc(payload.get("prompt_eval_count", 0), provider="ollama", kind="input")
+                metrics.LLM_TOKENS.inc(payload.get("eval_count", 0), provider="ollama", kind="output")
+                return payload["response"]
+            except Exception as e:
+                metrics.LLM_ERRORS.inc(provider="ollama")
+                logger.error(f"Ollama error: {e}")
+                raise
 
 
 class AIBrain:
@@ -305,10 +490,32 @@ class AIBrain:
 ```
 """
     
-    def __init__(self, project_path: str, provider: Optional[AIProvider] = None):
+    FILE_BLOCK_PATTERN = re.compile(r'```python\n#\s*filepath:\s*(.+?)\s*\n(.*?)```', re.DOTALL)
+    
+    def __init__(self, project_path: str, provider: Optional[AIProvider] = None,
+                 strict_compile: bool = False, test_jobs: int = 1, candidates: int = 1):
         self.project_path = project_path
         self.provider = provider
+        # Строгий режим: дополнительно проверять файл через py_compile в subprocess
+        self.strict_compile = strict_compile
         self.analyzer = CodeAnalyzer(project_path)
+        self.planner = BatchPlanner(project_path)
+        self.scheduler = TaskScheduler(project_path)
+        self.test_selector = TestImpactSelector(project_path)
+        # test_jobs > 1 - шардирование тестов по процессам, 0 - по числу ядер
+        self.test_runner = ParallelTestRunner(project_path, jobs=test_jobs)
+        # Пауза перед повтором проваленной задачи и лимит закрытых задач в списке
+        self.retry_cooldown_seconds = 3600
+        self.max_closed_tasks = 200
+        # Сколько вариантов ответа запрашивать на задачу (best-of-N)
+        self.candidates = candidates
+        # Режим песочниц для параллельной проверки: copy или hardlink (ссылки только на .py)
+        self.sandbox_mode = "copy"
+        self._merge_lock = threading.Lock()
+        # Прогретый воркер pytest (см. start_test_worker), None - обычный subprocess
+        self.test_worker: Optional[TestWorkerClient] = None
+        # Контроль допуска по загрузке системы (см. enable_admission), None - без ограничений
+        self.admission: Optional[AdmissionController] = None
         self.tasks: List[Task] = []
         self.history: List[ImprovementResult] = []
         self.tasks_file = os.path.join(project_path, "tasks", "improvement_tasks.json")
@@ -328,6 +535,7 @@ class AIBrain:
                     self.tasks = [Task.from_dict(t) for t in data]
             except Exception as e:
                 logger.error(f"Ошибка загрузки задач: {e}")
+            self._fingerprint_legacy_tasks()
         
         if os.path.exists(self.history_file):
             try:
@@ -335,6 +543,9 @@ class AIBrain:
                     self.history = json.load(f)
             except Exception as e:
                 logger.error(f"Ошибка загрузки истории: {e}")
+        
+        self.scheduler.rebuild(self.tasks)
+        self.scheduler.load_history(self.history)
     
     def save_state(self):
         """Сохранить состояние"""
@@ -354,42 +565,190 @@ class AIBrain:
         """Генерация уникального ID задачи"""
         return hashlib.md5(f"{title}{datetime.now().isoformat()}".encode()).hexdigest()[:8]
     
+    @staticmethod
+    def improvement_fingerprint(imp: Dict) -> str:
+        """Отпечаток проблемы: файл, тип, место и хэш содержимого файла"""
+        key = f"{imp['file']}|{imp['type']}|{imp.get('location', '')}|{imp.get('content_hash', '')}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    
+    def _fingerprint_legacy_tasks(self) -> None:
+        """
+        Дать отпечаток открытым задачам старого формата (без fingerprint)
+        
+        Тип задачи, если его нет, восстанавливается из описания или заголовка;
+        задача, тип которой не восстановить, закрывается. Отпечаток считается по текущему содержимому файла, как при сканировании.
+        Если проблемы этого типа в файле уже нет, отпечаток не совпадёт ни с одной
+        проблемой и задача закроется при следующем сканировании. Дубликат задачи,
+        уже поставленной с отпечатком, закрывается сразу.
+        """
+        open_statuses = ("pending", "failed", "in_progress")
+        legacy = [t for t in self.tasks
+                  if not t.fingerprint and t.status in open_statuses and t.file_path]
+        if not legacy:
+            return
+        known = {t.fingerprint for t in self.tasks if t.fingerprint and t.status in open_statuses}
+        for task in legacy:
+            task.task_type = task.task_type or self._legacy_task_type(task)
+            if not task.task_type:
+                # Тип не восстановить - задачу поставит заново сканирование
+                task.status = "superseded"
+                task.result = "Задача старого формата без типа"
+                continue
+            analysis = self.analyzer.analyze_file(os.path.join(self.project_path, task.file_path))
+            # Файла нет или проблемы больше нет - отпечаток без места проблемы
+            imp = {"file": task.file_path, "type": task.task_type,
+                   "content_hash": analysis.get("content_hash", "")}
+            if "error" not in analysis:
+                imp = next((i for i in self.analyzer.file_improvements(task.file_path, analysis)
+                            if i["type"] == task.task_type), imp)
+            task.fingerprint = self.improvement_fingerprint(imp)
+            if task.fingerprint in known:
+                task.status = "superseded"
+                task.result = "Дубликат задачи с отпечатком"
+            else:
+                known.add(task.fingerprint)
+        logger.info(f"Обработаны задачи старого формата: {len(legacy)}")
+    
+    # Заголовки задач старого формата -> тип задачи
+    LEGACY_TITLE_TYPES = (
+        ("Добавить docstrings в ", "documentation"),
+        ("Добавить type hints в ", "type_hints"),
+        ("Исправить пустые except блоки в ", "error_handling"),
+        ("Реализовать TODO в ", "todo"),
+    )
+    
+    @classmethod
+    def _legacy_task_type(cls, task: Task) -> Optional[str]:
+        """Тип задачи старого формата: из описания ("Тип: ...") или по заголовку"""
+        for line in (task.description or "").splitlines():
+            if line.startswith("Тип:"):
+                task_type = line[len("Тип:"):].strip()
+                if task_type:
+                    return task_type
+        for prefix, task_type in cls.LEGACY_TITLE_TYPES:
+            if (task.title or "").startswith(prefix):
+                return task_type
+        return None
+    
+    def _cooldown_passed(self, task: Task, now: datetime) -> bool:
+        """Прошла ли пауза перед повтором проваленной задачи"""
+        if not task.failed_at:
+            return True
+        try:
+            failed_at = datetime.fromisoformat(task.failed_at)
+        except ValueError:
+            return True
+        return (now - failed_at).total_seconds() >= self.retry_cooldown_seconds
+    
+    @traced("brain.scan")
     def scan_for_improvements(self) -> List[Task]:
-        """Сканировать проект и создать задачи"""
+        """
+        Сканировать проект и создать задачи
+        
+        Проблема, для которой уже есть открытая задача с тем же отпечатком,
+        повторно не ставится в очередь. Невыполненные и проваленные задачи, чьего отпечатка больше нет (файл
+        исправлен, изменён или удалён), закрываются со статусом superseded.
+        Проваленные задачи возвращаются в очередь только после паузы.
+        """
+        scan_started = time.perf_counter()
         improvements = self.analyzer.find_improvements()
-        new_tasks = []
+        scan_seconds = time.perf_counter() - scan_started
+        metrics.SCAN_DURATION.observe(scan_seconds)
+        metrics.SCAN_FILES.inc(self.analyzer.files_analyzed)
+        if scan_seconds > 0:
+            metrics.SCAN_FILES_RATE.set(self.analyzer.files_analyzed / scan_seconds)
+        current = {self.improvement_fingerprint(imp): imp for imp in improvements}
+        current_files = {imp["file"] for imp in improvements}
+        now = datetime.now()
+        # Только открытые задачи: закрытая задача не мешает поставить проблему
+        # заново, если файл вернулся к уже встречавшемуся содержимому
+        by_fingerprint = {t.fingerprint: t for t in self.tasks
+                          if t.fingerprint and t.status in ("pending", "in_progress", "failed")}
+        
+        # Закрываем устаревшие задачи
+        superseded = 0
+        for task in self.tasks:
+            if task.status not in ("pending", "failed") or not task.file_path:
+                continue
+            if task.fingerprint:
+                stale = task.fingerprint not in current
+            else:
+                # Задачи без отпечатка (старый формат): устарели, если по файлу больше нет проблем
+                stale = task.file_path not in current_files
+            if stale:
+                task.status = "superseded"
+                task.result = "Проблема исчезла или файл изменился"
+                superseded += 1
         
-        for imp in improvements:
-            # Проверяем, нет ли уже такой задачи
-            existing = [t for t in self.tasks if t.file_path == imp["file"] and t.status == "pending"]
-            if existing:
+        new_tasks = []
+        for fingerprint, imp in current.items():
+            existing = by_fingerprint.get(fingerprint)
+            if existing is not None:
+                # Проваленную задачу повторяем после паузы, остальные - не трогаем
+                if existing.status == "failed" and self._cooldown_passed(existing, now):
+                    existing.status = "pending"
+                    self.scheduler.push(existing)
                 continue
             
             task = Task(
-                id=self.generate_task_id(imp["description"]),
+                id=self.generate_task_id(imp["description"] + fingerprint),
                 title=imp["description"],
                 description=f"Тип: {imp['type']}\nФайл: {imp['file']}",
                 priority=imp["priority"],
                 status="pending",
-                file_path=imp["file"]
+                file_path=imp["file"],
+                task_type=imp["type"],
+                fingerprint=fingerprint
             )
             new_tasks.append(task)
-            self.tasks.append(task)
+            self.add_task(task)
         
+        current_span().set_attributes(**{
+            "scan.improvements": len(current),
+            "scan.new_tasks": len(new_tasks),
+            "scan.superseded": superseded,
+        })
+        if superseded:
+            metrics.TASKS_TOTAL.inc(superseded, status="superseded")
+            logger.info(f"Закрыто устаревших задач: {superseded}")
+        metrics.TASKS_PENDING.set(len(self.scheduler))
+        self._prune_closed()
         self.save_state()
         return new_tasks
     
+    def _prune_closed(self):
+        """Ограничить число закрытых задач в списке (самые старые удаляются)"""
+        closed = [t for t in self.tasks if t.status in ("completed", "superseded")]
+        excess = len(closed) - self.max_closed_tasks
+        if excess <= 0:
+            return
+        drop = {id(t) for t in sorted(closed, key=lambda t: t.created_at)[:excess]}
+        self.tasks = [t for t in self.tasks if id(t) not in drop]
+    
     def get_pending_tasks(self) -> List[Task]:
         """Получить невыполненные задачи"""
         return [t for t in self.tasks if t.status == "pending"]
     
+    def add_task(self, task: Task):
+        """Добавить задачу в список и в очередь планировщика"""
+        self.tasks.append(task)
+        if task.status == "pending":
+            self.scheduler.push(task)
+    
     def get_next_task(self) -> Optional[Task]:
-        """Получить следующую задачу по приоритету"""
-        pending = self.get_pending_tasks()
-        if not pending:
-            return None
-        pending.sort(key=lambda x: -x.priority)
-        return pending[0]
+        """Получить следующую задачу (приоритет, возраст, стоимость, успешность типа)"""
+        task = self.scheduler.peek()
+        if task is None and self.get_pending_tasks():
+            # Задачи добавлены в self.tasks в обход add_task
+            self.scheduler.rebuild(self.tasks)
+            task = self.scheduler.peek()
+        return task
+    
+    def get_task_scores(self, limit: int = 10) -> List[Dict]:
+        """Оценки планировщика для невыполненных задач (для настройки весов)"""
+        scores = [self.scheduler.explain(t) for t in self.get_pending_tasks()]
+        scores.sort(key=lambda x: -x["score"])
+        return scores[:limit]
     
     def generate_improvement_prompt(self, task: Task) -> str:
         """Создать промпт для улучшения"""
@@ -413,90 +772,233 @@ class AIBrain:
 Внеси необходимые улучшения в код. Верни ПОЛНЫЙ обновлённый файл.
 """
     
-    def run_tests(self) -> Tuple[bool, str]:
-        """Запустить тесты"""
+    @traced("brain.plan")
+    def plan_batches(self) -> List[TaskBatch]:
+        """Сгруппировать невыполненные задачи в пакеты"""
+        batches = self.planner.plan(self.get_pending_tasks())
+        current_span().set_attribute("plan.batches", len(batches))
+        return batches
+    
+    def generate_batch_prompt(self, batch: TaskBatch) -> str:
+        """Создать общий промпт для пакета задач"""
+        if len(batch.tasks) == 1:
+            return self.generate_improvement_prompt(batch.tasks[0])
+        
+        parts = ["Задачи:"]
+        for task in batch.tasks:
+            parts.append(f"- [{task.id}] {task.title}")
+        
+        for rel_path in batch.files:
+            filepath = os.path.join(self.project_path, rel_path)
+            if not os.path.exists(filepath):
+                parts.append(f"\nФайл не найден: {rel_path}")
+                continue
+            with open(filepath, 'r', encoding='utf-8') as f:
+                content = f.read()
+            parts.append(f"\nФайл: {rel_path}\n```python\n{content}\n```")
+        
+        parts.append(
+            "\nВыполни все задачи. Для КАЖДОГО изменённого файла верни ПОЛНЫЙ обновлённый файл "
+            "отдельным блоком, первая строка блока - `# filepath: <путь к файлу>`."
+        )
+        return "\n".join(parts)
+    
+    def extract_file_blocks(self, response: str) -> Dict[str, str]:
+        """Разобрать ответ AI на блоки кода по файлам"""
+        blocks = {}
+        for match in self.FILE_BLOCK_PATTERN.finditer(response):
+            rel_path = os.path.normpath(match.group(1).strip())
+            blocks[rel_path] = match.group(2)
+        return blocks
+    
+    def _test_targets(self, changed_files: Optional[List[str]]) -> List[str]:
+        """Тесты для прогона: затронутые изменением или вся папка tests/"""
+        if changed_files and self.test_selector:
+            selected = self.test_selector.select(changed_files)
+            if selected is not None:
+                return selected
+        return ["tests/"]
+    
+    @traced("brain.tests")
+    def run_tests(self, changed_files: Optional[List[str]] = None,
+                  gate: bool = False) -> Tuple[bool, str]:
+        """
+        Запустить тесты
+        
+        Если переданы изменённые файлы, запускаются только затронутые ими тесты
+        (с периодическим полным прогоном для подстраховки).
+        В режиме gate прогон останавливается на первом падении (-x),
+        а вывод начинается с этого падения.
+        """
+        targets = self._test_targets(changed_files)
+        current_span().set_attributes(**{"tests.targets": len(targets), "tests.gate": gate})
+        if not targets:
+            return True, "Нет тестов, затронутых изменением"
+        
+        started = time.perf_counter()
+        with self._admit("tests"):
+            success, output = self._run_test_targets(targets, gate)
+        metrics.TEST_DURATION.observe(time.perf_counter() - started, result="passed" if success else "failed")
+        return success, output
+    
+    def _run_test_targets(self, targets: List[str], gate: bool) -> Tuple[bool, str]:
+        if self.test_worker is not None:
+            args = [*targets, "-q" if gate else "-v", "--tb=short"] + (["-x"] if gate else [])
+            try:
+                returncode, output = self.test_worker.run(args, timeout=self.test_runner.timeout)
+                collector = FailureCollector()
+                for line in output.splitlines():
+                    collector.feed(line)
+                return returncode == 0, collector.output()
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Воркер тестов недоступен, запускаем pytest напрямую: {e}")
+                self.test_worker = None
+        
         try:
-            result = subprocess.run(
-                ["python", "-m", "pytest", "tests/", "-v", "--tb=short"],
-                cwd=self.project_path,
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
-            success = result.returncode == 0
-            output = result.stdout + result.stderr
-            return success, output
-        except subprocess.TimeoutExpired:
-            return False, "Тесты превысили таймаут"
+            return self.test_runner.run(targets, fail_fast=gate, verbose=not gate)
         except FileNotFoundError:
             return True, "pytest не найден, пропускаем тесты"
         except Exception as e:
             return False, str(e)
     
-    def apply_improvement(self, task: Task, new_code: str) -> bool:
-        """Применить улучшение к файлу"""
+    def enable_admission(self, monitor, max_tasks: int = 4, max_tests: int = 2,
+                         watermarks: Optional[Watermarks] = None) -> AdmissionController:
+        """
+        Ограничивать одновременные задачи и прогоны тестов по загрузке системы
+        
+        Args:
+            monitor: SystemMonitor (желательно с запущенным фоновым сбором)
+            max_tasks: Максимум одновременных execute_task
+            max_tests: Максимум одновременных прогонов тестов
+            watermarks: Пороги CPU/RAM/диска
+        """
+        self.admission = AdmissionController(monitor, {"task": max_tasks, "tests": max_tests}, watermarks)
+        return self.admission
+    
+    def _admit(self, kind: str, cancel: Optional[threading.Event] = None):
+        """Слот выполнения вида kind (без контроля допуска - пустой контекст)"""
+        if self.admission is None:
+            return nullcontext()
+        return self.admission.slot(kind, cancel)
+    
+    def start_test_worker(self, warm_modules: Optional[List[str]] = None) -> bool:
+        """Запустить прогретый воркер pytest для быстрых прогонов тестов"""
+        if self.test_worker is not None and self.test_worker.available():
+            return True
+        self.test_worker = TestWorkerClient.spawn(self.project_path, warm_modules)
+        return self.test_worker is not None
+    
+    def stop_test_worker(self):
+        """Остановить воркер pytest"""
+        if self.test_worker is not None:
+            self.test_worker.shutdown()
+            self.test_worker = None
+    
+    def check_syntax(self, code: str, filename: str = "<ai>") -> Tuple[bool, str]:
+        """Проверить синтаксис кода в памяти, без запуска интерпретатора"""
+        try:
+            compile(code, filename, 'exec', dont_inherit=True)
+            return True, ""
+        except (SyntaxError, ValueError) as e:
+            return False, str(e)
+    
+    def _strict_compile_check(self, code: str) -> Tuple[bool, str]:
+        """Проверка через py_compile в отдельном интерпретаторе (строгий режим)"""
+        fd, tmp_path = tempfile.mkstemp(suffix=".py")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(code)
+            process = subprocess.Popen(
+                ["python", "-m", "py_compile", tmp_path],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            tracker = watch_process(process)
+            stderr = process.stderr.read()
+            process.stderr.close()
+            return wait_process(process, tracker) == 0, stderr
+        finally:
+            os.remove(tmp_path)
+    
+    def extract_code(self, response: str) -> str:
+        """Извлечь код из ответа AI"""
+        code_match = re.search(r'```python\n(.*?)```', response, re.DOTALL)
+        if code_match:
+            return code_match.group(1)
+        return response
+    
+    @traced("brain.apply")
+    def apply_improvement(self, task: Task, new_code: str,
+                          transaction: Optional[FileTransaction] = None) -> bool:
+        """
+        Применить улучшение к файлу
+        
+        Если передана транзакция, изменение только добавляется в неё,
+        применять (commit) и откатывать (rollback) её должен вызывающий.
+        """
         if not task.file_path:
+            metrics.APPLY_FAILURES.inc(reason="no_file")
             return False
         
         filepath = os.path.join(self.project_path, task.file_path)
         
-        # Извлекаем код из ответа AI
-        code_match = re.search(r'```python\n(.*?)```', new_code, re.DOTALL)
-        if code_match:
-            new_code = code_match.group(1)
+        new_code = self.extract_code(new_code)
+        current_span().set_attributes(**{"task.file": task.file_path, "apply.bytes": len(new_code)})
         
-        # Создаём бэкап
-        backup_path = filepath + ".bak"
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                original = f.read()
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                f.write(original)
-        except Exception as e:
-            logger.error(f"Ошибка создания бэкапа: {e}")
+        # Проверяем синтаксис в памяти, до записи на диск
+        syntax_ok, syntax_error = self.check_syntax(new_code, filepath)
+        if not syntax_ok:
+            metrics.APPLY_FAILURES.inc(reason="syntax")
+            logger.error(f"Синтаксическая ошибка: {syntax_error}")
             return False
         
-        # Применяем изменения
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(new_code)
-            
-            # Проверяем синтаксис
-            result = subprocess.run(
-                ["python", "-m", "py_compile", filepath],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode != 0:
-                # Откатываем
-                with open(backup_path, 'r', encoding='utf-8') as f:
-                    original = f.read()
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(original)
-                logger.error(f"Синтаксическая ошибка: {result.stderr}")
+        # Строгий режим: проверка отдельным интерпретатором, тоже до записи в проект
+        if self.strict_compile:
+            syntax_ok, syntax_error = self._strict_compile_check(new_code)
+            if not syntax_ok:
+                metrics.APPLY_FAILURES.inc(reason="strict_compile")
+                logger.error(f"Синтаксическая ошибка: {syntax_error}")
                 return False
+        
+        try:
+            if transaction is not None:
+                transaction.stage(filepath, new_code)
+                return True
             
-            # Удаляем бэкап
-            os.remove(backup_path)
+            with FileTransaction() as tx:
+                tx.stage(filepath, new_code)
+                tx.commit()
             return True
-            
-        except Exception as e:
+        except FileOperationError as e:
+            metrics.APPLY_FAILURES.inc(reason="io")
             logger.error(f"Ошибка применения изменений: {e}")
-            # Пытаемся откатить
-            if os.path.exists(backup_path):
-                with open(backup_path, 'r', encoding='utf-8') as f:
-                    original = f.read()
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(original)
             return False
     
     def execute_task(self, task: Task) -> ImprovementResult:
         """Выполнить задачу улучшения"""
-        start_time = datetime.now()
+        with span("brain.execute_task", **{
+            "task.id": task.id,
+            "task.file": task.file_path or "",
+            "task.type": task.task_type or "",
+        }) as task_span, self._admit("task"), ResourceTracker() as tracker:
+            result = self._execute_task(task, tracker)
+            task_span.set_attributes(**{"task.success": result.success, "task.duration": result.duration_seconds})
+            return result
+    
+    def _execute_task(self, task: Task, tracker: ResourceTracker) -> ImprovementResult:
+        timer = PhaseTimer()
         task.status = "in_progress"
         self.save_state()
         
+        # Best-of-N: несколько кандидатов параллельно, каждый в своей песочнице
+        if self.candidates > 1 and self.provider and task.file_path:
+            result = self._execute_speculative(task, self.candidates)
+            result.resources = tracker.usage()
+            self._record_history(result)
+            self.save_state()
+            return result
+        
         result = ImprovementResult(
             success=False,
             task=task,
@@ -511,29 +1013,43 @@ class AIBrain:
             self.save_state()
             return result
         
+        transaction: Optional[FileTransaction] = None
         try:
             # Генерируем промпт
-            prompt = self.generate_improvement_prompt(task)
+            with timer.phase("prompt"):
+                prompt = self.generate_improvement_prompt(task)
             
             # Получаем ответ от AI
             logger.info(f"Запрос к AI для задачи: {task.title}")
-            response = self.provider.generate(prompt, self.SYSTEM_PROMPT)
+            with timer.phase("llm"):
+                response = self.provider.generate(prompt, self.SYSTEM_PROMPT)
             
             # Применяем изменения
             if task.file_path:
-                if self.apply_improvement(task, response):
+                transaction = FileTransaction()
+                with timer.phase("apply"):
+                    applied = self.apply_improvement(task, response, transaction)
+                    if applied:
+                        transaction.commit()
+                if applied:
                     result.changes_made.append(f"Обновлён файл: {task.file_path}")
                     
-                    # Запускаем тесты
-                    tests_ok, test_output = self.run_tests()
+                    # Запускаем тесты, затронутые изменением
+                    with timer.phase("tests"):
+                        tests_ok, test_output = self.run_tests([task.file_path], gate=True)
                     result.tests_passed = tests_ok
                     
                     if tests_ok:
+                        transaction.release()
                         result.success = True
                         task.status = "completed"
                         task.completed_at = datetime.now().isoformat()
                         task.result = "Успешно улучшено"
                     else:
+                        # Откатываем изменения, не прошедшие тесты
+                        with timer.phase("apply"):
+                            transaction.rollback()
+                        result.changes_made.append(f"Откачен файл: {task.file_path}")
                         result.error = f"Тесты не прошли: {test_output[:500]}"
                         task.status = "failed"
                         task.result = result.error
@@ -552,21 +1068,374 @@ class AIBrain:
             task.status = "failed"
             task.result = str(e)
             logger.error(f"Ошибка выполнения задачи: {e}")
+        finally:
+            # Изменения, не подтверждённые release() (исключение в тестах и т.п.), не оставляем в проекте
+            if transaction is not None and transaction.pending:
+                transaction.rollback()
+                result.changes_made.append(f"Откачен файл: {task.file_path}")
         
-        result.duration_seconds = (datetime.now() - start_time).total_seconds()
+        result.phases = timer.as_dict()
+        result.duration_seconds = result.phases["total"]
+        result.resources = tracker.usage()
         
         # Сохраняем в историю
+        self._record_history(result)
+        
+        self.save_state()
+        return result
+    
+    @traced("brain.execute_batch")
+    def execute_batch(self, batch: TaskBatch) -> List[ImprovementResult]:
+        """Выполнить пакет задач одним запросом к AI и одним прогоном тестов"""
+        if len(batch.tasks) == 1:
+            return [self.execute_task(batch.tasks[0])]
+        with self._admit("task"), ResourceTracker() as tracker:
+            return self._execute_batch(batch, tracker)
+    
+    def _execute_batch(self, batch: TaskBatch, tracker: ResourceTracker) -> List[ImprovementResult]:
+        current_span().set_attributes(**{
+            "batch.tasks": len(batch.tasks),
+            "batch.files": len(batch.files),
+            "batch.bytes": batch.size_bytes,
+        })
+        timer = PhaseTimer()
+        for task in batch.tasks:
+            task.status = "in_progress"
+        self.save_state()
+        
+        results = {
+            task.id: ImprovementResult(success=False, task=task, changes_made=[], tests_passed=False)
+            for task in batch.tasks
+        }
+        
+        def fail(task: Task, error: str):
+            results[task.id].error = error
+            task.status = "failed"
+            task.result = error
+        
+        if not self.provider:
+            for task in batch.tasks:
+                fail(task, "AI провайдер не настроен")
+        else:
+            transaction: Optional[FileTransaction] = None
+            try:
+                with timer.phase("prompt"):
+                    prompt = self.generate_batch_prompt(batch)
+                logger.info(f"Запрос к AI для пакета из {len(batch.tasks)} задач")
+                with timer.phase("llm"):
+                    response = self.provider.generate(prompt, self.SYSTEM_PROMPT)
+                blocks = self.extract_file_blocks(response)
+                
+                # Собираем изменения всех файлов в одну транзакцию
+                transaction = FileTransaction()
+                applied = []
+                with timer.phase("apply"):
+                    for rel_path in batch.files:
+                        file_tasks = [t for t in batch.tasks if t.file_path == rel_path]
+                        code = blocks.get(os.path.normpath(rel_path))
+                        if code is None:
+                            for task in file_tasks:
+                                fail(task, "AI не вернул файл в ответе")
+                        elif self.apply_improvement(file_tasks[0], code, transaction):
+                            applied.extend(file_tasks)
+                        else:
+                            for task in file_tasks:
+                                fail(task, "Не удалось применить изменения")
+                
+                # Один коммит и один прогон тестов на весь пакет
+                if applied:
+                    with timer.phase("apply"):
+                        transaction.commit()
+                    for task in applied:
+                        results[task.id].changes_made.append(f"Обновлён файл: {task.file_path}")
+                    
+                    with timer.phase("tests"):
+                        tests_ok, test_output = self.run_tests(
+                            sorted({task.file_path for task in applied}), gate=True)
+                    if tests_ok:
+                        transaction.release()
+                    else:
+                        with timer.phase("apply"):
+                            transaction.rollback()
+                    
+                    for task in applied:
+                        result = results[task.id]
+                        result.tests_passed = tests_ok
+                        if tests_ok:
+                            result.success = True
+                            task.status = "completed"
+                            task.completed_at = datetime.now().isoformat()
+                            task.result = "Успешно улучшено"
+                        else:
+                            result.changes_made.append(f"Откачен файл: {task.file_path}")
+                            fail(task, f"Тесты не прошли: {test_output[:500]}")
+            
+            except Exception as e:
+                for task in batch.tasks:
+                    if task.status == "in_progress":
+                        fail(task, str(e))
+                logger.error(f"Ошибка выполнения пакета: {e}")
+            finally:
+                # Изменения, не подтверждённые release(), не оставляем в проекте
+                if transaction is not None and transaction.pending:
+                    transaction.rollback()
+                    for task in applied:
+                        results[task.id].changes_made.append(f"Откачен файл: {task.file_path}")
+        
+        # Время и ресурсы пакета делим поровну между задачами (пик памяти - общий)
+        phases = {name: round(value / len(batch.tasks), 4) for name, value in timer.as_dict().items()}
+        resources = {
+            name: value if name.endswith("peak_mb") else round(value / len(batch.tasks), 4)
+            for name, value in tracker.usage().items()
+        }
+        for result in results.values():
+            result.phases = dict(phases)
+            result.resources = dict(resources)
+            result.duration_seconds = phases["total"]
+            self._record_history(result)
+        
+        self.save_state()
+        return list(results.values())
+    
+    @traced("brain.sandbox_evaluate")
+    def evaluate_in_sandbox(self, task: Task, response: str,
+                            cancel: Optional[threading.Event] = None,
+                            timer: Optional[PhaseTimer] = None
+                            ) -> Tuple[bool, str, Optional[str], Optional[str]]:
+        """
+        Проверить ответ AI в изолированной копии проекта
+        
+        Returns:
+            (тесты прошли, вывод, новый код, исходный код файла на момент проверки)
+        """
+        code = self.extract_code(response)
+        syntax_ok, syntax_error = self.check_syntax(code, task.file_path)
+        if not syntax_ok:
+            return False, f"Синтаксическая ошибка: {syntax_error}", None, None
+        
+        timer = timer or PhaseTimer()
+        targets = self._test_targets([task.file_path])
+        sandbox = Sandbox(self.project_path, mode=self.sandbox_mode)
+        try:
+            with timer.phase("sandbox"):
+                sandbox.create()
+                sandbox.apply(task.file_path, code)
+            original = sandbox.originals[task.file_path]
+            if not targets:
+                return True, "Нет тестов, затронутых изменением", code, original
+            runner = ParallelTestRunner(sandbox.path, jobs=self.test_runner.jobs,
+                                        timeout=self.test_runner.timeout)
+            with timer.phase("tests"), self._admit("tests", cancel) as admitted:
+                if admitted is False:
+                    return False, "Прогон отменён", None, None
+                tests_ok, output = runner.run(targets, fail_fast=True, verbose=False, cancel=cancel)
+        finally:
+            with timer.phase("sandbox"):
+                sandbox.destroy()
+        return tests_ok, output, code, original
+    
+    def merge_candidate(self, task: Task, code: str, original: Optional[str]) -> bool:
+        """Перенести проверенный код из песочницы в проект (если файл не менялся)"""
+        filepath = os.path.join(self.project_path, task.file_path)
+        with self._merge_lock:
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    current = f.read()
+            except FileNotFoundError:
+                current = None
+            if current != original:
+                logger.warning(f"Конфликт: {task.file_path} изменился во время проверки")
+                return False
+            return self.apply_improvement(task, code)
+    
+    def _candidate_temperature(self, index: int, count: int) -> float:
+        """Температура i-го кандидата: от 0.2 до 1.0 равномерно"""
+        if count <= 1:
+            return 0.3
+        return round(0.2 + 0.8 * index / (count - 1), 2)
+    
+    def _evaluate_candidate(self, task: Task, prompt: str, index: int, count: int,
+                            cancel: threading.Event, timer: Optional[PhaseTimer] = None
+                            ) -> Optional[Tuple[bool, str, Optional[str], Optional[str]]]:
+        """Сгенерировать и проверить одного кандидата (None - отменён)"""
+        if cancel.is_set():
+            return None
+        timer = timer or PhaseTimer()
+        with timer.phase("llm"):
+            response = self._candidate_response(prompt, index, count)
+        if cancel.is_set():
+            return None
+        return self.evaluate_in_sandbox(task, response, cancel, timer)
+    
+    def _candidate_response(self, prompt: str, index: int, count: int) -> str:
+        """Запрос одного кандидата у провайдера"""
+        if count > 1:
+            response = self.provider.generate(
+                prompt, self.SYSTEM_PROMPT,
+                temperature=self._candidate_temperature(index, count),
+                seed=index
+            )
+        else:
+            response = self.provider.generate(prompt, self.SYSTEM_PROMPT)
+        return response
+    
+    def _best_candidate(self, task: Task, count: int, timer: PhaseTimer
+                        ) -> Tuple[bool, str, Optional[str], Optional[str]]:
+        """
+        Запросить count кандидатов параллельно и вернуть первый прошедший проверку
+        
+        Остальные кандидаты отменяются: ещё не начатые не запускаются,
+        идущие прогоны тестов прерываются. При count > 1 фазы кандидатов
+        перекрываются, поэтому замеряется только общее время фазы candidates.
+        """
+        with timer.phase("prompt"):
+            prompt = self.generate_improvement_prompt(task)
+        logger.info(f"Запрос к AI для задачи: {task.title} (кандидатов: {count})")
+        cancel = threading.Event()
+        
+        if count <= 1:
+            return self._evaluate_candidate(task, prompt, 0, 1, cancel, timer)
+        
+        candidates_started = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=count)
+        futures = [
+            pool.submit(wrap(self._evaluate_candidate), task, prompt, i, count, cancel)
+            for i in range(count)
+        ]
+        last = (False, "Нет кандидатов", None, None)
+        try:
+            for future in as_completed(futures):
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logger.warning(f"Ошибка кандидата: {e}")
+                    last = (False, str(e), None, None)
+                    continue
+                if outcome is None:
+                    continue
+                if outcome[0]:
+                    return outcome
+                last = outcome
+            return last
+        finally:
+            cancel.set()
+            # Не ждём зависшие HTTP-запросы: они завершатся в фоне
+            pool.shutdown(wait=False, cancel_futures=True)
+            timer.phases["candidates"] = time.perf_counter() - candidates_started
+    
+    @traced("brain.execute_speculative")
+    def _execute_speculative(self, task: Task, candidates: int = 1) -> ImprovementResult:
+        """Выполнить задачу с проверкой в песочнице (для параллельного запуска)"""
+        current_span().set_attributes(**{
+            "task.id": task.id,
+            "task.file": task.file_path or "",
+            "task.candidates": candidates,
+        })
+        timer = PhaseTimer()
+        result = ImprovementResult(success=False, task=task, changes_made=[], tests_passed=False)
+        
+        try:
+            tests_ok, output, code, original = self._best_candidate(task, candidates, timer)
+            result.tests_passed = tests_ok
+            if code is None:
+                result.error = output
+            elif not tests_ok:
+                result.error = f"Тесты не прошли: {output[:500]}"
+            else:
+                with timer.phase("apply"):
+                    merged = self.merge_candidate(task, code, original)
+                if merged:
+                    result.success = True
+                    result.changes_made.append(f"Обновлён файл: {task.file_path}")
+                else:
+                    result.error = "Не удалось применить изменения"
+        except Exception as e:
+            result.error = str(e)
+            logger.error(f"Ошибка выполнения задачи: {e}")
+        
+        if result.success:
+            task.status = "completed"
+            task.completed_at = datetime.now().isoformat()
+            task.result = "Успешно улучшено"
+        else:
+            task.status = "failed"
+            task.result = result.error
+        
+        result.phases = timer.as_dict()
+        result.duration_seconds = result.phases["total"]
+        return result
+    
+    def _execute_speculative_tracked(self, task: Task) -> ImprovementResult:
+        """_execute_speculative с учётом ресурсов задачи (в потоке пула)"""
+        with self._admit("task"), ResourceTracker() as tracker:
+            result = self._execute_speculative(task, self.candidates)
+        result.resources = tracker.usage()
+        return result
+    
+    @traced("brain.execute_parallel")
+    def execute_tasks_parallel(self, tasks: Optional[List[Task]] = None,
+                               max_workers: int = 4) -> List[ImprovementResult]:
+        """
+        Выполнить несколько задач параллельно, каждую - в своей песочнице
+        
+        Одновременно берётся не больше одной задачи на файл, остальные
+        остаются в очереди. Задачи без файла (им нечего копировать в песочницу)
+        выполняются обычным путём после параллельной части.
+        """
+        if tasks is None:
+            tasks = self.get_pending_tasks()
+        
+        selected: List[Task] = []
+        without_file: List[Task] = []
+        files = set()
+        for task in sorted(tasks, key=lambda t: -self.scheduler.explain(t)["score"]):
+            if not task.file_path:
+                without_file.append(task)
+            elif task.file_path not in files:
+                files.add(task.file_path)
+                selected.append(task)
+            if len(selected) + len(without_file) >= max_workers:
+                break
+        
+        if not self.provider:
+            return [self.execute_task(task) for task in selected + without_file]
+        
+        results: List[ImprovementResult] = []
+        if selected:
+            for task in selected:
+                task.status = "in_progress"
+            self.save_state()
+            
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(wrap(self._execute_speculative_tracked), selected))
+            
+            for result in results:
+                self._record_history(result)
+            self.save_state()
+        
+        results.extend(self.execute_task(task) for task in without_file)
+        return results
+    
+    def _record_history(self, result: ImprovementResult):
+        """Добавить результат в историю"""
+        if not result.success:
+            result.task.failed_at = datetime.now().isoformat()
         self.history.append({
-            "task_id": task.id,
-            "task_title": task.title,
+            "task_id": result.task.id,
+            "task_title": result.task.title,
+            "task_type": result.task.task_type,
+            "file_path": result.task.file_path,
             "success": result.success,
             "duration": result.duration_seconds,
+            "phases": result.phases,
+            "resources": result.resources,
             "timestamp": datetime.now().isoformat(),
             "error": result.error
         })
-        
-        self.save_state()
-        return result
+        self.scheduler.record_outcome(result.task.task_type, result.task.file_path,
+                                      result.success, result.duration_seconds)
+        metrics.TASKS_TOTAL.inc(status="completed" if result.success else "failed")
+        metrics.TASKS_PENDING.set(len(self.scheduler))
     
     def get_stats(self) -> Dict:
         """Получить статистику"""
@@ -575,6 +1444,7 @@ class AIBrain:
         completed = len([t for t in self.tasks if t.status == "completed"])
         failed = len([t for t in self.tasks if t.status == "failed"])
         pending = len([t for t in self.tasks if t.status == "pending"])
+        superseded = len([t for t in self.tasks if t.status == "superseded"])
         
         success_rate = (completed / (completed + failed) * 100) if (completed + failed) > 0 else 0
         
@@ -585,7 +1455,57 @@ class AIBrain:
                 "completed": completed,
                 "failed": failed,
                 "pending": pending,
+                "superseded": superseded,
                 "success_rate": round(success_rate, 1)
             },
-            "history_count": len(self.history)
+            "history_count": len(self.history),
+            "timing": self.get_timing_stats(),
+            "admission": self.admission.stats() if self.admission else None
         }
+    
+    def get_timing_stats(self) -> Dict[str, Dict[str, float]]:
+        """Перцентили времени по фазам (prompt, llm, apply, tests, ...) по истории"""
+        return summarize_phases(
+            h.get("phases") for h in self.history if isinstance(h, dict)
+        )
+    
+    def export_timings(self, path: str) -> int:
+        """
+        Выгрузить фазы выполнения задач из истории
+        
+        Args:
+            path: Файл .csv (строка на задачу) или .jsonl (JSON на строку)
+            
+        Returns:
+            Количество выгруженных записей
+        """
+        records = [h for h in self.history if isinstance(h, dict) and h.get("phases")]
+        phase_names = sorted({name for h in records for name in h["phases"]})
+        
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            if path.endswith('.csv'):
+                writer = csv.writer(f)
+                writer.writerow(["task_id", "task_type", "success", "timestamp"] + phase_names)
+                for h in records:
+                    writer.writerow([h.get("task_id"), h.get("task_type"), h.get("success"),
+                                     h.get("timestamp")] + [h["phases"].get(n, 0.0) for n in phase_names])
+            else:
+                for h in records:
+                    f.write(json.dumps({
+                        "task_id": h.get("task_id"),
+                        "task_type": h.get("task_type"),
+                        "success": h.get("success"),
+                        "timestamp": h.get("timestamp"),
+                        "phases": h["phases"]
+                    }, ensure_ascii=False) + "\n")
+        return len(records)
+    
+    def start_metrics_server(self, port: int = 9108, monitor=None) -> metrics.MetricsServer:
+        """
+        Запустить локальный эндпоинт /metrics (формат Prometheus)
+        
+        Args:
+            port: Порт (0 - любой свободный)
+            monitor: SystemMonitor для метрик системы
+        """
+        return metrics.MetricsServer(port=port, monitor=monitor).start()
@@ -38,7 +38,8 @@ class Config:
         "logging": {
             "level": "INFO",
             "file_enabled": True,
-            "console_enabled": True
+            "console_enabled": True,
+            "format": "text"
         }
     }
     
@@ -9,25 +9,39 @@ import time
 from copy import deepcopy
 from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Optional
 
-try:
-    import pyautogui
-    import pyperclip
-    AUTOMATION_AVAILABLE = True
-except ImportError:  # pragma: no cover - внешние зависимости
-    AUTOMATION_AVAILABLE = False
-
-try:
-    import win32gui
-    import win32con
-    WIN32_AVAILABLE = True
-except ImportError:  # pragma: no cover
-    WIN32_AVAILABLE = False
+from .tracing import current_span, traced
 
 logger = logging.getLogger('WA')
 
 
+# Библиотеки автоматизации импортируются при первом использовании:
+# один pyautogui добавляет сотни мс к запуску, а в режиме только brain не нужен
+
+@lru_cache(maxsize=None)
+def _automation():
+    """(pyautogui, pyperclip) или None, если библиотеки не установлены"""
+    try:
+        import pyautogui
+        import pyperclip
+    except ImportError:  # pragma: no cover - внешние зависимости
+        return None
+    return pyautogui, pyperclip
+
+
+@lru_cache(maxsize=None)
+def _win32():
+    """(win32gui, win32con) или None вне Windows"""
+    try:
+        import win32gui
+        import win32con
+    except ImportError:  # pragma: no cover
+        return None
+    return win32gui, win32con
+
+
 @dataclass
 class Config:
     """Работа с конфигурационным файлом."""
@@ -115,8 +129,10 @@ class WindsurfController:
         self.running = False
 
     def find_windsurf_windows(self) -> List[Dict]:
-        if not WIN32_AVAILABLE:
+        win32 = _win32()
+        if win32 is None:
             return []
+        win32gui, _ = win32
 
         windows: List[Dict] = []
 
@@ -131,8 +147,10 @@ class WindsurfController:
         return windows
 
     def activate_window(self, hwnd: int) -> bool:
-        if not WIN32_AVAILABLE:
+        win32 = _win32()
+        if win32 is None:
             return False
+        win32gui, win32con = win32
         try:
             if win32gui.IsIconic(hwnd):
                 win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
@@ -144,14 +162,18 @@ class WindsurfController:
             return False
 
     def press_hotkey(self, keys: List[str]):
-        if not AUTOMATION_AVAILABLE:
+        automation = _automation()
+        if automation is None:
             return
+        pyautogui, _ = automation
         pyautogui.hotkey(*keys)
         time.sleep(self.config.get("delays", {}).get("after_hotkey", 0.5))
 
     def paste_text(self, text: str):
-        if not AUTOMATION_AVAILABLE:
+        automation = _automation()
+        if automation is None:
             return
+        pyautogui, pyperclip = automation
         pyperclip.copy(text)
         time.sleep(0.1)
         pyautogui.hotkey("ctrl", "v")
@@ -171,12 +193,18 @@ class WindsurfController:
         time.sleep(0.5)
         self.paste_text(model_name)
         time.sleep(0.3)
+        automation = _automation()
+        if automation is None:
+            return
+        pyautogui, _ = automation
         pyautogui.press("down")
         time.sleep(0.2)
         pyautogui.press("enter")
         time.sleep(0.5)
 
+    @traced("controller.send_message")
     def send_message(self, message: str):
+        current_span().set_attribute("message.chars", len(message))
         logger.info(f"Отправка сообщения ({len(message)} символов)...")
         self.open_cascade()
         time.sleep(0.3)
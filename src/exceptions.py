@@ -47,3 +47,11 @@ class ClipboardError(WindsurfAutomationError):
 class SessionError(WindsurfAutomationError):
     """Ошибка сессии"""
     pass
+
+
+class ProviderError(WindsurfAutomationError):
+    """Ошибка AI провайдера (HTTP статус в status_code)"""
+
+    def __init__(self, message: str, status_code: int = 0):
+        super().__init__(message)
+        self.status_code = status_code
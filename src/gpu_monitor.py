@@ -0,0 +1,227 @@
+"""
+Чтение статистики NVIDIA GPU
+NVML (pynvml), один долгоживущий процесс `nvidia-smi --loop-ms`
+или разовый запрос nvidia-smi на каждый вызов (старое поведение).
+Без GPU и драйвера create_gpu_reader возвращает None.
+"""
+
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger('WA.GPU')
+
+QUERY_FIELDS = "index,name,memory.total,memory.used,utilization.gpu"
+
+EMPTY_GPU_STATS = {
+    "name": "N/A",
+    "memory_total": 0,
+    "memory_used": 0,
+    "utilization": 0
+}
+
+
+def _number(value: str) -> float:
+    """Число из CSV nvidia-smi ("[N/A]" и пустые значения - 0)"""
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def parse_csv_line(line: str) -> Optional[Dict]:
+    """Разобрать строку `index, name, memory.total, memory.used, utilization.gpu`"""
+    parts = [p.strip() for p in line.strip().split(",")]
+    if len(parts) < 5:
+        return None
+    # Имя GPU может содержать запятые - числа берём с конца
+    index, name = parts[0], ",".join(parts[1:-3]).strip()
+    total, used, utilization = parts[-3:]
+    return {
+        "index": int(_number(index)),
+        "name": name,
+        "memory_total": int(_number(total)),
+        "memory_used": int(_number(used)),
+        "utilization": _number(utilization)
+    }
+
+
+class QueryGPUReader:
+    """Отдельный запуск nvidia-smi на каждое чтение"""
+
+    def __init__(self, binary: str = "nvidia-smi", device: int = 0):
+        self.binary = binary
+        self.device = device
+
+    def read(self) -> Dict:
+        try:
+            result = subprocess.run(
+                [self.binary, f"--query-gpu={QUERY_FIELDS}", "--format=csv,noheader,nounits"],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            if result.returncode == 0:
+                for line in result.stdout.splitlines():
+                    stats = parse_csv_line(line)
+                    if stats and stats["index"] == self.device:
+                        return stats
+        except Exception as e:
+            logger.debug(f"GPU stats error: {e}")
+        return dict(EMPTY_GPU_STATS)
+
+    def close(self):
+        pass
+
+
+class LoopGPUReader:
+    """
+    Один процесс `nvidia-smi --loop-ms`: поток читает CSV-строки,
+    read() отдаёт последнюю разобранную строку без ожидания.
+    Упавший процесс перезапускается не чаще раза в restart_delay секунд.
+    """
+
+    def __init__(self, binary: str = "nvidia-smi", interval_ms: int = 1000, device: int = 0,
+                 restart_delay: float = 30.0, first_sample_timeout: float = 2.0):
+        self.binary = binary
+        self.interval_ms = interval_ms
+        self.device = device
+        self.restart_delay = restart_delay
+        self.first_sample_timeout = first_sample_timeout
+        self._latest: Optional[Dict] = None
+        self._first = threading.Event()
+        self._process: Optional[subprocess.Popen] = None
+        self._started_at = 0.0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self) -> bool:
+        self._started_at = time.monotonic()
+        try:
+            self._process = subprocess.Popen(
+                [self.binary, f"--query-gpu={QUERY_FIELDS}", "--format=csv,noheader,nounits",
+                 f"--loop-ms={self.interval_ms}"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                errors='replace'
+            )
+        except OSError as e:
+            logger.debug(f"nvidia-smi не запущен: {e}")
+            self._process = None
+            return False
+        threading.Thread(target=self._pump, args=(self._process,), name="wa-nvidia-smi", daemon=True).start()
+        return True
+
+    def _pump(self, process: subprocess.Popen) -> None:
+        for line in process.stdout:
+            stats = parse_csv_line(line)
+            if stats and stats["index"] == self.device:
+                self._latest = stats
+                self._first.set()
+        process.stdout.close()
+        process.wait()
+        if not self._closed:
+            logger.debug(f"nvidia-smi завершился с кодом {process.returncode}")
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def read(self) -> Dict:
+        if not self._first.is_set() and self.alive:
+            # Только первое чтение ждёт первую строку
+            self._first.wait(self.first_sample_timeout)
+
+        if not self.alive and not self._closed:
+            with self._lock:
+                if not self.alive and time.monotonic() - self._started_at >= self.restart_delay:
+                    self._start()
+
+        latest = self._latest
+        if latest is None:
+            return dict(EMPTY_GPU_STATS)
+        return latest
+
+    def close(self):
+        self._closed = True
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class NvmlGPUReader:
+    """Чтение через NVML (pynvml) без процессов"""
+
+    def __init__(self, device: int = 0):
+        import pynvml
+        self._nvml = pynvml
+        pynvml.nvmlInit()
+        self._handle = pynvml.nvmlDeviceGetHandleByIndex(device)
+        name = pynvml.nvmlDeviceGetName(self._handle)
+        self._name = name.decode() if isinstance(name, bytes) else name
+
+    def read(self) -> Dict:
+        try:
+            memory = self._nvml.nvmlDeviceGetMemoryInfo(self._handle)
+            rates = self._nvml.nvmlDeviceGetUtilizationRates(self._handle)
+            return {
+                "name": self._name,
+                "memory_total": memory.total // (1024 * 1024),
+                "memory_used": memory.used // (1024 * 1024),
+                "utilization": float(rates.gpu)
+            }
+        except Exception as e:
+            logger.debug(f"NVML error: {e}")
+            return dict(EMPTY_GPU_STATS)
+
+    def close(self):
+        try:
+            self._nvml.nvmlShutdown()
+        except Exception:
+            pass
+
+
+def create_gpu_reader(mode: str = "auto", interval_ms: int = 1000, binary: str = "nvidia-smi",
+                      device: int = 0):
+    """
+    Создать источник статистики GPU
+
+    Args:
+        mode: auto (NVML, иначе nvidia-smi --loop-ms), nvml, loop, query или off
+
+    Returns:
+        Объект с read()/close() или None, если GPU недоступен
+    """
+    if mode == "off":
+        return None
+
+    if mode in ("auto", "nvml"):
+        try:
+            return NvmlGPUReader(device)
+        except Exception as e:
+            # ImportError без pynvml, NVMLError без драйвера
+            logger.debug(f"NVML недоступен: {e}")
+            if mode == "nvml":
+                return None
+
+    if shutil.which(binary) is None:
+        return None
+    if mode == "query":
+        reader = QueryGPUReader(binary, device)
+        return reader if reader.read()["name"] != "N/A" else None
+
+    reader = LoopGPUReader(binary, interval_ms, device)
+    if reader.read()["name"] == "N/A":
+        # nvidia-smi есть, но GPU/драйвер не отвечает
+        reader.close()
+        return None
+    return reader
@@ -1,13 +1,204 @@
 """
 Модуль логирования Windsurf Automation
 Централизованная система логирования с уровнями
+
+Вызывающий поток только кладёт запись в ограниченную очередь (QueueHandler),
+запись в файл и консоль выполняет фоновый поток QueueListener.
+
+Глобальный логгер создаётся при первом вызове get_logger(): импорт модуля
+не создаёт каталог logs/ и не открывает файлов.
 """
 
+import atexit
+import gzip
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Обработчик-очередь с политикой переполнения
+    
+    block - ждать места в очереди; drop-debug - при полной очереди
+    отбрасывать DEBUG-записи, остальные ждать места.
+    """
+    
+    POLICIES = ("block", "drop-debug")
+    
+    def __init__(self, log_queue: queue.Queue, overflow: str = "drop-debug"):
+        if overflow not in self.POLICIES:
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Минимальная подготовка: подставить аргументы, форматирование - в фоне"""
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # traceback нельзя передавать между потоками надёжно - превращаем в текст сразу
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.overflow == "drop-debug" and record.levelno <= logging.DEBUG:
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+            return
+        self.queue.put(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Запись лога одной строкой JSON
+    
+    Постоянные поля (сервис, хост, pid) кодируются один раз при создании,
+    на каждую запись кодируются только время, уровень, сообщение и поля
+    операции из log_operation (operation, status, task_id, duration_ms...).
+    """
+    
+    def __init__(self, static_fields: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        # orjson нужен только JSON-формату - импорт здесь, а не при загрузке модуля
+        try:
+            import orjson
+            self._orjson = orjson
+        except ImportError:
+            self._orjson = None
+        static = {"service": "windsurf-automation", "host": socket.gethostname(), "pid": os.getpid()}
+        static.update(static_fields or {})
+        # '{"service":...,"pid":123' - без закрывающей скобки, запись дописывается через запятую
+        self._prefix = self._dumps(static)[:-1]
+    
+    def _dumps(self, data: Dict[str, Any]) -> str:
+        if self._orjson is not None:
+            return self._orjson.dumps(data, default=str).decode('utf-8')
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+    
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "wa", None)
+        if fields:
+            data.update(fields)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return self._prefix + "," + self._dumps(data)[1:]
+
+
+class RotatingLogFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    Файл лога <prefix>_YYYYMMDD.log с ротацией по дню и по размеру
+    
+    Закрытые файлы сжимаются в .gz и старые архивы удаляются (остаётся
+    backup_count) в отдельном потоке - запись логов при этом не ждёт.
+    """
+    
+    def __init__(self, log_dir: Path, prefix: str, max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 14, compress: bool = True, encoding: str = 'utf-8'):
+        self.log_dir = Path(os.path.abspath(log_dir))
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self._archiver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wa-log-archive")
+        self._day = datetime.now().date()
+        self._next_day_ts = self._midnight_after(self._day)
+        super().__init__(str(self._path_for(self._day)), 'a', encoding=encoding, delay=False)
+        # Файлы прошлых запусков за другие дни - в архив
+        for stale in self.log_dir.glob(f"{self.prefix}_*.log"):
+            if stale != Path(self.baseFilename):
+                self._archive(stale)
+    
+    def _path_for(self, day) -> Path:
+        return self.log_dir / f"{self.prefix}_{day.strftime('%Y%m%d')}.log"
+    
+    @staticmethod
+    def _midnight_after(day) -> float:
+        return datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if record.created >= self._next_day_ts:
+            return True
+        if self.max_bytes > 0 and self.stream is not None:
+            # Длина сообщения без форматирования - достаточно для порога
+            return self.stream.tell() + len(str(record.msg)) + 64 >= self.max_bytes
+        return False
+    
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        current = Path(self.baseFilename)
+        today = datetime.now().date()
+        
+        if today == self._day and current.exists():
+            # Ротация по размеру: текущий файл уходит в <prefix>_YYYYMMDD.N.log
+            # Номер части - следующий за наибольшим (номера удалённых архивов не переиспользуем)
+            parts = [self._archive_order(p)[1] for p in self.log_dir.glob(f"{current.stem}.*")]
+            index = max([p for p in parts if p != float("inf")], default=0) + 1
+            rotated = current.with_name(f"{current.stem}.{index}.log")
+            os.replace(current, rotated)
+            self._archive(rotated)
+        elif current.exists():
+            self._archive(current)
+        
+        self._day = today
+        self._next_day_ts = self._midnight_after(today)
+        self.baseFilename = os.path.abspath(self._path_for(today))
+        self.stream = self._open()
+    
+    def _archive(self, path: Path) -> None:
+        """Поставить сжатие и очистку архивов в фоновый поток"""
+        self._archiver.submit(self._compress_and_prune, path)
+    
+    def _compress_and_prune(self, path: Path) -> None:
+        try:
+            if self.compress and path.exists():
+                with open(path, 'rb') as src, gzip.open(f"{path}.gz", 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                path.unlink()
+            archives = sorted(
+                (p for p in self.log_dir.glob(f"{self.prefix}_*") if p != Path(self.baseFilename)),
+                key=self._archive_order
+            )
+            for old in archives[:max(0, len(archives) - self.backup_count)]:
+                old.unlink()
+        except OSError as e:
+            # Логировать нельзя (рекурсия в этот же обработчик) - только stderr
+            print(f"Ошибка архивации лога {path}: {e}", file=sys.stderr)
+    
+    def _archive_order(self, path: Path) -> tuple:
+        """Порядок архивов по имени: день, затем номер части (файл дня целиком - последний)"""
+        name = path.name[len(self.prefix) + 1:].split(".")
+        part = int(name[1]) if len(name) > 1 and name[1].isdigit() else float("inf")
+        return name[0], part
+    
+    def close(self) -> None:
+        super().close()
+        self._archiver.shutdown(wait=True)
 
 
 class Logger:
@@ -22,48 +213,116 @@ class Logger:
         'CRITICAL': logging.CRITICAL
     }
     
-    def __init__(self, name: str = "WA", log_dir: str = "logs"):
+    def __init__(self, name: str = "WA", log_dir: str = "logs",
+                 queue_size: int = 10000, overflow: str = "drop-debug",
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 14, compress: bool = True,
+                 log_format: str = "text", level: str = "INFO",
+                 file_enabled: bool = True, console_enabled: bool = True):
         """
         Инициализация логгера
         
         Args:
             name: Имя логгера
             log_dir: Директория для хранения логов
+            queue_size: Размер очереди записей
+            overflow: Политика переполнения очереди: block или drop-debug
+            max_bytes: Размер файла лога для ротации (0 - только по дням)
+            backup_count: Сколько архивных файлов хранить
+            compress: Сжимать архивные файлы в gzip
+            log_format: Формат файла лога: text или json (JSON Lines; консоль - всегда текст)
+            level: Уровень логирования
+            file_enabled: Писать лог в файл
+            console_enabled: Выводить лог в консоль
         """
         self.name = name
         self.log_dir = Path(log_dir)
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.log_format = log_format
+        self.level = self.LEVELS.get(str(level).upper(), logging.INFO)
+        self.file_enabled = file_enabled
+        self.console_enabled = console_enabled
         self.logger = logging.getLogger(name)
+        self.queue_handler: Optional[BoundedQueueHandler] = None
+        # Отброшено обработчиками-очередями, уже снятыми stop()
+        self._dropped = 0
+        self.listener: Optional[logging.handlers.QueueListener] = None
         self._setup_logger()
+        atexit.register(self.stop)
     
     def _setup_logger(self) -> None:
         """Настройка логгера"""
-        # Создаем директорию для логов
-        self.log_dir.mkdir(exist_ok=True)
-        
         # Очищаем существующие обработчики
+        self.stop()
         self.logger.handlers.clear()
         
         # Устанавливаем уровень логирования
-        self.logger.setLevel(logging.INFO)
+        self.logger.setLevel(self.level)
         
         # Формат логов
-        formatter = logging.Formatter(
-            '%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+        formatter = self._text_formatter()
+        
+        handlers = []
+        if self.file_enabled:
+            # Обработчик для файла: ротация по дню и размеру, архивы в gzip
+            self.log_dir.mkdir(exist_ok=True)
+            file_handler = RotatingLogFileHandler(
+                self.log_dir, self.name.lower(),
+                max_bytes=self.max_bytes, backup_count=self.backup_count, compress=self.compress
+            )
+            file_handler.setFormatter(JsonLinesFormatter() if self.log_format == "json" else formatter)
+            handlers.append(file_handler)
+        
+        if self.console_enabled:
+            # Обработчик для консоли
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
+            handlers.append(console_handler)
         
-        # Обработчик для файла
-        file_handler = logging.FileHandler(
-            self.log_dir / f"{self.name.lower()}_{datetime.now().strftime('%Y%m%d')}.log",
-            encoding='utf-8'
+        # Файл и консоль обслуживает фоновый поток, логгеру - только очередь
+        log_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self.queue_handler = BoundedQueueHandler(log_queue, self.overflow)
+        self.logger.addHandler(self.queue_handler)
+        self.listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
         )
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
+        self.listener.start()
+    
+    def stop(self) -> None:
+        """
+        Дописать очередь и остановить фоновый поток записи
         
-        # Обработчик для консоли
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
+        Обработчик-очередь снимается с логгера: записи после остановки
+        (например, из atexit) выводятся в консоль напрямую, а не теряются в очереди.
+        """
+        if self.queue_handler is not None:
+            self.logger.removeHandler(self.queue_handler)
+            self._dropped += self.queue_handler.dropped
+            self.queue_handler = None
+            if self.console_enabled:
+                console_handler = logging.StreamHandler()
+                console_handler.setFormatter(self._text_formatter())
+                self.logger.addHandler(console_handler)
+        if self.listener is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+    
+    @staticmethod
+    def _text_formatter() -> logging.Formatter:
+        return logging.Formatter(
+            '%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+    
+    @property
+    def dropped(self) -> int:
+        """Сколько DEBUG-записей отброшено при переполнении очереди"""
+        return self._dropped + (self.queue_handler.dropped if self.queue_handler else 0)
     
     def set_level(self, level: str) -> None:
         """
@@ -101,7 +360,9 @@ class Logger:
         """Логирование исключения с traceback"""
         self.logger.exception(message)
     
-    def log_operation(self, operation: str, status: str, details: Optional[str] = None) -> None:
+    def log_operation(self, operation: str, status: str, details: Optional[str] = None,
+                      task_id: Optional[str] = None, duration: Optional[float] = None,
+                      **fields: Any) -> None:
         """
         Логирование операции с статусом
         
@@ -109,30 +370,94 @@ class Logger:
             operation: Название операции
             status: Статус (SUCCESS, FAILED, STARTED, COMPLETED)
             details: Дополнительные детали
+            task_id: ID задачи
+            duration: Длительность операции в секундах
+            **fields: Дополнительные поля (в JSON-формате - отдельными ключами)
         """
         message = f"{operation} - {status}"
         if details:
             message += f": {details}"
+        if duration is not None:
+            message += f" ({duration:.2f} с)"
+        
+        structured = {"operation": operation, "status": status}
+        if details:
+            structured["details"] = details
+        if task_id:
+            structured["task_id"] = task_id
+        if duration is not None:
+            structured["duration_ms"] = round(duration * 1000, 1)
+        structured.update(fields)
         
         if status in ["SUCCESS", "COMPLETED"]:
-            self.info(message)
+            level = logging.INFO
         elif status == "FAILED":
-            self.error(message)
+            level = logging.ERROR
         elif status == "STARTED":
-            self.info(message)
+            level = logging.INFO
         else:
-            self.debug(message)
+            level = logging.DEBUG
+        self.logger.log(level, message, extra={"wa": structured})
 
 
-# Глобальный экземпляр логгера
-app_logger = Logger()
+# Глобальный экземпляр логгера (создаётся в get_logger)
+_app_logger: Optional[Logger] = None
+_app_settings: Optional[Dict[str, Any]] = None
+_app_lock = threading.Lock()
 
+# Ключи секции logging конфигурации -> параметры Logger
+_CONFIG_KEYS = {
+    "level": "level",
+    "file_enabled": "file_enabled",
+    "console_enabled": "console_enabled",
+    "format": "log_format",
+    "dir": "log_dir",
+    "max_bytes": "max_bytes",
+    "backup_count": "backup_count",
+    "compress": "compress",
+}
 
-def get_logger() -> Logger:
+
+def _settings_from(config: Any) -> Dict[str, Any]:
+    """Параметры Logger из Config (секция logging) или словаря этой секции"""
+    if config is None:
+        return {}
+    section = config.get("logging", config) if hasattr(config, "get") else {}
+    if not isinstance(section, dict):
+        return {}
+    return {param: section[key] for key, param in _CONFIG_KEYS.items() if key in section}
+
+
+def __getattr__(name: str) -> Any:
+    """Совместимость: `from src.logger import app_logger` создаёт логгер при обращении"""
+    if name == "app_logger":
+        return get_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_logger(config: Any = None) -> Logger:
     """
     Получение глобального логгера
     
+    Логгер создаётся при первом вызове. Если передана конфигурация с другими
+    настройками, логгер пересоздаётся с ними.
+    
+    Args:
+        config: Config или словарь секции logging (level, file_enabled, console_enabled...)
+    
     Returns:
         Экземпляр логгера
     """
-    return app_logger
+    global _app_logger, _app_settings
+    settings = _settings_from(config)
+    logger = _app_logger
+    if logger is not None and (config is None or settings == _app_settings):
+        return logger
+    with _app_lock:
+        if _app_logger is None or (config is not None and settings != _app_settings):
+            if _app_logger is not None:
+                _app_logger.stop()
+                atexit.unregister(_app_logger.stop)
+            _app_logger = Logger(**settings)
+            _app_settings = settings
+        return _app_logger
@@ -0,0 +1,201 @@
+"""
+История метрик с фиксированной памятью
+Кольцевые буферы на array: сырые значения (шаг сбора, обычно 1 с)
+и агрегаты min/avg/max по 10 с и 1 мин. Память не растёт со временем работы.
+"""
+
+import math
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_METRICS = ("cpu_percent", "ram_percent", "disk_percent", "gpu_utilization", "gpu_memory_used_mb")
+
+# (шаг в секундах, ёмкость): 1 ч сырых значений, сутки по 10 с, неделя по 1 мин
+DEFAULT_TIERS = ((1, 3600), (10, 8640), (60, 10080))
+
+
+def _ring(capacity: int) -> array:
+    return array('d', [math.nan]) * capacity
+
+
+class _Tier:
+    """Кольцевой буфер одного шага: время + (значение) или (min, avg, max) на метрику"""
+
+    def __init__(self, step: int, capacity: int, names: Sequence[str], rollup: bool):
+        self.step = step
+        self.capacity = capacity
+        self.rollup = rollup
+        self.times = _ring(capacity)
+        columns = ("min", "avg", "max") if rollup else ("value",)
+        self.columns = {name: tuple(_ring(capacity) for _ in columns) for name in names}
+        self.pos = 0
+        self.count = 0
+        # Текущая незавершённая корзина агрегата: метрика -> [min, max, сумма, количество]
+        self._bucket: Optional[float] = None
+        self._acc: Dict[str, List[float]] = {}
+
+    def _write(self, ts: float, row: Dict[str, Tuple[float, ...]]) -> None:
+        i = self.pos
+        self.times[i] = ts
+        for name, arrays in self.columns.items():
+            values = row.get(name)
+            for column, arr in enumerate(arrays):
+                arr[i] = values[column] if values else math.nan
+        self.pos = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def add(self, ts: float, values: Dict[str, float]) -> None:
+        if not self.rollup:
+            self._write(ts, {name: (value,) for name, value in values.items()})
+            return
+        bucket = ts - ts % self.step
+        if self._bucket is not None and bucket != self._bucket:
+            self.flush()
+        self._bucket = bucket
+        for name, value in values.items():
+            acc = self._acc.get(name)
+            if acc is None:
+                self._acc[name] = [value, value, value, 1]
+            else:
+                acc[0] = min(acc[0], value)
+                acc[1] = max(acc[1], value)
+                acc[2] += value
+                acc[3] += 1
+
+    def flush(self) -> None:
+        """Записать текущую корзину агрегата"""
+        if self._bucket is None or not self._acc:
+            return
+        self._write(self._bucket, {name: (acc[0], acc[2] / acc[3], acc[1]) for name, acc in self._acc.items()})
+        self._bucket = None
+        self._acc = {}
+
+    def _physical(self, logical: int) -> int:
+        return (self.pos - self.count + logical) % self.capacity
+
+    def oldest(self) -> Optional[float]:
+        return self.times[self._physical(0)] if self.count else None
+
+    def _lower_bound(self, ts: float) -> int:
+        """Первый логический индекс со временем >= ts (время в буфере возрастает)"""
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.times[self._physical(mid)] < ts:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def rows(self, name: str, start: float, end: float) -> List[Tuple[float, ...]]:
+        """Строки (время, значения...) в интервале [start, end]"""
+        arrays = self.columns[name]
+        result = []
+        for logical in range(self._lower_bound(start), self.count):
+            i = self._physical(logical)
+            ts = self.times[i]
+            if ts > end:
+                break
+            values = tuple(arr[i] for arr in arrays)
+            if not math.isnan(values[0]):
+                result.append((ts,) + values)
+        return result
+
+
+class MetricHistory:
+    """История метрик SystemStats по уровням детализации"""
+
+    def __init__(self, metrics: Sequence[str] = DEFAULT_METRICS,
+                 tiers: Sequence[Tuple[int, int]] = DEFAULT_TIERS):
+        """
+        Args:
+            metrics: Имена полей SystemStats
+            tiers: (шаг в секундах, ёмкость); первый уровень - сырые значения
+        """
+        self.metrics = tuple(metrics)
+        self.tiers = [_Tier(step, capacity, self.metrics, rollup=i > 0)
+                      for i, (step, capacity) in enumerate(tiers)]
+        self._lock = threading.Lock()
+
+    def record(self, stats, ts: Optional[float] = None) -> None:
+        """Добавить снимок (SystemStats или словарь метрик)"""
+        if ts is None:
+            ts = getattr(stats, "timestamp", 0.0) or time.time()
+        if isinstance(stats, dict):
+            values = {name: float(stats[name]) for name in self.metrics if name in stats}
+        else:
+            values = {name: float(getattr(stats, name)) for name in self.metrics}
+        with self._lock:
+            for tier in self.tiers:
+                tier.add(ts, values)
+
+    def _pick_tier(self, start: float, step: Optional[int]) -> _Tier:
+        if step is not None:
+            for tier in self.tiers:
+                if tier.step == step:
+                    return tier
+            raise ValueError(f"Нет уровня с шагом {step} с, есть: {[t.step for t in self.tiers]}")
+        # Самый подробный уровень, в котором ещё есть данные на начало окна
+        for tier in self.tiers:
+            oldest = tier.oldest()
+            if oldest is not None and oldest <= start:
+                return tier
+        return self.tiers[-1] if self.tiers[-1].count else self.tiers[0]
+
+    def window(self, metric: str, seconds: float, step: Optional[int] = None,
+               now: Optional[float] = None) -> List[Tuple[float, ...]]:
+        """
+        Значения метрики за последние seconds секунд (для графиков)
+
+        Args:
+            step: Шаг уровня (1, 10, 60); по умолчанию - самый подробный, покрывающий окно
+
+        Returns:
+            [(время, значение)] для сырых данных или [(время, min, avg, max)] для агрегатов
+        """
+        end = now if now is not None else time.time()
+        return self.range(metric, end - seconds, end, step)
+
+    def range(self, metric: str, start: float, end: float,
+              step: Optional[int] = None) -> List[Tuple[float, ...]]:
+        """Значения метрики в интервале времени [start, end] (unix time)"""
+        if metric not in self.metrics:
+            raise KeyError(f"Метрика не записывается: {metric}")
+        with self._lock:
+            return self._pick_tier(start, step).rows(metric, start, end)
+
+    def summary(self, metric: str, start: float, end: float) -> Dict[str, float]:
+        """
+        min/avg/max метрики за интервал, например за время выполнения задачи:
+        end - время записи в истории brain, start = end - duration
+
+        Returns:
+            {"min", "avg", "max", "samples", "step"} (пустой словарь, если данных нет)
+        """
+        if metric not in self.metrics:
+            raise KeyError(f"Метрика не записывается: {metric}")
+        with self._lock:
+            tier = self._pick_tier(start, None)
+            # Корзина агрегата начинается раньше своего времени записи - расширяем начало
+            rows = tier.rows(metric, start - (tier.step if tier.rollup else 0), end)
+        if not rows:
+            return {}
+        if tier.rollup:
+            low = min(r[1] for r in rows)
+            avg = sum(r[2] for r in rows) / len(rows)
+            high = max(r[3] for r in rows)
+        else:
+            values = [r[1] for r in rows]
+            low, avg, high = min(values), sum(values) / len(values), max(values)
+        return {"min": low, "avg": round(avg, 2), "max": high, "samples": len(rows), "step": tier.step}
+
+    def memory_bytes(self) -> int:
+        """Память буферов (постоянная)"""
+        total = 0
+        for tier in self.tiers:
+            total += tier.times.itemsize * tier.capacity
+            for arrays in tier.columns.values():
+                total += sum(arr.itemsize * tier.capacity for arr in arrays)
+        return total
@@ -0,0 +1,307 @@
+"""
+Метрики в формате Prometheus
+Счётчики, gauge и гистограммы с метками, HTTP-эндпоинт /metrics
+"""
+
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger('WA.Metrics')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Базовая метрика с метками"""
+
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик"""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        if not self.labelnames:
+            # Метрика без меток выдаётся сразу, с нулём
+            self._values[()] = 0.0
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Счётчик не может уменьшаться")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Значение, которое может расти и убывать"""
+
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными корзинами"""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # метки -> [счётчики по корзинам, сумма, количество]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        if not self.labelnames:
+            self._values[()] = [[0] * len(self.buckets), 0.0, 0]
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Реестр метрик"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Функция, обновляющая метрики перед каждой выдачей (например, опрос SystemMonitor)"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]) -> None:
+        """Убрать сборщик, добавленный add_collector (повторный вызов ничего не делает)"""
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.debug(f"Ошибка сборщика метрик: {e}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Глобальный реестр метрик"""
+    return REGISTRY
+
+
+# --- метрики приложения ---
+
+TASKS_TOTAL = REGISTRY.counter("wa_tasks_total", "Завершённые задачи по статусу", ["status"])
+TASKS_PENDING = REGISTRY.gauge("wa_tasks_pending", "Задачи в очереди")
+LLM_LATENCY = REGISTRY.histogram("wa_llm_request_seconds", "Время ответа AI провайдера", ["provider"],
+                                 buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+LLM_TOKENS = REGISTRY.counter("wa_llm_tokens_total", "Токены AI провайдера", ["provider", "kind"])
+LLM_ERRORS = REGISTRY.counter("wa_llm_errors_total", "Ошибки запросов к AI провайдеру", ["provider"])
+TEST_DURATION = REGISTRY.histogram("wa_test_run_seconds", "Длительность прогона тестов", ["result"])
+APPLY_FAILURES = REGISTRY.counter("wa_apply_failures_total", "Неудачные применения изменений", ["reason"])
+SCAN_DURATION = REGISTRY.histogram("wa_scan_seconds", "Длительность сканирования проекта")
+SCAN_FILES = REGISTRY.counter("wa_scan_files_total", "Проанализированные файлы")
+SCAN_FILES_RATE = REGISTRY.gauge("wa_scan_files_per_second", "Скорость анализа файлов в последнем скане")
+ADMISSION_LIMIT = REGISTRY.gauge("wa_admission_limit", "Текущий лимит одновременных работ", ["kind"])
+ADMISSION_IN_USE = REGISTRY.gauge("wa_admission_in_use", "Занятые слоты выполнения", ["kind"])
+ADMISSION_THROTTLES = REGISTRY.counter("wa_admission_throttles_total", "Включения ограничения по загрузке")
+
+SYSTEM_CPU = REGISTRY.gauge("wa_system_cpu_percent", "Загрузка CPU")
+SYSTEM_RAM = REGISTRY.gauge("wa_system_ram_percent", "Занятая RAM")
+SYSTEM_DISK = REGISTRY.gauge("wa_system_disk_percent", "Занятый диск")
+SYSTEM_GPU = REGISTRY.gauge("wa_system_gpu_utilization_percent", "Загрузка GPU")
+SYSTEM_GPU_MEMORY = REGISTRY.gauge("wa_system_gpu_memory_used_mb", "Занятая память GPU")
+
+
+def observe_system(stats) -> None:
+    """Записать снимок SystemStats в gauge-метрики"""
+    SYSTEM_CPU.set(stats.cpu_percent)
+    SYSTEM_RAM.set(stats.ram_percent)
+    SYSTEM_DISK.set(stats.disk_percent)
+    SYSTEM_GPU.set(stats.gpu_utilization)
+    SYSTEM_GPU_MEMORY.set(stats.gpu_memory_used_mb)
+
+
+def _make_handler(registry: MetricsRegistry):
+    """Обработчик /metrics; http.server импортируется только при создании сервера"""
+    from http.server import BaseHTTPRequestHandler
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split('?')[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            # Не засоряем консоль запросами Prometheus
+            pass
+
+    return _MetricsHandler
+
+
+class MetricsServer:
+    """HTTP-сервер /metrics в фоновом потоке"""
+
+    def __init__(self, port: int = 9108, host: str = "127.0.0.1",
+                 registry: Optional[MetricsRegistry] = None, monitor=None):
+        """
+        Args:
+            port: Порт (0 - любой свободный)
+            host: Адрес (по умолчанию только локальный)
+            registry: Реестр метрик (по умолчанию глобальный)
+            monitor: SystemMonitor - опрашивается при каждом запросе /metrics
+        """
+        from http.server import ThreadingHTTPServer
+        self.registry = registry or REGISTRY
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self.registry))
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        # Сборщик убирается в stop(): иначе перезапуски копят сборщики старых мониторов
+        self._collector: Optional[Callable[[], None]] = None
+        if monitor is not None:
+            self._collector = lambda: observe_system(monitor.get_stats())
+            self.registry.add_collector(self._collector)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> 'MetricsServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="wa-metrics", daemon=True)
+        self._thread.start()
+        logger.info(f"Метрики доступны на http://{self.httpd.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def stop(self) -> None:
+        if self._collector is not None:
+            self.registry.remove_collector(self._collector)
+            self._collector = None
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,422 @@
+"""
+Детерминированный AI провайдер без сети
+Задержка с заданным распределением, потоковая выдача, инъекция ошибок
+(429/500/таймаут), готовые ответы или правки кода по правилам.
+
+FakeLLMServer - локальный HTTP-сервер с протоколами OpenAI chat-completions
+и Ollama /api/generate: GroqProvider и OllamaProvider нагружаются через
+их настоящий HTTP-код без изменений:
+
+    server = FakeLLMServer(MockProvider(latency=0.5, errors={429: 0.05})).start()
+    groq = GroqProvider("key"); groq.API_URL = server.url + "/openai/v1/chat/completions"
+    ollama = OllamaProvider(host=server.url)
+
+Запуск отдельным процессом: python -m src.mock_provider --port 8000 --latency 0.5
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import select
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import logging
+
+from .ai_brain import AIProvider
+from .exceptions import ProviderError
+
+logger = logging.getLogger('WA.MockProvider')
+
+# Правка: (регулярное выражение, замена) или функция code -> code
+EditRule = Union[Tuple[str, str], Callable[[str], str]]
+
+FILE_IN_PROMPT = re.compile(r'Файл: (.+?)\n```python\n(.*?)```', re.DOTALL)
+CODE_IN_PROMPT = re.compile(r'```python\n(.*?)```', re.DOTALL)
+
+
+def add_docstring(code: str) -> str:
+    """Правка по умолчанию: добавить docstring модуля, если его нет"""
+    if code.lstrip().startswith(('"""', "'''")):
+        return code
+    return '"""Модуль"""\n' + code
+
+
+@dataclass(frozen=True)
+class MockOutcome:
+    """Заранее определённый исход одного запроса"""
+    latency: float
+    error: Optional[str]  # None, "429", "500" или "timeout"
+    text: str
+
+
+class MockProvider(AIProvider):
+    """AI провайдер без сети с воспроизводимым поведением"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, distribution: str = "lognormal",
+                 errors: Optional[Dict[Union[int, str], float]] = None, timeout: float = 30.0,
+                 responses: Optional[Sequence[str]] = None, edits: Optional[List[EditRule]] = None,
+                 chunk_chars: int = 64, chunk_delay: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency: Средняя задержка ответа в секундах
+            jitter: Разброс задержки (стандартное отклонение / полуширина)
+            distribution: constant, uniform, normal или lognormal
+            errors: Вероятности ошибок, например {429: 0.05, 500: 0.01, "timeout": 0.01}
+            timeout: Сколько "висит" вызов generate/stream с ошибкой timeout перед TimeoutError
+                (FakeLLMServer держит такой запрос, пока клиент сам не отключится)
+            responses: Готовые ответы по кругу (вместо правок кода)
+            edits: Правила правки кода из промпта (по умолчанию - добавить docstring)
+            chunk_chars: Размер фрагмента при потоковой выдаче
+            chunk_delay: Пауза между фрагментами
+            seed: Seed - одинаковые промпты дают одинаковые исходы
+        """
+        if distribution not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Неизвестное распределение: {distribution}")
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.errors = {str(k): float(v) for k, v in (errors or {}).items()}
+        self.timeout = timeout
+        self.responses = list(responses or [])
+        self.edits = list(edits) if edits is not None else [add_docstring]
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.seed = seed
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"calls": 0, "ok": 0, "429": 0, "500": 0, "timeout": 0}
+
+    # --- исход запроса ---
+
+    def _rng(self, prompt: str, seed: Optional[int]) -> Tuple[random.Random, int]:
+        """Генератор, зависящий от seed, промпта и номера попытки (не от порядка потоков)"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+            self.stats["calls"] += 1
+        rng = random.Random(f"{self.seed}:{seed}:{digest}:{attempt}")
+        return rng, attempt
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        if self.distribution == "constant" or not self.jitter:
+            return self.latency
+        if self.distribution == "uniform":
+            value = rng.uniform(self.latency - self.jitter, self.latency + self.jitter)
+        elif self.distribution == "normal":
+            value = rng.gauss(self.latency, self.jitter)
+        else:
+            # Логнормальное с заданными средним и стандартным отклонением
+            if self.latency <= 0:
+                return 0.0
+            sigma2 = math.log(1 + (self.jitter / self.latency) ** 2)
+            value = rng.lognormvariate(math.log(self.latency) - sigma2 / 2, math.sqrt(sigma2))
+        return max(0.0, value)
+
+    def _sample_error(self, rng: random.Random) -> Optional[str]:
+        roll = rng.random()
+        for kind, probability in self.errors.items():
+            if roll < probability:
+                return kind
+            roll -= probability
+        return None
+
+    def _apply_edits(self, code: str) -> str:
+        for rule in self.edits:
+            if callable(rule):
+                code = rule(code)
+            else:
+                code = re.sub(rule[0], rule[1], code)
+        return code
+
+    def respond(self, prompt: str, attempt: int = 0) -> str:
+        """Текст ответа: готовый ответ или файлы из промпта после правок"""
+        if self.responses:
+            return self.responses[attempt % len(self.responses)]
+
+        files = FILE_IN_PROMPT.findall(prompt)
+        if len(files) > 1:
+            # Пакетный промпт - блоки с путями файлов
+            return "\n".join(
+                f"```python\n# filepath: {path}\n{self._apply_edits(code.rstrip(chr(10)) + chr(10))}```"
+                for path, code in files
+            )
+        match = CODE_IN_PROMPT.search(prompt)
+        code = match.group(1).rstrip("\n") + "\n" if match else ""
+        return f"```python\n{self._apply_edits(code)}```"
+
+    def plan(self, prompt: str, seed: Optional[int] = None) -> MockOutcome:
+        """Определить исход запроса (задержка, ошибка, текст) без ожидания"""
+        rng, attempt = self._rng(prompt, seed)
+        latency = self._sample_latency(rng)
+        error = self._sample_error(rng)
+        with self._lock:
+            self.stats[error or "ok"] = self.stats.get(error or "ok", 0) + 1
+        if error == "timeout":
+            return MockOutcome(self.timeout, error, "")
+        return MockOutcome(latency, error, "" if error else self.respond(prompt, attempt))
+
+    @staticmethod
+    def raise_for(outcome: MockOutcome) -> None:
+        if outcome.error == "timeout":
+            raise TimeoutError("Таймаут запроса к mock провайдеру")
+        if outcome.error:
+            raise ProviderError(f"Mock провайдер вернул {outcome.error}", int(outcome.error))
+
+    # --- интерфейс провайдера ---
+
+    def generate(self, prompt: str, system: str = "", temperature: Optional[float] = None,
+                 seed: Optional[int] = None) -> str:
+        outcome = self.plan(prompt, seed)
+        time.sleep(outcome.latency)
+        self.raise_for(outcome)
+        return outcome.text
+
+    def chunks(self, text: str) -> List[str]:
+        """Разбить ответ на фрагменты потоковой выдачи"""
+        size = max(1, self.chunk_chars)
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def stream(self, prompt: str, system: str = "", temperature: Optional[float] = None,
+               seed: Optional[int] = None) -> Iterator[str]:
+        """Потоковая генерация: задержка до первого фрагмента, затем фрагменты"""
+        outcome = self.plan(prompt, seed)
+        time.sleep(outcome.latency)
+        self.raise_for(outcome)
+        for i, chunk in enumerate(self.chunks(outcome.text)):
+            if i and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield chunk
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _FakeLLMHandler(BaseHTTPRequestHandler):
+    provider: MockProvider = None
+    stopping: threading.Event = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: str) -> None:
+        raw = data.encode('utf-8')
+        self.wfile.write(f"{len(raw):X}\r\n".encode('ascii') + raw + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _hang(self) -> None:
+        """Держать соединение без ответа, пока клиент не отключится по своему таймауту"""
+        self.close_connection = True
+        sock = self.connection
+        while not self.stopping.is_set():
+            readable, _, _ = select.select([sock], [], [], 0.5)
+            if not readable:
+                continue
+            try:
+                if not sock.recv(1024, socket.MSG_PEEK):
+                    return
+                # Данные от клиента (например, следующий запрос) - читаем и ждём дальше
+                sock.recv(1024)
+            except OSError:
+                return
+
+    def _fail(self, outcome: MockOutcome) -> bool:
+        """Отправить ошибку исхода (True - ответ уже отправлен или соединение закрыто)"""
+        if outcome.error == "timeout":
+            self._hang()
+            return True
+        if outcome.error:
+            status = int(outcome.error)
+            headers = {"Retry-After": "1"} if status == 429 else None
+            self._send_json(status, {"error": {"message": f"mock error {status}", "code": status}}, headers)
+            return True
+        return False
+
+    def do_GET(self) -> None:
+        if self.path in ("/", "/health", "/api/tags", "/v1/models"):
+            self._send_json(200, {"status": "ok", "stats": dict(self.provider.stats)})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path.endswith("/chat/completions"):
+            self._chat_completions(self._read_json())
+        elif self.path == "/api/generate":
+            self._ollama_generate(self._read_json())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _chat_completions(self, request: Dict) -> None:
+        messages = request.get("messages") or []
+        prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        model = request.get("model", "mock")
+        outcome = self.provider.plan(prompt, request.get("seed"))
+        if outcome.error != "timeout":
+            time.sleep(outcome.latency)
+        if self._fail(outcome):
+            return
+
+        created = int(time.time())
+        if request.get("stream"):
+            self._start_stream("text/event-stream")
+            for i, chunk in enumerate(self.provider.chunks(outcome.text)):
+                if i and self.provider.chunk_delay:
+                    time.sleep(self.provider.chunk_delay)
+                event = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [{"index": 0, "delta": {"content": chunk},
+                                                      "finish_reason": None}]}
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self._end_stream()
+            return
+
+        prompt_tokens = sum(_estimate_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = _estimate_tokens(outcome.text)
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": outcome.text},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _ollama_generate(self, request: Dict) -> None:
+        prompt = request.get("prompt", "")
+        model = request.get("model", "mock")
+        options = request.get("options") or {}
+        outcome = self.provider.plan(prompt, options.get("seed"))
+        started = time.perf_counter()
+        if outcome.error != "timeout":
+            time.sleep(outcome.latency)
+        if self._fail(outcome):
+            return
+
+        final = {
+            "model": model,
+            "done": True,
+            "prompt_eval_count": _estimate_tokens(prompt) + _estimate_tokens(request.get("system", "")),
+            "eval_count": _estimate_tokens(outcome.text),
+        }
+        # Как и Ollama, по умолчанию отвечаем потоком
+        if request.get("stream", True):
+            self._start_stream("application/x-ndjson")
+            for i, chunk in enumerate(self.provider.chunks(outcome.text)):
+                if i and self.provider.chunk_delay:
+                    time.sleep(self.provider.chunk_delay)
+                self._write_chunk(json.dumps({"model": model, "response": chunk, "done": False},
+                                             ensure_ascii=False) + "\n")
+            final["response"] = ""
+            final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+            self._write_chunk(json.dumps(final) + "\n")
+            self._end_stream()
+            return
+
+        final["response"] = outcome.text
+        final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+        self._send_json(200, final)
+
+
+class FakeLLMServer:
+    """Локальный HTTP-сервер с протоколами OpenAI и Ollama поверх MockProvider"""
+
+    def __init__(self, provider: Optional[MockProvider] = None, port: int = 0, host: str = "127.0.0.1"):
+        self.provider = provider or MockProvider()
+        # Сигнал зависшим (ошибка timeout) обработчикам при остановке сервера
+        self._stopping = threading.Event()
+        handler = type("Handler", (_FakeLLMHandler,), {"provider": self.provider, "stopping": self._stopping})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeLLMServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="wa-fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'FakeLLMServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальный фейковый LLM-сервер (OpenAI и Ollama)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Средняя задержка, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Разброс задержки, с")
+    parser.add_argument("--distribution", default="lognormal",
+                        choices=["constant", "uniform", "normal", "lognormal"])
+    parser.add_argument("--error-429", type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument("--error-500", type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument("--error-timeout", type=float, default=0.0,
+                        help="Доля зависших запросов (соединение держится, пока клиент не отключится)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    provider = MockProvider(
+        latency=args.latency, jitter=args.jitter, distribution=args.distribution,
+        errors={429: args.error_429, 500: args.error_500, "timeout": args.error_timeout},
+        seed=args.seed
+    )
+    server = FakeLLMServer(provider, port=args.port, host=args.host)
+    print(f"Фейковый LLM-сервер: {server.url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Учёт ресурсов задачи по дереву процессов
+CPU-время, пиковая память (RSS) и байты ввода-вывода процесса автоматизации
+и запущенных задачей подпроцессов (pytest, py_compile).
+
+Трекер задачи хранится в contextvars: подпроцесс, запущенный внутри
+`with ResourceTracker()`, регистрируется через watch_process и завершается
+через wait_process (на POSIX - os.wait4 с точным rusage подпроцесса,
+без него - разница RUSAGE_CHILDREN до и после ожидания).
+"""
+
+import contextvars
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger('WA.Resources')
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+_current_tracker: contextvars.ContextVar[Optional['ResourceTracker']] = \
+    contextvars.ContextVar('wa_resource_tracker', default=None)
+
+# ru_maxrss: килобайты в Linux, байты в macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+_MB = 1024 * 1024
+
+
+class ResourceTracker:
+    """
+    Учёт ресурсов одной задачи
+
+    cpu_seconds - CPU-время потока, выполняющего задачу (в параллельном режиме
+    задачи не делят между собой CPU процесса). rss_peak_mb и io_* процесса
+    автоматизации - общие для процесса. Подпроцессы учитываются каждой задаче свои.
+    Прогоны через прогретый воркер pytest (start_test_worker) не учитываются:
+    их выполняет долгоживущий процесс воркера.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._token = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_cpu_start = 0.0
+        self._thread_cpu_end: Optional[float] = None
+        self._process = psutil.Process() if PSUTIL_AVAILABLE else None
+        self._io_start = (0, 0)
+        self._rss_peak = 0
+        # Подпроцессы: pid -> {"cpu", "read", "write"} (последние значения)
+        self._roots: Dict[int, object] = {}
+        self._children: Dict[int, Dict[str, float]] = {}
+        self._children_rss_peak = 0
+        self._exact_cpu: Dict[int, float] = {}
+
+    # --- жизненный цикл ---
+
+    def __enter__(self) -> 'ResourceTracker':
+        self._token = _current_tracker.set(self)
+        self._thread_cpu_start = time.thread_time()
+        if self._process is not None:
+            self._io_start = self._io(self._process)
+            self._sample()
+            self._thread = threading.Thread(target=self._run, name="wa-resources", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._thread_cpu_end = time.thread_time()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        if self._process is not None:
+            self._sample()
+        _current_tracker.reset(self._token)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    # --- сбор ---
+
+    @staticmethod
+    def _io(process) -> tuple:
+        try:
+            counters = process.io_counters()
+            return counters.read_bytes, counters.write_bytes
+        except (AttributeError, psutil.Error):
+            # macOS без io_counters или нет доступа
+            return 0, 0
+
+    def _sample(self) -> None:
+        try:
+            self._rss_peak = max(self._rss_peak, self._process.memory_info().rss)
+        except psutil.Error:
+            pass
+
+        with self._lock:
+            roots = list(self._roots.items())
+        tree_rss = 0
+        for pid, process in roots:
+            try:
+                members = [process] + process.children(recursive=True)
+            except psutil.Error:
+                continue
+            for member in members:
+                try:
+                    with member.oneshot():
+                        times = member.cpu_times()
+                        rss = member.memory_info().rss
+                        read, write = self._io(member)
+                except psutil.Error:
+                    continue
+                tree_rss += rss
+                with self._lock:
+                    self._children[member.pid] = {
+                        "cpu": times.user + times.system,
+                        "read": read,
+                        "write": write,
+                    }
+        with self._lock:
+            self._children_rss_peak = max(self._children_rss_peak, tree_rss)
+
+    def watch(self, pid: int) -> None:
+        """Учитывать подпроцесс pid и его потомков"""
+        if not PSUTIL_AVAILABLE:
+            return
+        try:
+            process = psutil.Process(pid)
+        except psutil.Error:
+            return
+        with self._lock:
+            self._roots[pid] = process
+
+    def finish(self, pid: int, rusage=None) -> None:
+        """Подпроцесс завершился: последний замер и точное CPU-время из rusage"""
+        if self._process is not None:
+            self._sample()
+        with self._lock:
+            self._roots.pop(pid, None)
+            if rusage is not None:
+                # rusage включает и потомков, дождавшихся подпроцессом
+                self._exact_cpu[pid] = rusage.ru_utime + rusage.ru_stime
+                self._children_rss_peak = max(self._children_rss_peak, rusage.ru_maxrss * _MAXRSS_UNIT)
+                self._children.setdefault(pid, {"cpu": 0.0, "read": 0, "write": 0})
+
+    # --- результат ---
+
+    def usage(self) -> Dict[str, float]:
+        """Ресурсы задачи на текущий момент (или на момент выхода из with)"""
+        end = self._thread_cpu_end if self._thread_cpu_end is not None else time.thread_time()
+        io_read = io_write = 0
+        if self._process is not None:
+            read, write = self._io(self._process)
+            io_read, io_write = read - self._io_start[0], write - self._io_start[1]
+
+        with self._lock:
+            children_cpu = 0.0
+            for pid, values in self._children.items():
+                children_cpu += self._exact_cpu.get(pid, values["cpu"])
+                io_read += values["read"]
+                io_write += values["write"]
+            data = {
+                "cpu_seconds": round(end - self._thread_cpu_start, 4),
+                "children_cpu_seconds": round(children_cpu, 4),
+                "rss_peak_mb": round(self._rss_peak / _MB, 1),
+                "children_rss_peak_mb": round(self._children_rss_peak / _MB, 1),
+                "io_read_bytes": int(io_read),
+                "io_write_bytes": int(io_write),
+                "child_processes": len(self._children),
+            }
+        return data
+
+
+def current_tracker() -> Optional[ResourceTracker]:
+    """Трекер текущей задачи или None"""
+    return _current_tracker.get()
+
+
+def watch_process(process: subprocess.Popen) -> Optional[ResourceTracker]:
+    """Зарегистрировать подпроцесс в трекере текущей задачи (если он есть)"""
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.watch(process.pid)
+    return tracker
+
+
+def _children_rusage():
+    """rusage всех дождавшихся потомков процесса (None, если недоступно)"""
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+class _RusageDelta:
+    """Разница двух RUSAGE_CHILDREN - в том же виде, что rusage из os.wait4"""
+
+    def __init__(self, before, after):
+        self.ru_utime = max(0.0, after.ru_utime - before.ru_utime)
+        self.ru_stime = max(0.0, after.ru_stime - before.ru_stime)
+        # ru_maxrss потомков - максимум, а не сумма: разница не имеет смысла
+        self.ru_maxrss = after.ru_maxrss if after.ru_maxrss > before.ru_maxrss else 0
+
+
+def wait_process(process: subprocess.Popen, tracker: Optional[ResourceTracker] = None) -> int:
+    """
+    Дождаться подпроцесса и передать его ресурсы трекеру
+
+    На POSIX процесс дожидается через os.wait4 - rusage даёт точное
+    CPU-время и пиковую память даже для коротких процессов. Если os.wait4
+    или блокировка Popen недоступны, rusage оценивается по разнице
+    RUSAGE_CHILDREN до и после process.wait().
+    """
+    if tracker is None:
+        return process.wait()
+    # Блокировка Popen (деталь реализации CPython): параллельный poll()
+    # не заберёт статус процесса до нас
+    waitpid_lock = getattr(process, "_waitpid_lock", None)
+    if hasattr(os, "wait4") and hasattr(os, "waitstatus_to_exitcode") and waitpid_lock is not None:
+        with waitpid_lock:
+            rusage = None
+            if process.returncode is None:
+                try:
+                    _, status, rusage = os.wait4(process.pid, 0)
+                    process.returncode = os.waitstatus_to_exitcode(status)
+                except ChildProcessError:
+                    pass
+        tracker.finish(process.pid, rusage)
+        return process.wait()
+
+    # RUSAGE_CHILDREN общий для процесса: если параллельно завершаются другие
+    # подпроцессы, их CPU-время попадёт в разницу - оценка приблизительная
+    before = _children_rusage()
+    returncode = process.wait()
+    after = _children_rusage()
+    rusage = _RusageDelta(before, after) if before is not None and after is not None else None
+    tracker.finish(process.pid, rusage)
+    return returncode
@@ -0,0 +1,105 @@
+"""
+Изолированные копии проекта для проверки изменений
+По умолчанию (режим copy) все файлы копируются. Режим hardlink быстрее:
+исходный код (.py) берётся жёсткими ссылками (copy-on-write через замену файла),
+остальные файлы - конфиги, данные, логи, которые тесты могут дописывать, -
+копируются. Тест, переписывающий на месте сам .py-файл проекта, в режиме
+hardlink изменит и оригинал.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional
+import logging
+
+from .exceptions import FileOperationError
+
+logger = logging.getLogger('WA.Sandbox')
+
+
+class Sandbox:
+    """Временная копия проекта"""
+
+    SKIP_DIRS = ['.git', '__pycache__', 'venv', '.venv', 'node_modules', '.pytest_cache']
+    # В режиме hardlink ссылками берутся только файлы исходного кода
+    LINK_EXTENSIONS = ('.py', '.pyi')
+
+    def __init__(self, project_path: str, mode: str = "copy", parent_dir: Optional[str] = None):
+        """
+        Инициализация песочницы
+
+        Args:
+            project_path: Корень проекта
+            mode: "copy" - полная копия, "hardlink" - жёсткие ссылки на .py (с откатом на копию)
+            parent_dir: Где создавать копию (по умолчанию - системная временная папка)
+        """
+        if mode not in ("hardlink", "copy"):
+            raise ValueError(f"Неизвестный режим песочницы: {mode}")
+        self.project_path = os.path.abspath(project_path)
+        self.mode = mode
+        self.parent_dir = parent_dir
+        self.path: Optional[str] = None
+        # Содержимое файлов до изменения в песочнице: для проверки конфликтов при слиянии
+        self.originals: Dict[str, Optional[str]] = {}
+
+    def create(self) -> str:
+        """Создать копию проекта и вернуть путь к ней"""
+        self.path = tempfile.mkdtemp(prefix="wa-sandbox-", dir=self.parent_dir)
+        link = self.mode == "hardlink"
+
+        for root, dirs, filenames in os.walk(self.project_path):
+            dirs[:] = [d for d in dirs if d not in self.SKIP_DIRS]
+            target_root = os.path.join(self.path, os.path.relpath(root, self.project_path))
+            os.makedirs(target_root, exist_ok=True)
+            for filename in filenames:
+                source = os.path.join(root, filename)
+                target = os.path.join(target_root, filename)
+                if link and filename.endswith(self.LINK_EXTENSIONS):
+                    try:
+                        os.link(source, target)
+                        continue
+                    except OSError as e:
+                        # Другая ФС или нет прав - дальше копируем
+                        logger.debug(f"Жёсткие ссылки недоступны, копируем файлы: {e}")
+                        link = False
+                shutil.copy2(source, target)
+
+        return self.path
+
+    def apply(self, rel_path: str, content: str) -> None:
+        """
+        Записать файл в песочницу
+
+        Файл заменяется через rename, поэтому жёсткая ссылка на файл проекта
+        разрывается и оригинал не меняется.
+        """
+        if self.path is None:
+            raise FileOperationError("Песочница не создана")
+
+        target = os.path.join(self.path, rel_path)
+        if rel_path not in self.originals:
+            try:
+                with open(target, 'r', encoding='utf-8') as f:
+                    self.originals[rel_path] = f.read()
+            except FileNotFoundError:
+                self.originals[rel_path] = None
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = target + ".wa-tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, target)
+
+    def destroy(self) -> None:
+        """Удалить песочницу"""
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+    def __enter__(self) -> 'Sandbox':
+        self.create()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.destroy()
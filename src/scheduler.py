@@ -0,0 +1,270 @@
+"""
+Планировщик задач улучшения
+Куча по оценке: приоритет + возраст задачи - стоимость + успешность типа задачи
+"""
+
+import heapq
+import itertools
+import os
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger('WA.Scheduler')
+
+
+@dataclass
+class ScoreWeights:
+    """Веса оценки задачи (чем выше оценка, тем раньше задача)"""
+    priority: float = 1.0        # за единицу приоритета (1-5)
+    age_per_hour: float = 0.1    # за час ожидания в очереди
+    cost_per_1k_tokens: float = 0.2
+    cost_per_test_second: float = 0.02
+    success: float = 2.0         # за отклонение успешности типа от 50%
+
+
+class TaskScheduler:
+    """
+    Очередь задач на куче
+
+    Возраст растёт одинаково у всех задач, поэтому вклад "now" не меняет порядок:
+    ключ кучи не зависит от времени, и выбор задачи стоит O(log n).
+    Задачи разложены по кучам своего типа: успешность типа учитывается при
+    сравнении вершин, а результат задачи меняет ключи только задач того же
+    файла - они добавляются в кучу заново, старые записи удаляются лениво.
+    """
+
+    # Грубая оценка: ~4 символа на токен, промпт + ответ с полным файлом
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, project_path: str, weights: Optional[ScoreWeights] = None):
+        self.project_path = project_path
+        self.weights = weights or ScoreWeights()
+        # Кучи по типу задачи, элементы: (ключ, порядковый номер, задача)
+        self._heaps: Dict[str, List[Tuple[float, int, object]]] = {}
+        self._heap_size = 0
+        self._counter = itertools.count()
+        self._queued: Dict[str, object] = {}
+        # Актуальная запись кучи задачи: id -> порядковый номер
+        self._entries: Dict[str, int] = {}
+        # Задачи в очереди по файлу (для пересчёта ключей после результата)
+        self._by_file: Dict[str, Set[str]] = {}
+        # Размеры файлов: читаются с диска один раз на файл
+        self._sizes: Dict[str, int] = {}
+        # Статистика по типам задач: тип -> [успешно, всего]
+        self._type_stats: Dict[str, List[int]] = {}
+        # Среднее время выполнения (LLM + тесты) по файлу
+        self._file_seconds: Dict[str, Tuple[float, int]] = {}
+
+    # --- оценка ---
+
+    def _file_size(self, task) -> int:
+        if not task.file_path:
+            return 0
+        size = self._sizes.get(task.file_path)
+        if size is None:
+            try:
+                size = os.path.getsize(os.path.join(self.project_path, task.file_path))
+            except OSError:
+                size = 0
+            self._sizes[task.file_path] = size
+        return size
+
+    def success_rate(self, task_type: Optional[str]) -> float:
+        """Успешность типа задачи (0.5 - если истории нет)"""
+        succeeded, total = self._type_stats.get(task_type or "", (0, 0))
+        # Сглаживание: одна воображаемая успешная и одна неуспешная попытка
+        return (succeeded + 1) / (total + 2)
+
+    @staticmethod
+    def _created_ts(task) -> float:
+        try:
+            return datetime.fromisoformat(task.created_at).timestamp()
+        except (TypeError, ValueError):
+            return datetime.now().timestamp()
+
+    def _static_parts(self, task) -> Dict[str, float]:
+        """Составляющие оценки, не зависящие от текущего времени"""
+        w = self.weights
+        tokens = self._file_size(task) * 2 / self.CHARS_PER_TOKEN
+        seconds, _ = self._file_seconds.get(task.file_path or "", (0.0, 0))
+        rate = self.success_rate(getattr(task, "task_type", None))
+        return {
+            "priority": w.priority * task.priority,
+            "cost": -(w.cost_per_1k_tokens * tokens / 1000 + w.cost_per_test_second * seconds),
+            "success": w.success * (rate - 0.5),
+        }
+
+    def explain(self, task, now: Optional[datetime] = None) -> Dict:
+        """Составляющие оценки задачи (для настройки весов)"""
+        now_ts = (now or datetime.now()).timestamp()
+        age_hours = max(0.0, (now_ts - self._created_ts(task)) / 3600)
+
+        parts = self._static_parts(task)
+        parts["age"] = self.weights.age_per_hour * age_hours
+        seconds, _ = self._file_seconds.get(task.file_path or "", (0.0, 0))
+        return {
+            "task_id": task.id,
+            "score": round(sum(parts.values()), 4),
+            "components": {k: round(v, 4) for k, v in parts.items()},
+            "estimated_tokens": int(self._file_size(task) * 2 / self.CHARS_PER_TOKEN),
+            "estimated_seconds": round(seconds, 2),
+            "success_rate": round(self.success_rate(getattr(task, "task_type", None)), 3),
+        }
+
+    @staticmethod
+    def _type(task) -> str:
+        return getattr(task, "task_type", None) or ""
+
+    def _success_part(self, task_type: str) -> float:
+        return self.weights.success * (self.success_rate(task_type) - 0.5)
+
+    def _key(self, task) -> float:
+        """
+        Ключ кучи типа задачи (меньше - раньше), без вклада успешности типа
+
+        score = static + w_age * (now - created) / 3600; слагаемое с now одинаково
+        для всех задач, поэтому порядок задаёт static - w_age * created / 3600.
+        Успешность одинакова для всех задач типа и вычитается при сравнении
+        вершин куч (см. peek) - её изменение не требует пересчёта ключей.
+        """
+        parts = self._static_parts(task)
+        static = parts["priority"] + parts["cost"]
+        return self.weights.age_per_hour * self._created_ts(task) / 3600 - static
+
+    # --- очередь ---
+
+    def _entry(self, task) -> Tuple[float, int, object]:
+        seq = next(self._counter)
+        self._entries[task.id] = seq
+        return self._key(task), seq, task
+
+    def _index(self, task) -> None:
+        if task.file_path:
+            self._by_file.setdefault(task.file_path, set()).add(task.id)
+
+    def _remove(self, task) -> None:
+        """Убрать задачу из очереди и индекса по файлам"""
+        self._queued.pop(task.id, None)
+        self._entries.pop(task.id, None)
+        if task.file_path:
+            self._by_file.get(task.file_path, set()).discard(task.id)
+
+    def _heap_push(self, task) -> None:
+        heapq.heappush(self._heaps.setdefault(self._type(task), []), self._entry(task))
+        self._heap_size += 1
+
+    def push(self, task) -> None:
+        """Добавить задачу в очередь"""
+        previous = self._queued.get(task.id)
+        if previous is not None and previous is not task:
+            self._remove(previous)
+        self._queued[task.id] = task
+        self._index(task)
+        self._heap_push(task)
+
+    def rebuild(self, tasks: List) -> None:
+        """Перестроить кучи по списку невыполненных задач (размеры файлов читаются заново)"""
+        self._sizes.clear()
+        self._reheap([t for t in tasks if t.status == "pending"])
+
+    def _reheap(self, tasks: List) -> None:
+        self._queued = {t.id: t for t in tasks}
+        self._entries = {}
+        self._by_file = {}
+        self._heaps = {}
+        for task in self._queued.values():
+            self._index(task)
+            self._heaps.setdefault(self._type(task), []).append(self._entry(task))
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+        self._heap_size = len(self._queued)
+
+    def _rekey(self, task_ids: Set[str]) -> None:
+        """Добавить задачам записи с новыми ключами (старые станут неактуальными)"""
+        for task_id in task_ids:
+            task = self._queued.get(task_id)
+            if task is not None:
+                self._heap_push(task)
+        # Неактуальных записей больше, чем задач - сжимаем кучи (без чтения файлов)
+        if self._heap_size > 2 * len(self._queued) + 64:
+            self._reheap(list(self._queued.values()))
+
+    def _top(self, heap: List):
+        """Актуальная вершина кучи (неактуальные записи удаляются)"""
+        while heap:
+            _, seq, task = heap[0]
+            current = self._entries.get(task.id) == seq
+            if current and task.status == "pending":
+                return heap[0]
+            # Ленивое удаление: задача уже выполнена, отменена или переставлена
+            heapq.heappop(heap)
+            self._heap_size -= 1
+            if current:
+                self._remove(task)
+        return None
+
+    def _best_heap(self) -> Optional[List]:
+        """Куча с лучшей задачей: O(число типов) вершин"""
+        best, best_order = None, None
+        for task_type, heap in self._heaps.items():
+            top = self._top(heap)
+            if top is None:
+                continue
+            order = (top[0] - self._success_part(task_type), top[1])
+            if best_order is None or order < best_order:
+                best, best_order = heap, order
+        return best
+
+    def peek(self):
+        """Лучшая невыполненная задача (без извлечения) или None"""
+        heap = self._best_heap()
+        return heap[0][2] if heap else None
+
+    def pop(self):
+        """Извлечь лучшую невыполненную задачу"""
+        heap = self._best_heap()
+        if heap is None:
+            return None
+        _, _, task = heapq.heappop(heap)
+        self._heap_size -= 1
+        self._remove(task)
+        return task
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    # --- статистика ---
+
+    def record_outcome(self, task_type: Optional[str], file_path: Optional[str],
+                       success: bool, duration: float, rekey: bool = True) -> None:
+        """Учесть результат выполнения задачи"""
+        stats = self._type_stats.setdefault(task_type or "", [0, 0])
+        stats[0] += int(success)
+        stats[1] += 1
+
+        if file_path:
+            seconds, count = self._file_seconds.get(file_path, (0.0, 0))
+            self._file_seconds[file_path] = ((seconds * count + duration) / (count + 1), count + 1)
+            # Задача могла изменить файл
+            self._sizes.pop(file_path, None)
+
+        if rekey:
+            # Успешность типа учтена при сравнении вершин - пересчитываем только задачи файла
+            if file_path:
+                self._rekey(set(self._by_file.get(file_path, ())))
+
+    def load_history(self, history: List[Dict]) -> None:
+        """Заполнить статистику из сохранённой истории (прежняя статистика сбрасывается)"""
+        self._type_stats = {}
+        self._file_seconds = {}
+        for record in history:
+            if isinstance(record, dict):
+                self.record_outcome(record.get("task_type"), record.get("file_path"),
+                                    bool(record.get("success")), float(record.get("duration") or 0),
+                                    rekey=False)
+        self._reheap(list(self._queued.values()))
+
+    def get_weights(self) -> Dict:
+        return asdict(self.weights)
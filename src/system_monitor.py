@@ -1,14 +1,20 @@
 """
 Мониторинг системных ресурсов - CPU, RAM, GPU
+Фоновый сборщик публикует неизменяемый снимок SystemStats,
+чтение снимка не блокирует вызывающего.
 """
 
 import os
 import platform
-import subprocess
+import threading
+import time
 from dataclasses import dataclass
 from typing import Optional
 import logging
 
+from .gpu_monitor import EMPTY_GPU_STATS, create_gpu_reader
+from .metric_history import MetricHistory
+
 logger = logging.getLogger('WA.Monitor')
 
 try:
@@ -18,9 +24,9 @@ except ImportError:
     PSUTIL_AVAILABLE = False
 
 
-@dataclass
+@dataclass(frozen=True)
 class SystemStats:
-    """Статистика системы"""
+    """Статистика системы (неизменяемый снимок)"""
     cpu_percent: float = 0.0
     cpu_cores: int = 0
     ram_total_gb: float = 0.0
@@ -35,105 +41,159 @@ class SystemStats:
     disk_percent: float = 0.0
     python_version: str = ""
     os_name: str = ""
+    timestamp: float = 0.0
 
 
 class SystemMonitor:
     """Мониторинг системных ресурсов"""
     
-    def __init__(self):
-        self.has_nvidia = self._check_nvidia()
+    def __init__(self, interval: float = 1.0, history: Optional[MetricHistory] = None,
+                 gpu_mode: str = "auto"):
+        """
+        Args:
+            interval: Период фонового сбора в секундах (см. start)
+            history: История метрик (по умолчанию - 1 ч по 1 с, сутки по 10 с, неделя по 1 мин)
+            gpu_mode: auto (NVML или nvidia-smi --loop-ms), nvml, loop, query (nvidia-smi на каждый
+                вызов) или off
+        """
+        self.interval = interval
+        self.history = history or MetricHistory()
+        # Источник GPU определяется при первом чтении: поиск NVML/nvidia-smi
+        # и ожидание первой строки не должны задерживать создание монитора
+        self.gpu_mode = gpu_mode
+        self._gpu_reader = None
+        self._gpu_probed = False
+        self._gpu_lock = threading.Lock()
+        # Неизменные за время работы значения считаем один раз
+        self._static = {
+            "python_version": platform.python_version(),
+            "os_name": f"{platform.system()} {platform.release()}",
+        }
+        if PSUTIL_AVAILABLE:
+            self._static["cpu_cores"] = psutil.cpu_count()
+            # Первый вызов без интервала задаёт точку отсчёта для следующих
+            psutil.cpu_percent(interval=None)
+        self._snapshot: Optional[SystemStats] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
     
-    def _check_nvidia(self) -> bool:
-        """Проверить наличие NVIDIA GPU"""
-        try:
-            result = subprocess.run(
-                ["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            return result.returncode == 0
-        except:
-            return False
+    @property
+    def gpu_reader(self):
+        """Источник статистики GPU (None без GPU); создаётся при первом обращении"""
+        if not self._gpu_probed:
+            with self._gpu_lock:
+                if not self._gpu_probed:
+                    self._gpu_reader = create_gpu_reader(
+                        self.gpu_mode, interval_ms=max(100, int(self.interval * 1000))
+                    )
+                    self._gpu_probed = True
+        return self._gpu_reader
+    
+    @property
+    def has_nvidia(self) -> bool:
+        return self.gpu_reader is not None
     
     def get_gpu_stats(self) -> dict:
         """Получить статистику GPU"""
-        if not self.has_nvidia:
-            return {
-                "name": "N/A",
-                "memory_total": 0,
-                "memory_used": 0,
-                "utilization": 0
-            }
-        
-        try:
-            result = subprocess.run(
-                [
-                    "nvidia-smi",
-                    "--query-gpu=name,memory.total,memory.used,utilization.gpu",
-                    "--format=csv,noheader,nounits"
-                ],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
-            if result.returncode == 0:
-                parts = result.stdout.strip().split(", ")
-                if len(parts) >= 4:
-                    return {
-                        "name": parts[0],
-                        "memory_total": int(parts[1]),
-                        "memory_used": int(parts[2]),
-                        "utilization": float(parts[3])
-                    }
-        except Exception as e:
-            logger.debug(f"GPU stats error: {e}")
-        
-        return {
-            "name": "N/A",
-            "memory_total": 0,
-            "memory_used": 0,
-            "utilization": 0
-        }
+        if self.gpu_reader is None:
+            return dict(EMPTY_GPU_STATS)
+        return self.gpu_reader.read()
     
-    def get_stats(self) -> SystemStats:
-        """Получить полную статистику системы"""
-        stats = SystemStats()
+    def sample(self) -> SystemStats:
+        """
+        Собрать новый снимок статистики
         
-        # Python и OS
-        stats.python_version = platform.python_version()
-        stats.os_name = f"{platform.system()} {platform.release()}"
+        Загрузка CPU - среднее с предыдущего сбора (cpu_percent без ожидания).
+        """
+        fields = dict(self._static)
+        fields["timestamp"] = time.time()
         
         if PSUTIL_AVAILABLE:
             # CPU
-            stats.cpu_percent = psutil.cpu_percent(interval=0.1)
-            stats.cpu_cores = psutil.cpu_count()
+            fields["cpu_percent"] = psutil.cpu_percent(interval=None)
             
             # RAM
             mem = psutil.virtual_memory()
-            stats.ram_total_gb = round(mem.total / (1024**3), 1)
-            stats.ram_used_gb = round(mem.used / (1024**3), 1)
-            stats.ram_percent = mem.percent
+            fields["ram_total_gb"] = round(mem.total / (1024**3), 1)
+            fields["ram_used_gb"] = round(mem.used / (1024**3), 1)
+            fields["ram_percent"] = mem.percent
             
             # Disk
             disk = psutil.disk_usage('/')
-            stats.disk_total_gb = round(disk.total / (1024**3), 1)
-            stats.disk_used_gb = round(disk.used / (1024**3), 1)
-            stats.disk_percent = disk.percent
+            fields["disk_total_gb"] = round(disk.total / (1024**3), 1)
+            fields["disk_used_gb"] = round(disk.used / (1024**3), 1)
+            fields["disk_percent"] = disk.percent
         
         # GPU
         gpu = self.get_gpu_stats()
-        stats.gpu_name = gpu["name"]
-        stats.gpu_memory_total_mb = gpu["memory_total"]
-        stats.gpu_memory_used_mb = gpu["memory_used"]
-        stats.gpu_utilization = gpu["utilization"]
+        fields["gpu_name"] = gpu["name"]
+        fields["gpu_memory_total_mb"] = gpu["memory_total"]
+        fields["gpu_memory_used_mb"] = gpu["memory_used"]
+        fields["gpu_utilization"] = gpu["utilization"]
         
+        stats = SystemStats(**fields)
+        self.history.record(stats)
+        # Публикация - одно присваивание ссылки, читателям блокировка не нужна
+        self._snapshot = stats
         return stats
     
-    def get_formatted_stats(self) -> str:
-        """Получить форматированную строку статистики"""
-        stats = self.get_stats()
+    def get_stats(self) -> SystemStats:
+        """
+        Получить статистику системы
+        
+        При работающем фоновом сборщике - последний снимок без ожидания,
+        иначе снимок собирается в вызывающем потоке.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and self.running:
+            return snapshot
+        return self.sample()
+    
+    # --- фоновый сбор ---
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, interval: Optional[float] = None) -> 'SystemMonitor':
+        """Запустить фоновый сбор статистики"""
+        if interval is not None:
+            self.interval = interval
+        if self.running:
+            return self
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wa-monitor", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Остановить фоновый сбор"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+    
+    def close(self):
+        """Остановить сбор и источник статистики GPU"""
+        self.stop()
+        with self._gpu_lock:
+            if self._gpu_reader is not None:
+                self._gpu_reader.close()
+            self._gpu_reader = None
+            # После close GPU больше не опрашивается
+            self._gpu_probed = True
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.debug(f"Ошибка сбора статистики: {e}")
+    
+    def get_formatted_stats(self, stats: Optional[SystemStats] = None) -> str:
+        """Получить форматированную строку статистики (по снимку stats или текущему)"""
+        stats = stats or self.get_stats()
         
         lines = [
             f"🖥️ OS: {stats.os_name}",
@@ -0,0 +1,273 @@
+"""
+Анализ влияния изменений на тесты
+Статический граф импортов: какие тестовые модули зависят от изменённого файла.
+conftest.py (и модули из его pytest_plugins) влияет на все тесты своей папки.
+Граф строится один раз и дальше обновляется только по изменённым файлам.
+"""
+
+import ast
+import os
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger('WA.TestImpact')
+
+
+class TestImpactSelector:
+    """Выбор тестов, затронутых изменением файлов"""
+
+    # Имя начинается с Test - pytest не должен принимать класс за набор тестов
+    __test__ = False
+
+    SKIP_DIRS = ['.git', '__pycache__', 'venv', '.venv', 'node_modules']
+
+    def __init__(self, project_path: str, tests_dir: str = "tests",
+                 source_roots: Optional[List[str]] = None, full_run_interval: int = 10):
+        """
+        Инициализация селектора
+
+        Args:
+            project_path: Корень проекта
+            tests_dir: Папка с тестами (относительно корня)
+            source_roots: Корни, от которых считаются имена модулей ('' - корень проекта)
+            full_run_interval: Каждый N-й выбор - полный прогон для подстраховки (0 - никогда)
+        """
+        self.project_path = os.path.abspath(project_path)
+        self.tests_dir = tests_dir
+        self.source_roots = source_roots if source_roots is not None else ["", "src"]
+        self.full_run_interval = full_run_interval
+        self.selections = 0
+
+        # Кэш разобранных импортов: путь -> ((mtime, size), импортируемые модули)
+        self._imports_cache: Dict[str, Tuple[Tuple[float, int], Set[str]]] = {}
+        # Граф импортов (None - ещё не построен или устарел)
+        self._graph: Optional[Dict[str, Set[str]]] = None
+        self._by_module: Dict[str, str] = {}
+        self._reverse: Dict[str, Set[str]] = {}
+
+    def _python_files(self) -> List[str]:
+        files = []
+        for root, dirs, filenames in os.walk(self.project_path):
+            dirs[:] = [d for d in dirs if d not in self.SKIP_DIRS]
+            for filename in filenames:
+                if filename.endswith('.py'):
+                    files.append(os.path.join(root, filename))
+        return files
+
+    def is_test_file(self, filepath: str) -> bool:
+        """Является ли файл тестовым модулем"""
+        rel_path = os.path.relpath(filepath, self.project_path)
+        name = os.path.basename(rel_path)
+        in_tests = rel_path.split(os.sep)[0] == self.tests_dir
+        return in_tests and (name.startswith("test_") or name.endswith("_test.py"))
+
+    @staticmethod
+    def is_conftest(filepath: str) -> bool:
+        return os.path.basename(filepath) == "conftest.py"
+
+    def module_names(self, filepath: str) -> List[str]:
+        """Имена модуля файла относительно всех корней исходников"""
+        names = []
+        for root in self.source_roots:
+            base = os.path.join(self.project_path, root) if root else self.project_path
+            rel_path = os.path.relpath(filepath, base)
+            if rel_path.startswith('..'):
+                continue
+            parts = rel_path[:-3].split(os.sep)
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            if parts:
+                names.append(".".join(parts))
+        return names
+
+    def _parse_imports(self, filepath: str) -> Set[str]:
+        """Модули, импортируемые файлом (с кэшем по mtime)"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return set()
+        key = (stat.st_mtime, stat.st_size)
+
+        cached = self._imports_cache.get(filepath)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        imports: Set[str] = set()
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                tree = ast.parse(f.read(), filepath)
+        except (SyntaxError, ValueError, OSError) as e:
+            logger.debug(f"Не удалось разобрать {filepath}: {e}")
+            tree = None
+
+        if tree is not None:
+            imports.update(self._pytest_plugins(tree))
+            package = self.module_names(filepath)
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    imports.update(alias.name for alias in node.names)
+                elif isinstance(node, ast.ImportFrom):
+                    if node.level:
+                        # Относительный импорт - разворачиваем от пакета файла
+                        for name in package:
+                            parts = name.split(".")
+                            is_package = os.path.basename(filepath) == "__init__.py"
+                            base = parts[:len(parts) - node.level + (1 if is_package else 0)]
+                            module = ".".join(base + ([node.module] if node.module else []))
+                            imports.add(module)
+                            imports.update(f"{module}.{alias.name}" for alias in node.names)
+                    elif node.module:
+                        imports.add(node.module)
+                        imports.update(f"{node.module}.{alias.name}" for alias in node.names)
+
+        self._imports_cache[filepath] = (key, imports)
+        return imports
+
+    @staticmethod
+    def _pytest_plugins(tree: ast.Module) -> Set[str]:
+        """Модули из `pytest_plugins = [...]` уровня модуля"""
+        plugins: Set[str] = set()
+        for node in tree.body:
+            if not isinstance(node, ast.Assign):
+                continue
+            if not any(isinstance(t, ast.Name) and t.id == "pytest_plugins" for t in node.targets):
+                continue
+            values = node.value.elts if isinstance(node.value, (ast.List, ast.Tuple)) else [node.value]
+            plugins.update(v.value for v in values
+                           if isinstance(v, ast.Constant) and isinstance(v.value, str))
+        return plugins
+
+    def _deps(self, filepath: str) -> Set[str]:
+        deps = set()
+        for module in self._parse_imports(filepath):
+            # Импорт пакета тянет за собой его __init__ и все родительские пакеты
+            parts = module.split(".")
+            for i in range(len(parts), 0, -1):
+                target = self._by_module.get(".".join(parts[:i]))
+                if target and target != filepath:
+                    deps.add(target)
+        return deps
+
+    def _link(self) -> None:
+        """Пересчитать зависимости и обратный граф по кэшу импортов (без чтения файлов)"""
+        for filepath in self._graph:
+            self._graph[filepath] = self._deps(filepath)
+        self._reverse = {}
+        for filepath, deps in self._graph.items():
+            for dep in deps:
+                self._reverse.setdefault(dep, set()).add(filepath)
+
+    def build_graph(self) -> Dict[str, Set[str]]:
+        """Граф импортов: файл -> файлы проекта, которые он импортирует (полный обход)"""
+        files = self._python_files()
+        self._by_module = {}
+        for filepath in files:
+            for name in self.module_names(filepath):
+                self._by_module[name] = filepath
+        self._graph = dict.fromkeys(files)
+        self._link()
+        return self._graph
+
+    def invalidate(self) -> None:
+        """Пересобрать граф полным обходом при следующем выборе"""
+        self._graph = None
+
+    def update(self, changed_files: List[str]) -> None:
+        """Обновить граф только по изменённым файлам (новые, удалённые, изменённые)"""
+        if self._graph is None:
+            self.build_graph()
+            return
+        modules_changed = False
+        for filepath in changed_files:
+            if not filepath.endswith('.py'):
+                continue
+            exists = os.path.isfile(filepath)
+            if exists != (filepath in self._graph):
+                modules_changed = True
+                for name in self.module_names(filepath):
+                    if exists:
+                        self._by_module[name] = filepath
+                    elif self._by_module.get(name) == filepath:
+                        del self._by_module[name]
+            if exists:
+                self._graph.setdefault(filepath, set())
+            else:
+                self._graph.pop(filepath, None)
+                self._imports_cache.pop(filepath, None)
+
+        if modules_changed:
+            # Файл модуля появился или исчез - могли измениться связи любых файлов
+            self._link()
+            return
+        for filepath in changed_files:
+            if filepath not in self._graph:
+                continue
+            old = self._graph[filepath]
+            new = self._deps(filepath)
+            for dep in old - new:
+                self._reverse[dep].discard(filepath)
+            for dep in new - old:
+                self._reverse.setdefault(dep, set()).add(filepath)
+            self._graph[filepath] = new
+
+    def _abs(self, changed_files: List[str]) -> List[str]:
+        return [os.path.abspath(os.path.join(self.project_path, f)) for f in changed_files]
+
+    def _dependents(self, filepath: str) -> Set[str]:
+        """Тестовые модули, транзитивно зависящие от файла"""
+        seen = {filepath}
+        stack = [filepath]
+        tests = set()
+        while stack:
+            current = stack.pop()
+            if self.is_test_file(current):
+                tests.add(current)
+            if self.is_conftest(current):
+                # Фикстуры и хуки conftest действуют на все тесты в его папке
+                folder = os.path.dirname(current) + os.sep
+                tests.update(f for f in self._graph if f.startswith(folder) and self.is_test_file(f))
+            for importer in self._reverse.get(current, ()):
+                if importer not in seen:
+                    seen.add(importer)
+                    stack.append(importer)
+        return tests
+
+    def affected_tests(self, changed_files: List[str]) -> Optional[List[str]]:
+        """
+        Тестовые модули, транзитивно зависящие от изменённых файлов
+
+        Returns:
+            Список тестов или None, если от какого-то файла не зависит ни один тест
+            (граф не покрывает файл - нужен полный прогон)
+        """
+        changed = self._abs(changed_files)
+        self.update(changed)
+        selected: Set[str] = set()
+        for filepath in changed:
+            tests = self._dependents(filepath)
+            if not tests:
+                logger.info(f"От {os.path.relpath(filepath, self.project_path)} не зависит ни один тест "
+                            f"- полный прогон")
+                return None
+            selected |= tests
+        return sorted(os.path.relpath(f, self.project_path) for f in selected)
+
+    def select(self, changed_files: Optional[List[str]]) -> Optional[List[str]]:
+        """
+        Выбрать тесты для прогона
+
+        Returns:
+            Список тестовых файлов или None, если нужен полный прогон
+        """
+        self.selections += 1
+        if not changed_files:
+            return None
+        if self.full_run_interval and self.selections % self.full_run_interval == 0:
+            logger.info("Плановый полный прогон тестов")
+            # Заодно пересобираем граф: файлы могли измениться не через select
+            self.invalidate()
+            return None
+        if any(not f.endswith('.py') for f in changed_files):
+            # Изменения не в Python-коде (конфиги, данные) - граф ничего не скажет
+            return None
+        return self.affected_tests(changed_files)
@@ -0,0 +1,210 @@
+"""
+Параллельный запуск pytest
+Шардирование тестов по ядрам (pytest-xdist или встроенный шардер),
+режим остановки на первом падении и потоковое чтение вывода
+"""
+
+import importlib.util
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+import logging
+
+from .resource_usage import wait_process, watch_process
+
+logger = logging.getLogger('WA.TestRunner')
+
+XDIST_AVAILABLE = importlib.util.find_spec("xdist") is not None
+
+# Заголовок секции падения: "____ test_name ____" / "____ ERROR collecting x.py ____"
+FAILURE_HEADER = re.compile(r'^_{3,} .+ _{3,}$')
+SECTION_HEADER = re.compile(r'^={3,}')
+
+
+class FailureCollector:
+    """Потоковый разбор вывода: первое падение и хвост лога без буферизации всего вывода"""
+
+    def __init__(self, max_failure_lines: int = 40, tail_lines: int = 60):
+        self.max_failure_lines = max_failure_lines
+        self.first_failure: List[str] = []
+        self.tail: Deque[str] = deque(maxlen=tail_lines)
+        self._capturing = False
+        self._summary_line: Optional[str] = None
+
+    def feed(self, line: str) -> None:
+        """Обработать очередную строку вывода"""
+        line = line.rstrip('\n')
+        self.tail.append(line)
+
+        if self._capturing:
+            if FAILURE_HEADER.match(line) or SECTION_HEADER.match(line) \
+                    or len(self.first_failure) >= self.max_failure_lines:
+                self._capturing = False
+            else:
+                self.first_failure.append(line)
+                return
+
+        if not self.first_failure and FAILURE_HEADER.match(line):
+            self.first_failure.append(line)
+            self._capturing = True
+        elif self._summary_line is None and line.startswith(("FAILED ", "ERROR ")):
+            self._summary_line = line
+
+    def output(self) -> str:
+        """Итоговый вывод: первое падение (если было), затем хвост лога"""
+        head = self.first_failure or ([self._summary_line] if self._summary_line else [])
+        if head:
+            return "\n".join(head) + "\n...\n" + "\n".join(self.tail)
+        return "\n".join(self.tail)
+
+
+class ParallelTestRunner:
+    """Запуск pytest в несколько процессов с потоковым выводом"""
+
+    # Коды pytest: 0 - все прошли, 5 - тестов не найдено
+    NO_TESTS_COLLECTED = 5
+    OK_CODES = (0, NO_TESTS_COLLECTED)
+
+    def __init__(self, project_path: str, jobs: int = 1, timeout: float = 120):
+        """
+        Args:
+            project_path: Корень проекта
+            jobs: Число параллельных процессов (0 - по числу ядер)
+            timeout: Общий таймаут прогона в секундах
+        """
+        self.project_path = project_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+
+    def _expand_targets(self, targets: List[str]) -> List[str]:
+        """Развернуть папки в список тестовых файлов (для встроенного шардера)"""
+        files = []
+        for target in targets:
+            path = os.path.join(self.project_path, target)
+            if not os.path.isdir(path):
+                files.append(target)
+                continue
+            for root, dirs, filenames in os.walk(path):
+                dirs[:] = [d for d in dirs if d != '__pycache__']
+                for filename in sorted(filenames):
+                    if filename.endswith('.py') and (filename.startswith('test_') or filename.endswith('_test.py')):
+                        files.append(os.path.relpath(os.path.join(root, filename), self.project_path))
+        return files
+
+    def _shards(self, targets: List[str]) -> List[List[str]]:
+        """Разбить файлы на шарды, выравнивая по размеру файлов"""
+        files = self._expand_targets(targets)
+        count = max(1, min(self.jobs, len(files)))
+        if count == 1:
+            return [targets]
+
+        def size(rel_path: str) -> int:
+            try:
+                return os.path.getsize(os.path.join(self.project_path, rel_path.split('::')[0]))
+            except OSError:
+                return 0
+
+        shards: List[List[str]] = [[] for _ in range(count)]
+        loads = [0] * count
+        for rel_path in sorted(files, key=size, reverse=True):
+            i = loads.index(min(loads))
+            shards[i].append(rel_path)
+            loads[i] += size(rel_path) or 1
+        return shards
+
+    def build_commands(self, targets: List[str], fail_fast: bool, verbose: bool) -> List[List[str]]:
+        """Команды pytest для прогона"""
+        base = ["python", "-m", "pytest", "-v" if verbose else "-q", "--tb=short"]
+        if fail_fast:
+            base.append("-x")
+
+        if self.jobs > 1 and XDIST_AVAILABLE:
+            return [base + ["-n", str(self.jobs)] + targets]
+        if self.jobs > 1:
+            return [base + shard for shard in self._shards(targets)]
+        return [base + targets]
+
+    def run(self, targets: List[str], fail_fast: bool = False, verbose: bool = True,
+            cancel: Optional[threading.Event] = None, allow_empty: bool = False) -> Tuple[bool, str]:
+        """
+        Запустить тесты
+
+        Код pytest 5 ("тесты не найдены") в отдельном шарде - не ошибка:
+        шарду мог достаться файл без тестовых функций.
+
+        Args:
+            cancel: Событие отмены - прогон прерывается, как только оно установлено
+            allow_empty: Считать успехом прогон, в котором ни один шард не нашёл тестов
+
+        Returns:
+            (успех, вывод - первое падение и хвост лога)
+        """
+        commands = self.build_commands(targets, fail_fast, verbose)
+        collector = FailureCollector()
+        lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        processes = []
+
+        for cmd in commands:
+            process = subprocess.Popen(
+                cmd,
+                cwd=self.project_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors='replace'
+            )
+            processes.append(process)
+            tracker = watch_process(process)
+            # Отдельный поток на процесс: читаем вывод по мере появления
+            threading.Thread(target=self._pump, args=(process, lines, tracker), daemon=True).start()
+
+        deadline = time.monotonic() + self.timeout
+        running = len(processes)
+        failed = False
+        try:
+            while running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    collector.feed("Тесты превысили таймаут")
+                    return False, collector.output()
+                if cancel is not None and cancel.is_set():
+                    collector.feed("Прогон отменён")
+                    return False, collector.output()
+                try:
+                    line = lines.get(timeout=min(remaining, 0.5))
+                except queue.Empty:
+                    continue
+                if line is not None:
+                    collector.feed(line)
+                    continue
+
+                # Один из процессов закончил вывод
+                running -= 1
+                if fail_fast and any(p.poll() not in (None, *self.OK_CODES) for p in processes):
+                    failed = True
+                    break
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+
+        codes = [p.returncode for p in processes]
+        success = not failed and all(code in self.OK_CODES for code in codes)
+        if success and not allow_empty and all(code == self.NO_TESTS_COLLECTED for code in codes):
+            collector.feed("Тесты не найдены")
+            success = False
+        return success, collector.output()
+
+    @staticmethod
+    def _pump(process: subprocess.Popen, lines: "queue.Queue[Optional[str]]", tracker=None) -> None:
+        for line in process.stdout:
+            lines.put(line)
+        process.stdout.close()
+        wait_process(process, tracker)
+        lines.put(None)
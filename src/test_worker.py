@@ -0,0 +1,322 @@
+"""
+Прогретый процесс pytest
+Долгоживущий воркер держит импортированные pytest и зависимости проекта,
+принимает запросы "запусти эти тесты" через локальный сокет.
+На POSIX каждый прогон выполняется в fork() от прогретого процесса (zygote),
+на Windows - в потоке самого воркера с выгрузкой изменённых модулей проекта.
+Запросы принимаются только с токеном, который воркер выдаёт запустившему
+его процессу (первая строка stdout).
+
+Запуск: python src/test_worker.py --project <путь> [--port N]
+"""
+
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+import logging
+
+logger = logging.getLogger('WA.TestWorker')
+
+FORK_AVAILABLE = hasattr(os, 'fork')
+
+
+class _WarmState:
+    """Состояние прогретого процесса"""
+
+    def __init__(self, project_path: str, warm_modules: List[str]):
+        self.project_path = os.path.abspath(project_path)
+        self.warm_modules = list(warm_modules)
+        # Прогон завис и продолжается в потоке - процесс воркера больше не пригоден
+        self.hung = False
+        self.warmed_at = time.time()
+        import pytest  # noqa: F401 - прогрев
+        self._warm()
+
+    def _warm(self) -> None:
+        for name in self.warm_modules:
+            try:
+                __import__(name)
+            except Exception as e:
+                logger.debug(f"Не удалось прогреть {name}: {e}")
+
+    def _project_modules(self) -> List[str]:
+        names = []
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, '__file__', None)
+            if path and os.path.abspath(path).startswith(self.project_path + os.sep):
+                names.append(name)
+        return names
+
+    def purge_stale(self) -> bool:
+        """
+        Выгрузить модули проекта, если какой-то из них изменился после прогрева
+
+        Returns:
+            True - модули выгружены (warmed_at сдвинут на момент проверки)
+        """
+        checked_at = time.time()
+        names = self._project_modules()
+        for name in names:
+            path = sys.modules[name].__file__
+            try:
+                if os.path.getmtime(path) > self.warmed_at:
+                    break
+            except OSError:
+                break
+        else:
+            return False
+        # Зависимые модули держат ссылки на старые объекты - выгружаем весь проект
+        for name in names:
+            sys.modules.pop(name, None)
+        self.warmed_at = checked_at
+        return True
+
+    def run(self, args: List[str], timeout: float) -> Tuple[int, str]:
+        if FORK_AVAILABLE:
+            # Прогреваем заново сам zygote: иначе после первой правки каждый
+            # дочерний процесс выгружал бы и импортировал проект с нуля
+            if self.purge_stale():
+                self._warm()
+            return self._run_forked(args, timeout)
+        return self._run_inline(args, timeout)
+
+    def _run_pytest(self, args: List[str], output_fd: int) -> int:
+        os.chdir(self.project_path)
+        if self.project_path not in sys.path:
+            sys.path.insert(0, self.project_path)
+        self.purge_stale()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved = os.dup(1), os.dup(2)
+        os.dup2(output_fd, 1)
+        os.dup2(output_fd, 2)
+        try:
+            import pytest
+            return int(pytest.main(list(args)))
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+
+    def _run_forked(self, args: List[str], timeout: float) -> Tuple[int, str]:
+        with tempfile.TemporaryFile() as out:
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover - дочерний процесс
+                code = 1
+                try:
+                    code = self._run_pytest(args, out.fileno())
+                finally:
+                    os._exit(code)
+
+            deadline = time.monotonic() + timeout
+            while True:
+                done, status = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    break
+                if time.monotonic() > deadline:
+                    os.kill(pid, 9)
+                    os.waitpid(pid, 0)
+                    return -1, "Тесты превысили таймаут"
+                time.sleep(0.01)
+
+            out.seek(0)
+            output = out.read().decode('utf-8', errors='replace')
+            return os.waitstatus_to_exitcode(status), output
+
+    def _run_inline(self, args: List[str], timeout: float) -> Tuple[int, str]:
+        """Прогон в потоке воркера (без fork) с тем же таймаутом"""
+        out = tempfile.TemporaryFile()
+        result: List[int] = []
+
+        def target() -> None:
+            try:
+                result.append(self._run_pytest(args, out.fileno()))
+            except BaseException:
+                result.append(1)
+
+        thread = threading.Thread(target=target, name="wa-test-inline", daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            # Поток не остановить: воркер ответит и завершится, клиент перейдёт на subprocess
+            self.hung = True
+            return -1, "Тесты превысили таймаут"
+        with out:
+            out.seek(0)
+            # Следующий прогон должен увидеть изменения, сделанные после этого
+            self.warmed_at = time.time()
+            return result[0], out.read().decode('utf-8', errors='replace')
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Обработчик JSON-запросов (одна строка - один запрос)"""
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except ValueError:
+            self._reply({"error": "bad request"})
+            return
+        if not hmac.compare_digest(str(request.get("token", "")), self.server.token):
+            self._reply({"error": "unauthorized"})
+            return
+
+        cmd = request.get("cmd", "run")
+        if cmd == "ping":
+            self._reply({"ok": True, "pid": os.getpid()})
+        elif cmd == "shutdown":
+            self._reply({"ok": True})
+            self.server.shutdown_requested = True
+        else:
+            code, output = self.server.state.run(request.get("args", []),
+                                                 float(request.get("timeout", 120)))
+            self._reply({"returncode": code, "output": output})
+            if self.server.state.hung:
+                self.server.shutdown_requested = True
+
+    def _reply(self, data: dict) -> None:
+        self.wfile.write((json.dumps(data, ensure_ascii=False) + "\n").encode('utf-8'))
+
+
+class TestWorkerServer(socketserver.TCPServer):
+    """Сервер прогретого воркера (запросы обрабатываются по одному)"""
+
+    # Имя начинается с Test - pytest не должен принимать класс за набор тестов
+    __test__ = False
+    allow_reuse_address = True
+
+    def __init__(self, project_path: str, port: int = 0, warm_modules: Optional[List[str]] = None,
+                 token: Optional[str] = None):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.state = _WarmState(project_path, warm_modules or [])
+        # Порт доступен любому локальному пользователю - без токена запросы не выполняются
+        self.token = token or secrets.token_hex(16)
+        self.shutdown_requested = False
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def serve(self) -> None:
+        while not self.shutdown_requested:
+            self.handle_request()
+        self.server_close()
+
+
+class TestWorkerClient:
+    """Клиент прогретого воркера"""
+
+    __test__ = False
+
+    def __init__(self, port: int, token: str, host: str = "127.0.0.1",
+                 process: Optional[subprocess.Popen] = None):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.process = process
+
+    def _request(self, data: dict, timeout: float) -> dict:
+        with socket.create_connection((self.host, self.port), timeout=timeout) as sock:
+            sock.sendall((json.dumps(dict(data, token=self.token)) + "\n").encode('utf-8'))
+            with sock.makefile('rb') as f:
+                line = f.readline()
+        if not line:
+            raise ConnectionError("Воркер закрыл соединение")
+        reply = json.loads(line)
+        if reply.get("error") == "unauthorized":
+            raise PermissionError("Воркер отклонил токен")
+        return reply
+
+    def available(self) -> bool:
+        """Проверить, что воркер жив"""
+        if self.process is not None and self.process.poll() is not None:
+            return False
+        try:
+            return bool(self._request({"cmd": "ping"}, timeout=2).get("ok"))
+        except (OSError, ValueError):
+            return False
+
+    def run(self, args: List[str], timeout: float = 120) -> Tuple[int, str]:
+        """
+        Запустить pytest с аргументами (node id, флаги)
+
+        Raises:
+            OSError: Воркер недоступен
+        """
+        # Запас на ответ сверх таймаута самих тестов
+        reply = self._request({"cmd": "run", "args": args, "timeout": timeout}, timeout=timeout + 10)
+        return reply["returncode"], reply["output"]
+
+    def shutdown(self) -> None:
+        """Остановить воркер"""
+        try:
+            self._request({"cmd": "shutdown"}, timeout=2)
+        except (OSError, ValueError):
+            pass
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    @classmethod
+    def spawn(cls, project_path: str, warm_modules: Optional[List[str]] = None) -> Optional['TestWorkerClient']:
+        """Запустить воркер в отдельном процессе; None - если не удалось"""
+        project_path = os.path.abspath(project_path)
+        # Запускаем как скрипт: пакет src автоматизации не должен затенять модули проекта
+        cmd = [sys.executable, os.path.abspath(__file__), "--project", project_path]
+        for name in warm_modules or []:
+            cmd += ["--warm", name]
+        try:
+            process = subprocess.Popen(cmd, cwd=project_path, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, text=True)
+        except OSError as e:
+            logger.warning(f"Не удалось запустить воркер тестов: {e}")
+            return None
+
+        # Первая строка stdout - порт и токен (пустая строка - процесс завершился)
+        line = process.stdout.readline()
+        process.stdout.close()
+        parts = line.split()
+        if len(parts) == 3 and parts[0] == "PORT":
+            return cls(int(parts[1]), parts[2], process=process)
+        process.kill()
+        logger.warning("Воркер тестов не запустился")
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Прогретый воркер pytest")
+    parser.add_argument("--project", required=True, help="Корень проекта")
+    parser.add_argument("--port", type=int, default=0, help="Порт (0 - любой свободный)")
+    parser.add_argument("--warm", action="append", default=[], help="Модуль для прогрева")
+    args = parser.parse_args()
+
+    # Импорты тестов должны разрешаться от корня проекта, а не от папки воркера
+    sys.path[0] = os.path.abspath(args.project)
+    server = TestWorkerServer(args.project, args.port, args.warm)
+    print(f"PORT {server.port} {server.token}", flush=True)
+    server.serve()
+    if server.state.hung:
+        # Зависший поток pytest не даст интерпретатору завершиться штатно
+        os._exit(1)
+
+
+if __name__ == "__main__":
+    main()
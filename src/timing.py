@@ -0,0 +1,75 @@
+"""
+Замер времени по фазам
+Монотонные замеры (perf_counter) и агрегация в перцентили
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+
+class PhaseTimer:
+    """Накопитель времени по фазам одной операции"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Замерить фазу (повторные замеры одной фазы суммируются)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self) -> float:
+        """Время с момента создания таймера"""
+        return time.perf_counter() - self.started
+
+    def as_dict(self, ndigits: int = 4) -> Dict[str, float]:
+        """Фазы и общее время, округлённые для истории"""
+        data = {name: round(value, ndigits) for name, value in self.phases.items()}
+        data["total"] = round(self.total(), ndigits)
+        return data
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Перцентиль q (0-100) по отсортированным значениям, линейная интерполяция"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize_phases(records: Iterable[Dict[str, float]],
+                     quantiles: Sequence[int] = (50, 90, 99)) -> Dict[str, Dict[str, float]]:
+    """
+    Свести фазы многих операций в статистику
+
+    Returns:
+        {фаза: {"count", "mean", "p50", "p90", "p99", "max"}}
+    """
+    values: Dict[str, List[float]] = {}
+    for record in records:
+        for name, value in (record or {}).items():
+            values.setdefault(name, []).append(float(value))
+
+    summary = {}
+    for name, samples in values.items():
+        samples.sort()
+        stats = {
+            "count": len(samples),
+            "mean": round(sum(samples) / len(samples), 4),
+            "max": round(samples[-1], 4),
+        }
+        for q in quantiles:
+            stats[f"p{q}"] = round(percentile(samples, q), 4)
+        summary[name] = stats
+    return summary
@@ -0,0 +1,333 @@
+"""
+Трассировка, совместимая с OpenTelemetry
+Спаны с атрибутами, контекст через contextvars (потоки и asyncio),
+экспорт в OTLP/HTTP (JSON) или в локальный файл JSON Lines.
+Выключенная трассировка ничего не стоит: span() возвращает общий пустой контекст.
+
+Включение: configure_tracing(FileSpanExporter("logs/traces.jsonl"))
+или переменная окружения WA_TRACE_FILE / WA_OTLP_ENDPOINT.
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger('WA.Tracing')
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('wa_span', default=None)
+
+
+class Span:
+    """Спан: именованный отрезок работы с атрибутами"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'error', '_tracer', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.status = "OK"
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.status = "ERROR"
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self._tracer._finish(self)
+
+    def to_otlp(self) -> Dict:
+        """Спан в формате OTLP/JSON"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2 if self.status == "ERROR" else 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"]["message"] = self.error
+        return span
+
+
+class _NoopSpan:
+    """Пустой спан выключенной трассировки"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class FileSpanExporter:
+    """Экспорт в локальный файл: один OTLP/JSON-документ resourceSpans на строку"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, payload: Dict) -> None:
+        line = json.dumps(payload, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+
+class OTLPHttpExporter:
+    """
+    Экспорт в коллектор OpenTelemetry по OTLP/HTTP (JSON)
+
+    Отправка идёт в фоновом потоке: медленный или недоступный коллектор
+    не задерживает завершение спана. Очередь ограничена - при переполнении
+    пачка спанов отбрасывается (счётчик dropped).
+    """
+
+    def __init__(self, endpoint: str = "http://localhost:4318/v1/traces", timeout: float = 5,
+                 queue_size: int = 64):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, payload: Dict) -> None:
+        """Поставить пачку в очередь отправки"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="wa-otlp-export", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            self.dropped += 1
+            logger.debug(f"Очередь экспорта трассировки переполнена, отброшено пачек: {self.dropped}")
+
+    def _run(self) -> None:
+        while True:
+            payload = self._queue.get()
+            if payload is None:
+                return
+            try:
+                self._post(payload)
+            except Exception as e:
+                logger.warning(f"Ошибка экспорта трассировки: {e}")
+
+    def _post(self, payload: Dict) -> None:
+        try:
+            import httpx
+            httpx.post(self.endpoint, json=payload, timeout=self.timeout)
+        except ImportError:
+            import urllib.request
+            request = urllib.request.Request(
+                self.endpoint, data=json.dumps(payload).encode('utf-8'),
+                headers={"Content-Type": "application/json"}
+            )
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Дождаться отправки очереди (не дольше timeout) и остановить поток"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            # Поток занят отправкой полной очереди - ждём сколько разрешено
+            pass
+        thread.join(self.timeout if timeout is None else timeout)
+
+
+class Tracer:
+    """Трассировщик с буферизацией завершённых спанов"""
+
+    def __init__(self, exporter=None, service_name: str = "windsurf-automation", batch_size: int = 64):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes: Any):
+        """Открыть спан (дочерний к текущему в этом потоке/задаче)"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def current_span(self):
+        """Текущий спан или пустой спан"""
+        return _current_span.get() or NOOP_SPAN
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            # Выгружаем пачкой или когда завершился корневой спан (трасса целиком)
+            if len(self._buffer) < self.batch_size and span.parent_id is not None:
+                return
+            batch, self._buffer = self._buffer, []
+        self._export(batch)
+
+    def flush(self) -> None:
+        """Выгрузить накопленные спаны"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._export(batch)
+
+    def _export(self, batch: List[Span]) -> None:
+        if self.exporter is None:
+            return
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "wa.tracing"},
+                "spans": [span.to_otlp() for span in batch],
+            }],
+        }]}
+        try:
+            self.exporter.export(payload)
+        except Exception as e:
+            logger.warning(f"Ошибка экспорта трассировки: {e}")
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Глобальный трассировщик"""
+    return _tracer
+
+
+def configure_tracing(exporter=None, service_name: str = "windsurf-automation",
+                      batch_size: int = 64) -> Tracer:
+    """
+    Включить (exporter задан) или выключить (exporter=None) трассировку
+
+    Returns:
+        Глобальный трассировщик
+    """
+    _shutdown_tracing()
+    _tracer.exporter = exporter
+    _tracer.enabled = exporter is not None
+    _tracer.service_name = service_name
+    _tracer.batch_size = batch_size
+    return _tracer
+
+
+def span(name: str, **attributes: Any):
+    """Открыть спан глобального трассировщика"""
+    if not _tracer.enabled:
+        return NOOP_SPAN
+    return Span(_tracer, name, _current_span.get(), attributes)
+
+
+def current_span():
+    """Текущий спан глобального трассировщика или пустой спан"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name: str) -> Callable:
+    """Декоратор: выполнять функцию внутри спана name"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return fn(*args, **kwargs)
+            with Span(_tracer, name, _current_span.get(), {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def wrap(fn: Callable) -> Callable:
+    """
+    Привязать функцию к текущему контексту (для передачи в потоки)
+
+    Копируется весь contextvars-контекст: текущий спан и трекер ресурсов задачи.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Один контекст нельзя запускать в двух потоках сразу - берём копию
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def _configure_from_env() -> None:
+    trace_file = os.environ.get("WA_TRACE_FILE")
+    endpoint = os.environ.get("WA_OTLP_ENDPOINT")
+    if trace_file:
+        configure_tracing(FileSpanExporter(trace_file))
+    elif endpoint:
+        configure_tracing(OTLPHttpExporter(endpoint))
+
+
+def _shutdown_tracing() -> None:
+    """Выгрузить спаны и дождаться фоновой отправки текущего экспортёра"""
+    _tracer.flush()
+    shutdown = getattr(_tracer.exporter, "shutdown", None)
+    if shutdown is not None:
+        shutdown()
+
+
+_configure_from_env()
+atexit.register(_shutdown_tracing)
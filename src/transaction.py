@@ -0,0 +1,207 @@
+"""
+Транзакционное применение изменений к файлам
+Оригиналы хранятся в памяти (или в одном журнале для больших пакетов),
+изменения применяются атомарно через rename и откатываются без повторного чтения
+"""
+
+import json
+import os
+import secrets
+import tempfile
+from typing import Dict, List, Optional
+
+from .exceptions import FileOperationError
+
+
+class FileTransaction:
+    """Транзакция над набором файлов"""
+
+    def __init__(self, journal_dir: Optional[str] = None, memory_limit: int = 8 * 1024 * 1024,
+                 encoding: str = 'utf-8'):
+        """
+        Инициализация транзакции
+
+        Args:
+            journal_dir: Папка для журнала оригиналов (по умолчанию - временная)
+            memory_limit: Сколько байт оригиналов держать в памяти до сброса в журнал
+            encoding: Кодировка файлов
+        """
+        self.journal_dir = journal_dir
+        self.memory_limit = memory_limit
+        self.encoding = encoding
+        self.committed = False
+
+        self._staged: Dict[str, str] = {}
+        # Оригиналы: None - файла не было до транзакции
+        self._originals: Dict[str, Optional[str]] = {}
+        self._memory_bytes = 0
+        self._journal_path: Optional[str] = None
+        self._journaled: List[str] = []
+
+    @property
+    def paths(self) -> List[str]:
+        """Файлы, затронутые транзакцией"""
+        return list(self._staged)
+
+    @property
+    def pending(self) -> bool:
+        """Изменения применены, но ещё не подтверждены release() - их можно откатить"""
+        return self.committed and bool(self._staged)
+
+    def stage(self, path: str, content: str, create: bool = False) -> None:
+        """
+        Добавить изменение файла в транзакцию
+
+        Args:
+            path: Путь к файлу
+            content: Новое содержимое
+            create: Разрешить создание файла, которого нет
+
+        Raises:
+            FileOperationError: Файла нет (и create=False) или его не удалось прочитать
+        """
+        if self.committed:
+            raise FileOperationError("Транзакция уже применена")
+
+        path = os.path.abspath(path)
+        if path not in self._originals and path not in self._journaled:
+            try:
+                with open(path, 'r', encoding=self.encoding) as f:
+                    original = f.read()
+            except FileNotFoundError:
+                if not create:
+                    raise FileOperationError(f"Файл не найден: {path}")
+                original = None
+            except OSError as e:
+                raise FileOperationError(f"Не удалось прочитать {path}: {e}")
+
+            self._originals[path] = original
+            self._memory_bytes += len(original or "")
+            if self._memory_bytes > self.memory_limit:
+                self._spill_to_journal()
+
+        self._staged[path] = content
+
+    def _spill_to_journal(self) -> None:
+        """Сбросить оригиналы из памяти в журнал (один файл на транзакцию)"""
+        if self._journal_path is None:
+            fd, self._journal_path = tempfile.mkstemp(prefix="wa-journal-", suffix=".jsonl",
+                                                      dir=self.journal_dir)
+            os.close(fd)
+
+        with open(self._journal_path, 'a', encoding='utf-8') as f:
+            for path, original in self._originals.items():
+                f.write(json.dumps({"path": path, "content": original}, ensure_ascii=False) + "\n")
+                self._journaled.append(path)
+
+        self._originals.clear()
+        self._memory_bytes = 0
+
+    def _load_originals(self) -> Dict[str, Optional[str]]:
+        """Все оригиналы: из памяти и из журнала (журнал читается один раз)"""
+        originals = dict(self._originals)
+        if self._journal_path and os.path.exists(self._journal_path):
+            with open(self._journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    originals[entry["path"]] = entry["content"]
+        return originals
+
+    def _write_temp(self, path: str, content: str) -> str:
+        """Записать содержимое во временный файл рядом с целевым"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        try:
+            mode: Optional[int] = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = None
+        # Новый файл создаётся с 0666 - права по umask процесса выставит ОС
+        fd, tmp_path = self._create_temp(directory, os.path.basename(path), 0o666 if mode is None else 0o600)
+        try:
+            with os.fdopen(fd, 'w', encoding=self.encoding) as f:
+                f.write(content)
+            if mode is not None:
+                # Сохраняем права оригинала
+                os.chmod(tmp_path, mode)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    @staticmethod
+    def _create_temp(directory: str, name: str, mode: int):
+        """Создать уникальный временный файл (как mkstemp, но с заданными правами)"""
+        while True:
+            tmp_path = os.path.join(directory, f".{name}.{secrets.token_hex(4)}.wa-tmp")
+            try:
+                return os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode), tmp_path
+            except FileExistsError:
+                continue
+
+    def commit(self) -> None:
+        """Атомарно применить все изменения"""
+        if self.committed:
+            return
+
+        # Сначала пишем все временные файлы - на этом этапе целевые файлы не тронуты
+        temps: Dict[str, str] = {}
+        try:
+            for path, content in self._staged.items():
+                temps[path] = self._write_temp(path, content)
+        except OSError as e:
+            for tmp_path in temps.values():
+                os.remove(tmp_path)
+            raise FileOperationError(f"Ошибка записи изменений: {e}")
+
+        # Затем подменяем файлы через rename
+        replaced = []
+        try:
+            for path, tmp_path in temps.items():
+                os.replace(tmp_path, path)
+                replaced.append(path)
+        except OSError as e:
+            for path in temps:
+                if path not in replaced and os.path.exists(temps[path]):
+                    os.remove(temps[path])
+            self._restore(replaced)
+            raise FileOperationError(f"Ошибка применения изменений: {e}")
+
+        self.committed = True
+
+    def _restore(self, paths: List[str]) -> None:
+        """Вернуть оригиналы указанных файлов"""
+        originals = self._load_originals()
+        for path in paths:
+            original = originals.get(path)
+            if original is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            os.replace(self._write_temp(path, original), path)
+
+    def rollback(self) -> None:
+        """Откатить применённые изменения"""
+        if self.committed:
+            self._restore(list(self._staged))
+            self.committed = False
+        self._staged.clear()
+        self.release()
+
+    def release(self) -> None:
+        """Подтвердить изменения: освободить оригиналы и удалить журнал (откат больше невозможен)"""
+        self._staged.clear()
+        self._originals.clear()
+        self._journaled.clear()
+        self._memory_bytes = 0
+        if self._journal_path and os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
+        self._journal_path = None
+
+    def __enter__(self) -> 'FileTransaction':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.rollback()
+        else:
+            self.release()
@@ -3,12 +3,14 @@
 Контроллер для автоматизации действий в Windsurf IDE
 """
 
+import importlib.util
 import time
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
 from .logger import get_logger
 from .exceptions import AutomationError, WindowNotFoundError
+from .tracing import current_span, traced
 
 
 @dataclass
@@ -30,7 +32,7 @@ class WindsurfController:
             config: Объект конфигурации
         """
         self.config = config
-        self.logger = get_logger()
+        self.logger = get_logger(config)
         self.running = False
         self.current_window: Optional[WindowInfo] = None
         
@@ -38,21 +40,13 @@ class WindsurfController:
         self._check_dependencies()
     
     def _check_dependencies(self) -> None:
-        """Проверка доступности необходимых библиотек"""
-        try:
-            import pyautogui
-            import pyperclip
-            self.autopy_available = True
-        except ImportError:
-            self.autopy_available = False
+        """Проверка доступности необходимых библиотек (без импорта - он при первом использовании)"""
+        self.autopy_available = all(importlib.util.find_spec(m) is not None for m in ("pyautogui", "pyperclip"))
+        if not self.autopy_available:
             self.logger.warning("pyautogui/pyperclip не установлены. pip install pyautogui pyperclip")
         
-        try:
-            import win32gui
-            import win32con
-            self.win32_available = True
-        except ImportError:
-            self.win32_available = False
+        self.win32_available = all(importlib.util.find_spec(m) is not None for m in ("win32gui", "win32con"))
+        if not self.win32_available:
             self.logger.warning("pywin32 не установлен. pip install pywin32")
     
     def find_windsurf_windows(self) -> List[WindowInfo]:
@@ -214,6 +208,7 @@ class WindsurfController:
             self.logger.error(f"Ошибка выбора модели: {e}")
             raise AutomationError(f"Не удалось выбрать модель: {e}")
     
+    @traced("controller.send_message")
     def send_message(self, message: str) -> None:
         """
         Отправить сообщение в чат
@@ -221,6 +216,7 @@ class WindsurfController:
         Args:
             message: Сообщение для отправки
         """
+        current_span().set_attribute("message.chars", len(message))
         self.logger.info(f"Отправка сообщения ({len(message)} символов)...")
         
         try:
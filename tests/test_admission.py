@@ -0,0 +1,124 @@
+"""
+Тесты AdmissionController: пороги с гистерезисом, слоты, вложенные виды
+"""
+
+import os
+import sys
+import threading
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.admission import AdmissionController, Watermarks
+
+Stats = namedtuple("Stats", "cpu_percent ram_percent disk_percent")
+
+IDLE = Stats(10.0, 30.0, 50.0)
+BUSY = Stats(95.0, 30.0, 50.0)
+# Между порогами: cpu ниже 90, но не ниже 70
+MIDDLE = Stats(80.0, 30.0, 50.0)
+
+
+class FakeMonitor:
+    def __init__(self, stats=IDLE):
+        self.stats = stats
+
+    def get_stats(self):
+        return self.stats
+
+
+def controller(**kwargs):
+    kwargs.setdefault("limits", {"task": 4, "tests": 2})
+    kwargs.setdefault("check_interval", 0.01)
+    return AdmissionController(FakeMonitor(), **kwargs)
+
+
+def test_throttle_halves_limits_down_to_pause():
+    admission = controller()
+    assert admission.limit("task") == 4
+
+    admission.update(BUSY)
+    assert admission.throttled and admission.limit("task") == 2
+    admission.update(BUSY)
+    assert admission.limit("task") == 1
+    admission.update(BUSY)
+    assert admission.scale == 0.0 and admission.limit("task") == 0
+    # Один эпизод перегрузки - одно ограничение
+    assert admission.throttle_count == 1
+
+
+def test_hysteresis_between_watermarks():
+    admission = controller(recovery_step=0.5)
+    admission.update(BUSY)
+    assert admission.limit("task") == 2
+
+    # Ниже верхнего, но выше нижнего порога - лимиты не меняются
+    admission.update(MIDDLE)
+    assert admission.limit("task") == 2 and admission.throttled
+
+    admission.update(IDLE)
+    assert admission.limit("task") == 4 and not admission.throttled
+    assert [e["action"] for e in admission.events] == ["throttle", "recover"]
+
+
+def test_any_metric_over_high_throttles():
+    admission = controller(watermarks=Watermarks(disk_high=45.0, disk_low=40.0))
+    admission.update(IDLE)
+    assert admission.limit("task") == 2
+    assert "disk" in admission.events[-1]["reason"]
+
+
+def test_nested_kind_keeps_one_slot_while_paused():
+    admission = controller()
+    for _ in range(3):
+        admission.update(BUSY)
+
+    assert admission.limit("task") == 0
+    assert admission.limit("tests") == 1
+    assert admission.acquire("tests", timeout=0.1)
+    admission.release("tests")
+
+
+def test_acquire_waits_for_free_slot():
+    admission = controller(limits={"task": 1, "tests": 1})
+    assert admission.acquire("task")
+    assert not admission.acquire("task", timeout=0.05)
+
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(admission.acquire("task", timeout=2)))
+    thread.start()
+    admission.release("task")
+    thread.join(3)
+    assert acquired == [True]
+    assert admission.stats()["in_use"]["task"] == 1
+
+
+def test_acquire_resumes_after_recovery():
+    admission = controller()
+    for _ in range(3):
+        admission.update(BUSY)
+    admission.monitor.stats = BUSY
+
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(admission.acquire("task", timeout=3)))
+    thread.start()
+    thread.join(0.1)
+    assert acquired == []
+
+    # Ожидающий сам перечитывает показания монитора
+    admission.monitor.stats = IDLE
+    thread.join(3)
+    assert acquired == [True]
+
+
+def test_cancel_interrupts_wait():
+    admission = controller()
+    for _ in range(3):
+        admission.update(BUSY)
+    admission.monitor.stats = BUSY
+    cancel = threading.Event()
+    cancel.set()
+
+    with admission.slot("task", cancel=cancel) as acquired:
+        assert acquired is False
+    assert admission.stats()["in_use"]["task"] == 0
@@ -0,0 +1,124 @@
+"""
+Тесты RotatingLogFileHandler: ротация по размеру и по дню, сжатие, хранение архивов
+"""
+
+import gzip
+import logging
+import os
+import sys
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logger import RotatingLogFileHandler
+
+
+def make_handler(log_dir, **kwargs):
+    handler = RotatingLogFileHandler(log_dir, "wa", **kwargs)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def emit(handler, message):
+    record = logging.LogRecord("WA.Test", logging.INFO, __file__, 1, message, None, None)
+    handler.handle(record)
+
+
+def settle(handler):
+    """Дождаться фоновых сжатия и очистки"""
+    handler._archiver.submit(lambda: None).result()
+
+
+def names(log_dir):
+    return sorted(p.name for p in log_dir.iterdir())
+
+
+def today():
+    return datetime.now().strftime('%Y%m%d')
+
+
+def test_size_rotation_compresses_parts(tmp_path):
+    handler = make_handler(tmp_path, max_bytes=300, backup_count=10)
+    for i in range(20):
+        emit(handler, f"строка {i:02d} " + "x" * 40)
+    settle(handler)
+    handler.close()
+
+    archives = [n for n in names(tmp_path) if n.endswith(".gz")]
+    assert archives and all(n.startswith(f"wa_{today()}.") for n in archives)
+    assert f"wa_{today()}.log" in names(tmp_path)
+    # Ни одна строка не потеряна при ротации
+    text = "".join(gzip.open(tmp_path / n, 'rt', encoding='utf-8').read() for n in archives)
+    text += (tmp_path / f"wa_{today()}.log").read_text(encoding='utf-8')
+    assert sorted(line[:9] for line in text.splitlines()) == [f"строка {i:02d}" for i in range(20)]
+
+
+def test_retention_keeps_newest_archives(tmp_path):
+    handler = make_handler(tmp_path, max_bytes=200, backup_count=2)
+    for i in range(30):
+        emit(handler, f"строка {i:02d} " + "x" * 40)
+    settle(handler)
+    handler.close()
+
+    archives = [n for n in names(tmp_path) if n.endswith(".gz")]
+    assert len(archives) == 2
+    # Остались части с наибольшими номерами: номера удалённых не переиспользуются
+    parts = sorted(int(n.split(".")[1]) for n in archives)
+    assert parts[0] > 2 and parts[1] == parts[0] + 1
+
+
+def test_retention_orders_by_day_then_part(tmp_path):
+    for name in ("wa_20200101.1.log.gz", "wa_20200101.log.gz", "wa_20200102.log.gz"):
+        (tmp_path / name).write_bytes(b"")
+    handler = make_handler(tmp_path, backup_count=2)
+    handler._archive(tmp_path / "missing.log")
+    settle(handler)
+    handler.close()
+
+    assert names(tmp_path) == ["wa_20200101.log.gz", "wa_20200102.log.gz", f"wa_{today()}.log"]
+
+
+def test_stale_day_file_archived_on_start(tmp_path):
+    (tmp_path / "wa_20200101.log").write_text("старый день\n", encoding='utf-8')
+    handler = make_handler(tmp_path)
+    settle(handler)
+    handler.close()
+
+    assert names(tmp_path) == ["wa_20200101.log.gz", f"wa_{today()}.log"]
+    with gzip.open(tmp_path / "wa_20200101.log.gz", 'rt', encoding='utf-8') as f:
+        assert f.read() == "старый день\n"
+
+
+def test_day_rollover_switches_file(tmp_path):
+    handler = make_handler(tmp_path, compress=False)
+    # Делаем вид, что обработчик открыт вчерашним (давним) днём
+    handler.stream.close()
+    handler._day = date(2020, 1, 1)
+    handler.baseFilename = str(handler._path_for(handler._day))
+    handler.stream = handler._open()
+    emit(handler, "вчера")
+    handler._next_day_ts = 0
+
+    emit(handler, "сегодня")
+    settle(handler)
+    handler.close()
+
+    assert (tmp_path / "wa_20200101.log").read_text(encoding='utf-8') == "вчера\n"
+    assert (tmp_path / f"wa_{today()}.log").read_text(encoding='utf-8') == "сегодня\n"
+
+
+def test_archive_errors_go_to_stderr(tmp_path, capsys, monkeypatch):
+    handler = make_handler(tmp_path)
+    (tmp_path / "wa_20200101.log").write_text("x\n", encoding='utf-8')
+
+    def broken_open(*args, **kwargs):
+        raise OSError("нет места")
+
+    monkeypatch.setattr(gzip, "open", broken_open)
+    handler._archive(tmp_path / "wa_20200101.log")
+    settle(handler)
+    handler.close()
+
+    captured = capsys.readouterr()
+    assert "нет места" in captured.err
+    assert captured.out == ""
@@ -0,0 +1,99 @@
+"""
+Тесты MetricHistory: кольцевые буферы, агрегаты по корзинам, выбор уровня
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.metric_history import MetricHistory
+
+T0 = 1_700_000_000.0  # кратно 10 и 60 - корзины начинаются ровно с T0
+
+
+def history(tiers=((1, 10), (10, 6), (60, 4))):
+    return MetricHistory(metrics=("cpu_percent", "ram_percent"), tiers=tiers)
+
+
+def feed(hist, seconds, value=lambda i: float(i)):
+    for i in range(seconds):
+        hist.record({"cpu_percent": value(i), "ram_percent": 50.0}, ts=T0 + i)
+
+
+def test_raw_ring_keeps_last_samples():
+    hist = history()
+    feed(hist, 25)
+
+    rows = hist.range("cpu_percent", T0, T0 + 100, step=1)
+    assert [r[1] for r in rows] == [float(i) for i in range(15, 25)]
+    assert rows[0][0] == T0 + 15
+
+
+def test_rollup_min_avg_max_per_bucket():
+    hist = history()
+    feed(hist, 25)
+
+    rows = hist.range("cpu_percent", T0, T0 + 100, step=10)
+    # Третья корзина (20-24) ещё не закрыта
+    assert rows == [(T0, 0.0, 4.5, 9.0), (T0 + 10, 10.0, 14.5, 19.0)]
+
+
+def test_rollup_ring_wraps():
+    hist = history()
+    feed(hist, 100)
+
+    rows = hist.range("cpu_percent", 0, T0 + 1000, step=10)
+    assert len(rows) == 6
+    assert [r[0] for r in rows] == [T0 + 10 * i for i in range(3, 9)]
+
+
+def test_window_picks_finest_tier_covering_start():
+    hist = history()
+    feed(hist, 100)
+    now = T0 + 99
+
+    assert len(hist.window("cpu_percent", 5, now=now)[0]) == 2
+    # Сырых значений за 60 с уже нет - берутся агрегаты по 10 с
+    assert len(hist.window("cpu_percent", 60, now=now)[0]) == 4
+
+
+def test_summary_over_raw_and_rollup():
+    hist = history()
+    feed(hist, 100)
+
+    raw = hist.summary("cpu_percent", T0 + 95, T0 + 99)
+    assert raw == {"min": 95.0, "avg": 97.0, "max": 99.0, "samples": 5, "step": 1}
+
+    rolled = hist.summary("cpu_percent", T0 + 40, T0 + 60)
+    assert rolled["step"] == 10
+    assert rolled["min"] == 30.0 and rolled["max"] == 69.0
+
+
+def test_memory_is_fixed():
+    hist = history()
+    before = hist.memory_bytes()
+    feed(hist, 1000)
+    assert hist.memory_bytes() == before
+    # (10 + 6 + 4) времён + 2 метрики * (10 + 6*3 + 4*3) значений, по 8 байт
+    assert before == (20 + 2 * 40) * 8
+
+
+def test_missing_metric_values_are_skipped():
+    hist = history()
+    hist.record({"ram_percent": 10.0}, ts=T0)
+    hist.record({"cpu_percent": 5.0, "ram_percent": 10.0}, ts=T0 + 1)
+
+    assert hist.range("cpu_percent", T0, T0 + 1, step=1) == [(T0 + 1, 5.0)]
+    assert hist.summary("cpu_percent", T0 + 100, T0 + 200) == {}
+
+
+def test_unknown_metric_and_step():
+    hist = history()
+    feed(hist, 3)
+    with pytest.raises(KeyError):
+        hist.range("gpu_utilization", T0, T0 + 1)
+    with pytest.raises(ValueError):
+        hist.range("cpu_percent", T0, T0 + 1, step=5)
@@ -0,0 +1,161 @@
+"""
+Тесты TaskScheduler: порядок по оценке, старение, ленивое удаление, история
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.scheduler import ScoreWeights, TaskScheduler
+
+
+@dataclass
+class FakeTask:
+    id: str
+    priority: int = 3
+    file_path: Optional[str] = None
+    task_type: Optional[str] = None
+    status: str = "pending"
+    created_at: str = ""
+
+    def __post_init__(self):
+        if not self.created_at:
+            self.created_at = datetime.now().isoformat()
+
+
+def hours_ago(hours: float) -> str:
+    return (datetime.now() - timedelta(hours=hours)).isoformat()
+
+
+def drain(scheduler):
+    order = []
+    while True:
+        task = scheduler.pop()
+        if task is None:
+            return order
+        order.append(task.id)
+
+
+def test_higher_priority_first(tmp_path):
+    scheduler = TaskScheduler(str(tmp_path))
+    for task in (FakeTask("low", priority=1), FakeTask("high", priority=5), FakeTask("mid", priority=3)):
+        scheduler.push(task)
+
+    assert scheduler.peek().id == "high"
+    assert drain(scheduler) == ["high", "mid", "low"]
+    assert len(scheduler) == 0
+
+
+def test_aging_overtakes_priority(tmp_path):
+    scheduler = TaskScheduler(str(tmp_path), ScoreWeights(age_per_hour=0.1))
+    scheduler.push(FakeTask("fresh", priority=4))
+    scheduler.push(FakeTask("old", priority=3, created_at=hours_ago(20)))
+
+    # 20 ч ожидания * 0.1 = 2 балла - больше разницы приоритетов
+    assert scheduler.peek().id == "old"
+
+
+def test_larger_file_costs_more(tmp_path):
+    (tmp_path / "small.py").write_text("x = 1\n", encoding='utf-8')
+    (tmp_path / "big.py").write_text("x = 1\n" * 200000, encoding='utf-8')
+    scheduler = TaskScheduler(str(tmp_path))
+    scheduler.push(FakeTask("big", file_path="big.py"))
+    scheduler.push(FakeTask("small", file_path="small.py"))
+
+    assert scheduler.peek().id == "small"
+    explained = scheduler.explain(FakeTask("big", file_path="big.py"))
+    assert explained["components"]["cost"] < 0
+
+
+def test_lazy_deletion_skips_closed_tasks(tmp_path):
+    scheduler = TaskScheduler(str(tmp_path))
+    done = FakeTask("done", priority=5)
+    scheduler.push(done)
+    scheduler.push(FakeTask("next", priority=1))
+
+    done.status = "completed"
+    assert scheduler.pop().id == "next"
+    assert scheduler.pop() is None
+    assert len(scheduler) == 0
+
+
+def test_repush_replaces_previous_entry(tmp_path):
+    scheduler = TaskScheduler(str(tmp_path))
+    task = FakeTask("a", priority=1)
+    scheduler.push(task)
+    scheduler.push(FakeTask("b", priority=3))
+
+    task.priority = 5
+    scheduler.push(task)
+    assert len(scheduler) == 2
+    assert drain(scheduler) == ["a", "b"]
+
+
+def test_success_rate_changes_order_between_types(tmp_path):
+    scheduler = TaskScheduler(str(tmp_path))
+    scheduler.push(FakeTask("doc", task_type="documentation"))
+    scheduler.push(FakeTask("todo", task_type="todo"))
+
+    for _ in range(5):
+        scheduler.record_outcome("todo", None, success=True, duration=1.0)
+        scheduler.record_outcome("documentation", None, success=False, duration=1.0)
+    assert scheduler.peek().id == "todo"
+
+    # 6/47 у todo против 1/7 у documentation (со сглаживанием)
+    for _ in range(40):
+        scheduler.record_outcome("todo", None, success=False, duration=1.0)
+    assert scheduler.peek().id == "doc"
+
+
+def test_outcome_rekeys_tasks_of_the_same_file(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n", encoding='utf-8')
+    (tmp_path / "b.py").write_text("x = 1\n", encoding='utf-8')
+    scheduler = TaskScheduler(str(tmp_path), ScoreWeights(cost_per_test_second=1.0))
+    scheduler.push(FakeTask("a", file_path="a.py", created_at=hours_ago(1)))
+    scheduler.push(FakeTask("b", file_path="b.py"))
+    assert scheduler.peek().id == "a"
+
+    # Тесты файла a.py стали долгими - его задача подорожала и уступила очередь
+    scheduler.record_outcome(None, "a.py", success=True, duration=30.0)
+    assert scheduler.peek().id == "b"
+    assert drain(scheduler) == ["b", "a"]
+
+
+def test_stale_entries_are_compacted(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n", encoding='utf-8')
+    scheduler = TaskScheduler(str(tmp_path))
+    for i in range(10):
+        scheduler.push(FakeTask(f"t{i}", file_path="a.py"))
+
+    for _ in range(50):
+        scheduler.record_outcome(None, "a.py", success=True, duration=1.0)
+    assert scheduler._heap_size <= 2 * len(scheduler) + 64
+    assert len(drain(scheduler)) == 10
+
+
+def test_rebuild_keeps_only_pending(tmp_path):
+    scheduler = TaskScheduler(str(tmp_path))
+    scheduler.rebuild([FakeTask("a"), FakeTask("b", status="completed"), FakeTask("c", status="failed")])
+
+    assert len(scheduler) == 1
+    assert drain(scheduler) == ["a"]
+
+
+def test_load_history_is_idempotent(tmp_path):
+    scheduler = TaskScheduler(str(tmp_path))
+    history = [
+        {"task_type": "todo", "file_path": "a.py", "success": True, "duration": 2.0},
+        {"task_type": "todo", "file_path": "a.py", "success": False, "duration": 4.0},
+        "мусор",
+    ]
+    scheduler.load_history(history)
+    rate = scheduler.success_rate("todo")
+    seconds = scheduler._file_seconds["a.py"]
+
+    scheduler.load_history(history)
+    assert scheduler.success_rate("todo") == rate == 0.5
+    assert scheduler._file_seconds["a.py"] == seconds == (3.0, 2)
@@ -0,0 +1,138 @@
+"""
+Тесты TestImpactSelector: граф импортов, conftest и pytest_plugins, полный прогон
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.test_impact import TestImpactSelector
+
+
+def make_project(root, files):
+    for rel_path, content in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    return str(root)
+
+
+PROJECT = {
+    "src/__init__.py": "",
+    "src/core.py": "VALUE = 1\n",
+    "src/utils.py": "from .core import VALUE\n",
+    "src/other.py": "OTHER = 2\n",
+    "src/unused.py": "UNUSED = 3\n",
+    "tests/test_core.py": "from src.core import VALUE\n",
+    "tests/test_utils.py": "from src import utils\n",
+    "tests/test_other.py": "import src.other\n",
+}
+
+
+def selector(root, **kwargs):
+    kwargs.setdefault("full_run_interval", 0)
+    return TestImpactSelector(str(root), **kwargs)
+
+
+def test_transitive_dependents(tmp_path):
+    make_project(tmp_path, PROJECT)
+    sel = selector(tmp_path)
+
+    assert sel.select(["src/core.py"]) == [os.path.join("tests", "test_core.py"),
+                                           os.path.join("tests", "test_utils.py")]
+    assert sel.select(["src/other.py"]) == [os.path.join("tests", "test_other.py")]
+
+
+def test_file_without_dependent_tests_requests_full_run(tmp_path):
+    make_project(tmp_path, PROJECT)
+    sel = selector(tmp_path)
+
+    assert sel.select(["src/unused.py"]) is None
+    assert sel.select(["src/other.py", "src/unused.py"]) is None
+
+
+def test_non_python_change_requests_full_run(tmp_path):
+    make_project(tmp_path, dict(PROJECT, **{"config.json": "{}"}))
+    sel = selector(tmp_path)
+
+    assert sel.select(["config.json"]) is None
+    assert sel.select([]) is None
+
+
+def test_conftest_affects_all_tests_in_its_folder(tmp_path):
+    make_project(tmp_path, dict(PROJECT, **{
+        "tests/conftest.py": "import pytest\n",
+        "tests/api/conftest.py": "",
+        "tests/api/test_api.py": "def test_api():\n    pass\n",
+    }))
+    sel = selector(tmp_path)
+
+    assert sel.select(["tests/api/conftest.py"]) == [os.path.join("tests", "api", "test_api.py")]
+    assert len(sel.select(["tests/conftest.py"])) == 4
+
+
+def test_pytest_plugins_link_plugin_to_conftest(tmp_path):
+    make_project(tmp_path, dict(PROJECT, **{
+        "tests/conftest.py": "pytest_plugins = ['tests.fixtures.db', \"tests.fixtures.web\"]\n",
+        "tests/fixtures/__init__.py": "",
+        "tests/fixtures/db.py": "import src.unused\n",
+        "tests/fixtures/web.py": "",
+    }))
+    sel = selector(tmp_path, source_roots=[""])
+
+    expected = sorted(os.path.join("tests", name)
+                      for name in ("test_core.py", "test_other.py", "test_utils.py"))
+    assert sel.select(["tests/fixtures/web.py"]) == expected
+    # Модуль, который использует только плагин фикстур, влияет на все тесты папки
+    assert sel.select(["src/unused.py"]) == expected
+
+
+def test_incremental_update_tracks_new_imports(tmp_path):
+    make_project(tmp_path, PROJECT)
+    sel = selector(tmp_path)
+    assert sel.select(["src/unused.py"]) is None
+
+    test_file = tmp_path / "tests" / "test_other.py"
+    test_file.write_text("import src.other\nimport src.unused\n", encoding='utf-8')
+    assert sel.select(["tests/test_other.py"]) == [os.path.join("tests", "test_other.py")]
+    assert sel.select(["src/unused.py"]) == [os.path.join("tests", "test_other.py")]
+
+    test_file.write_text("import src.other\n", encoding='utf-8')
+    sel.select(["tests/test_other.py"])
+    assert sel.select(["src/unused.py"]) is None
+
+
+def test_incremental_update_handles_new_and_deleted_modules(tmp_path):
+    make_project(tmp_path, dict(PROJECT, **{"tests/test_new.py": "import src.new\n"}))
+    sel = selector(tmp_path)
+    sel.build_graph()
+
+    (tmp_path / "src" / "new.py").write_text("NEW = 1\n", encoding='utf-8')
+    assert sel.select(["src/new.py"]) == [os.path.join("tests", "test_new.py")]
+
+    other = str(tmp_path / "src" / "other.py")
+    os.remove(other)
+    sel.update([other])
+    assert other not in sel._graph
+    assert other not in sel._graph[str(tmp_path / "tests" / "test_other.py")]
+
+
+def test_graph_is_cached_between_selections(tmp_path):
+    make_project(tmp_path, PROJECT)
+    sel = selector(tmp_path)
+    sel.select(["src/core.py"])
+    graph = sel._graph
+
+    sel.select(["src/other.py"])
+    assert sel._graph is graph
+
+
+def test_periodic_full_run_rebuilds_graph(tmp_path):
+    make_project(tmp_path, PROJECT)
+    sel = selector(tmp_path, full_run_interval=2)
+
+    assert sel.select(["src/core.py"]) is not None
+    assert sel.select(["src/core.py"]) is None
+    assert sel._graph is None
+    assert sel.select(["src/core.py"]) is not None
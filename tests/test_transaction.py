@@ -0,0 +1,167 @@
+"""
+Тесты FileTransaction: атомарное применение, откат, журнал оригиналов
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.exceptions import FileOperationError
+from src.transaction import FileTransaction
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return str(path)
+
+
+def test_commit_applies_all_changes(tmp_path):
+    a = write(tmp_path / "a.py", "a = 1\n")
+    b = write(tmp_path / "pkg" / "b.py", "b = 1\n")
+
+    tx = FileTransaction()
+    tx.stage(a, "a = 2\n")
+    tx.stage(b, "b = 2\n")
+    assert not tx.pending
+    tx.commit()
+
+    assert tx.pending
+    assert (tmp_path / "a.py").read_text(encoding='utf-8') == "a = 2\n"
+    assert (tmp_path / "pkg" / "b.py").read_text(encoding='utf-8') == "b = 2\n"
+    # Временные файлы не остаются рядом с целевыми
+    assert not [p for p in tmp_path.rglob("*.wa-tmp")]
+
+
+def test_rollback_restores_originals_and_removes_created(tmp_path):
+    a = write(tmp_path / "a.py", "a = 1\n")
+    new = str(tmp_path / "new.py")
+
+    tx = FileTransaction()
+    tx.stage(a, "a = 2\n")
+    tx.stage(new, "x = 1\n", create=True)
+    tx.commit()
+    assert os.path.exists(new)
+
+    tx.rollback()
+    assert (tmp_path / "a.py").read_text(encoding='utf-8') == "a = 1\n"
+    assert not os.path.exists(new)
+    assert not tx.pending
+
+
+def test_restaging_keeps_first_original(tmp_path):
+    a = write(tmp_path / "a.py", "original\n")
+
+    tx = FileTransaction()
+    tx.stage(a, "first\n")
+    tx.stage(a, "second\n")
+    tx.commit()
+    assert (tmp_path / "a.py").read_text(encoding='utf-8') == "second\n"
+
+    tx.rollback()
+    assert (tmp_path / "a.py").read_text(encoding='utf-8') == "original\n"
+
+
+def test_missing_file_requires_create(tmp_path):
+    tx = FileTransaction()
+    with pytest.raises(FileOperationError):
+        tx.stage(str(tmp_path / "missing.py"), "x = 1\n")
+    assert tx.paths == []
+
+
+def test_stage_after_commit_is_rejected(tmp_path):
+    a = write(tmp_path / "a.py", "a = 1\n")
+    tx = FileTransaction()
+    tx.stage(a, "a = 2\n")
+    tx.commit()
+    with pytest.raises(FileOperationError):
+        tx.stage(a, "a = 3\n")
+
+
+def test_originals_spill_to_journal_and_rollback_from_it(tmp_path):
+    journal_dir = tmp_path / "journal"
+    journal_dir.mkdir()
+    files = [write(tmp_path / f"m{i}.py", f"value = {i}\n" * 20) for i in range(5)]
+
+    tx = FileTransaction(journal_dir=str(journal_dir), memory_limit=200)
+    for path in files:
+        tx.stage(path, "changed\n")
+    # Оригиналы превысили лимит памяти - ушли в журнал
+    assert len(list(journal_dir.iterdir())) == 1
+    assert tx._memory_bytes <= 200
+
+    tx.commit()
+    tx.rollback()
+    for i, path in enumerate(files):
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == f"value = {i}\n" * 20
+    # Журнал удаляется после отката
+    assert list(journal_dir.iterdir()) == []
+
+
+def test_release_drops_journal_and_keeps_changes(tmp_path):
+    journal_dir = tmp_path / "journal"
+    journal_dir.mkdir()
+    a = write(tmp_path / "a.py", "a = 1\n" * 100)
+
+    tx = FileTransaction(journal_dir=str(journal_dir), memory_limit=10)
+    tx.stage(a, "a = 2\n")
+    tx.commit()
+    tx.release()
+
+    assert not tx.pending
+    assert list(journal_dir.iterdir()) == []
+    assert (tmp_path / "a.py").read_text(encoding='utf-8') == "a = 2\n"
+
+
+def test_context_manager_rolls_back_on_error(tmp_path):
+    a = write(tmp_path / "a.py", "a = 1\n")
+
+    with pytest.raises(RuntimeError):
+        with FileTransaction() as tx:
+            tx.stage(a, "a = 2\n")
+            tx.commit()
+            raise RuntimeError("тесты упали")
+
+    assert (tmp_path / "a.py").read_text(encoding='utf-8') == "a = 1\n"
+
+
+def test_failed_replace_restores_replaced_files(tmp_path, monkeypatch):
+    a = write(tmp_path / "a.py", "a = 1\n")
+    b = write(tmp_path / "b.py", "b = 1\n")
+
+    tx = FileTransaction()
+    tx.stage(a, "a = 2\n")
+    tx.stage(b, "b = 2\n")
+
+    real_replace = os.replace
+
+    def flaky_replace(src, dst):
+        if dst == b and src.endswith(".wa-tmp"):
+            raise OSError("диск отвалился")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", flaky_replace)
+    with pytest.raises(FileOperationError):
+        tx.commit()
+    monkeypatch.undo()
+
+    assert not tx.committed
+    assert (tmp_path / "a.py").read_text(encoding='utf-8') == "a = 1\n"
+    assert (tmp_path / "b.py").read_text(encoding='utf-8') == "b = 1\n"
+    assert not [p for p in tmp_path.rglob("*.wa-tmp")]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="права файлов POSIX")
+def test_commit_preserves_file_mode(tmp_path):
+    script = write(tmp_path / "run.py", "print(1)\n")
+    os.chmod(script, 0o755)
+
+    tx = FileTransaction()
+    tx.stage(script, "print(2)\n")
+    tx.commit()
+    assert stat.S_IMODE(os.stat(script).st_mode) == 0o755